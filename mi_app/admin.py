@@ -1,26 +1,37 @@
 from django.contrib import admin, messages
 from mi_app.generar_horarios import generar_horarios_view
+from mi_app.incremental import reprogramar_incremental
 from django.core.exceptions import ValidationError
 from django.contrib.admin import TabularInline, helpers
-from django.urls import path
+from django.urls import path, reverse
 from django.db import transaction
-from django.db.models import Case, When, IntegerField, Value, F
 from django.utils.html import format_html, strip_tags
 from django import forms
-from django.db.models.functions import Coalesce
 from django.db import IntegrityError, transaction
-from .utils import (
-    calcular_mps,
-    obtener_orden_dias
-)
+from .utils import calcular_mps
+from django.template.defaultfilters import filesizeformat
 from django.template.response import TemplateResponse
 from .models import (
     Institucion, PerfilUsuario,
     Docente, Asignatura, NoDisponibilidad, Aula,
-    CarreraUniversitaria, Semestre, DiaSemana, Horario, Descanso
+    CarreraUniversitaria, Semestre, DiaSemana, Horario, HorarioPlano, HorarioGuardado, Descanso, GeneracionJob
 )
+from .jobs import estado_job
+from .validacion import validar_horarios
+from .auditoria import auditar_institucion, reporte_csv
+from .diferencias import TIPOS as TIPOS_CAMBIO, diferencias
+from .instantaneas import guardar_instantanea, restaurar_instantanea
+from .paquete_pdf import TIPOS_PAQUETE, generar_paquete
+from .planillas import filtrar_horarios, respuesta_planilla
+from . import plano
+from .versiones import tocar_version
+from .calendario import url_calendario
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404, redirect
 from .utils import asignar_horario_automatico
 import gc,time
+import tempfile
+from functools import partialmethod
 # === auth admin visibles solo para superuser ===
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
@@ -110,6 +121,24 @@ class TenantScopedAdminMixin(OpenToStaffAdminMixin):
         return field
 
 
+# ==========================
+# Reprogramación incremental desde los guardados del admin
+# ==========================
+def reprogramar_desde_admin(request, inst, **cambios):
+    """Reubica lo afectado por un guardado y lo informa con mensajes."""
+    if inst is None:
+        return
+    errores = reprogramar_incremental(request.user, inst, **cambios)
+    if errores is None:
+        return  # el usuario aún no ha generado horarios
+    if errores:
+        messages.warning(request, f"🔁 Horario actualizado con {len(errores)} aviso(s):")
+        for e in errores[:5]:
+            messages.warning(request, e)
+    else:
+        messages.info(request, "🔁 Horario actualizado: se reubicaron solo las asignaturas afectadas.")
+
+
 # ==========================
 # OCULTAR "Instituciones" del admin (no se muestra)
 # ==========================
@@ -129,7 +158,7 @@ class InstitucionAdmin(admin.ModelAdmin):
     # --- Bloque explicativo arriba de los campos ---
     fieldsets = (
         (None, {
-            "fields": ("nombre", "slug", "duracion_hora_minutos"),
+            "fields": ("nombre", "slug", "duracion_hora_minutos", "inicio_clases"),
             "description": format_html(
                 "<div style='background:#F9FAFB;border:1px solid #E5E7EB;"
                 "padding:10px 12px;border-radius:8px;margin-bottom:8px;'>"
@@ -159,7 +188,13 @@ class InstitucionAdmin(admin.ModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         if request.user.is_superuser:
             return ()
-        return ("nombre", "slug",)  # el staff solo edita duracion_hora_minutos
+        return ("nombre", "slug",)  # el staff solo edita duracion_hora_minutos e inicio_clases
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "inicio_clases" in form.changed_data:
+            # Las fechas de los calendarios .ics cambian: nuevo ETag
+            tocar_version(obj.id)
 
     # Importante: ya no usamos get_fields; fieldsets manda.
     # def get_fields(self, request, obj=None):
@@ -383,6 +418,23 @@ class DescansoAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
             obj.id = ultimo.id
         return
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if form.instance.pk:
+            reprogramar_desde_admin(request, form.instance.institucion, descansos=True)
+
+    def delete_model(self, request, obj):
+        inst = obj.institucion
+        super().delete_model(request, obj)
+        reprogramar_desde_admin(request, inst, descansos=True)
+
+    def delete_queryset(self, request, queryset):
+        # Acción "eliminar seleccionados": una reprogramación por institución
+        instituciones = list(Institucion.objects.filter(pk__in=queryset.values("institucion_id")))
+        super().delete_queryset(request, queryset)
+        for inst in instituciones:
+            reprogramar_desde_admin(request, inst, descansos=True)
+
 # ==========================
 # Inlines
 # ==========================
@@ -484,6 +536,7 @@ def _ayuda_carga_sem(obj):
 
 class AsignaturaAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
     form = AsignaturaForm
+    campos_de_horario = {'semestre', 'jornada', 'aula', 'docentes', 'horas_totales', 'semanas'}
     list_display = ('nombre','semestre','mostrar_docentes','aula','mostrar_jornadas','horas_totales','semanas')
     list_filter = ('semestre__carrera','docentes','semestre','jornada')
     search_fields = ('nombre','semestre__numero','docentes__nombre')
@@ -564,6 +617,10 @@ class AsignaturaAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
         if getattr(self, "_duplicado_detectado", False):
             return
         super().save_related(request, form, formsets, change)
+
+        # Solo los campos que cambian dónde/cuánto se ubica la asignatura
+        if not change or set(form.changed_data) & self.campos_de_horario:
+            reprogramar_desde_admin(request, form.instance.institucion, asignatura_ids=[form.instance.pk])
         
     def response_add(self, request, obj, post_url_continue=None):
         # Si hubo duplicado, no mostrar el mensaje de éxito ni redirigir
@@ -648,10 +705,21 @@ class CarreraAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
 admin.site.register(CarreraUniversitaria, CarreraAdmin)
 
 
+def enlace_calendario(tipo, obj):
+    """Enlace al feed .ics de `obj` (la URL lleva el token: se puede compartir con el docente)."""
+    return format_html('<a href="{}" title="Suscribirse desde Google Calendar, Outlook, etc.">.ics</a>',
+                       url_calendario(tipo, obj))
+
+
 class SemestreAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
-    list_display = ('numero', 'carrera')
+    list_display = ('numero', 'carrera', 'calendario')
     list_filter = ('carrera',)
     search_fields = ('numero', 'carrera__nombre')
+    list_select_related = ('carrera',)
+
+    @admin.display(description="Calendario")
+    def calendario(self, obj):
+        return enlace_calendario("semestre", obj)
 
 admin.site.register(Semestre, SemestreAdmin)
 
@@ -688,6 +756,13 @@ class NoDisponibilidadInline(TabularInline):
         kwargs['exclude'] = tuple(excl)
         return super().get_formset(request, obj, **kwargs)
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Solo los días de la institución del usuario, en orden de semana
+        if db_field.name == 'dia' and not request.user.is_superuser:
+            inst = getattr(getattr(request.user, 'perfil', None), 'institucion', None)
+            kwargs['queryset'] = DiaSemana.objects.filter(institucion=inst).order_by('orden')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def save_formset(self, request, form, formset, change):
         # 'obj' es el Docente padre en la vista de cambio
         parent_inst = getattr(getattr(form.instance, 'institucion', None), 'id', None)
@@ -718,7 +793,7 @@ class NoDisponibilidadInline(TabularInline):
 # Docente
 # ==========================
 class DocenteAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
-    list_display = ('nombre', 'correo', 'mostrar_asignaturas', 'ver_horario_link')
+    list_display = ('nombre', 'correo', 'mostrar_asignaturas', 'ver_horario_link', 'calendario')
     search_fields = ('nombre', 'correo')
     inlines = [NoDisponibilidadInline]
 
@@ -731,6 +806,10 @@ class DocenteAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
     ver_horario_link.short_description = "Horario"
     ver_horario_link.allow_tags = True
 
+    @admin.display(description="Calendario")
+    def calendario(self, obj):
+        return enlace_calendario("docente", obj)
+
     # ⬇️ ESTE método es la clave
     def save_formset(self, request, form, formset, change):
         """
@@ -754,6 +833,9 @@ class DocenteAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
             for obj in formset.deleted_objects:
                 obj.delete()
             formset.save_m2m()
+
+            if formset.has_changed():
+                reprogramar_desde_admin(request, parent_docente.institucion, docente_ids=[parent_docente.pk])
         else:
             # para otros inlines (si los hubiera)
             formset.save()
@@ -763,9 +845,13 @@ admin.site.register(Docente, DocenteAdmin)
 # Aula
 # ==========================
 class AulaAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
-    list_display = ('nombre',)
+    list_display = ('nombre', 'calendario')
     search_fields = ('nombre',)
 
+    @admin.display(description="Calendario")
+    def calendario(self, obj):
+        return enlace_calendario("aula", obj)
+
 
 admin.site.register(Aula, AulaAdmin)
 
@@ -781,18 +867,6 @@ admin.site.index_title = "Gestión de Hache"
 # ==========================
 # Utilidades para Horario
 # ==========================
-DIAS_ORDENADOS = {
-    "Lunes": 1, "Martes": 2, "Miercoles": 3, "Jueves": 4,
-    "Viernes": 5, "Sabado": 6, "Domingo": 7,
-}
-def obtener_orden_dias(request=None):
-    # Filtra días por institución del usuario
-    qs = DiaSemana.objects.all()
-    if request and not request.user.is_superuser and hasattr(request.user, 'perfil'):
-        qs = qs.filter(institucion=request.user.perfil.institucion)
-    return {dia: DIAS_ORDENADOS.get(dia.nombre, 99) for dia in qs}
-
-
 class CarreraFilter(admin.SimpleListFilter):
     title = 'Carrera'
     parameter_name = 'carrera'
@@ -805,74 +879,125 @@ class CarreraFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         if self.value():
-            return queryset.filter(asignatura__semestre__carrera__id=self.value())
+            return queryset.filter(plano__carrera_id=self.value())
         return queryset
 
 
+class SemestreFilter(admin.RelatedFieldListFilter):
+    """Filtro por semestre que trae la carrera en la misma consulta (la usa __str__)."""
+
+    def field_choices(self, field, request, model_admin):
+        qs = Semestre.objects.select_related('carrera').order_by('carrera__nombre', 'numero')
+        if not request.user.is_superuser and hasattr(request.user, 'perfil'):
+            qs = qs.filter(institucion=request.user.perfil.institucion)
+        return [(s.pk, str(s)) for s in qs]
+
+
 # ==========================
 # ADMIN DE HORARIOS
 # ==========================
+class HorarioAdminForm(forms.ModelForm):
+    """Valida la fila con validar_horarios (incluye choques con lo ya guardado)."""
+
+    def __init__(self, *args, **kwargs):
+        self.request = kwargs.pop("request", None)
+        super().__init__(*args, **kwargs)
+
+    def _post_clean(self):
+        super()._post_clean()  # vuelca los datos en self.instance y corre Horario.clean()
+        if self.errors:
+            return
+        h = self.instance
+        user = getattr(self.request, "user", None)
+        if h.usuario_id is None and user is not None:
+            h.usuario = user
+        if h.institucion_id is None and hasattr(user, "perfil"):
+            h.institucion = user.perfil.institucion
+        for msg in validar_horarios([h])[0]:
+            self.add_error(None, msg)
+
+
 class HorarioAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
+    """
+    La lista lee nombres y claves de orden de HorarioPlano (un join por
+    clave primaria) en vez de unir asignatura, semestre, carrera, docente,
+    aula y día.
+    """
     list_display = (
-        "dia", "get_carrera", "get_semestre", "jornada",
+        "col_dia", "get_carrera", "get_semestre", "jornada",
         "col_actividad", "col_docente", "col_aula",
         "hora_inicio", "hora_fin"
     )
-    list_filter = (CarreraFilter, "asignatura__semestre", "jornada", "dia")
-    search_fields = ("asignatura__nombre", "docente__nombre", "aula__nombre")
+    list_filter = (CarreraFilter, ("plano__semestre", SemestreFilter), "jornada", "dia")
+    search_fields = ("plano__asignatura_nombre", "plano__docente_nombre", "plano__aula_nombre")
+    list_select_related = ("plano",)
     change_list_template = 'admin/mi_app/horarios_change_list.html'
+    form = HorarioAdminForm
+    actions = ["auditar_conflictos"]
 
     # ========= CAMPOS EXTRA ==========
-    @admin.display(description="Carrera", ordering='asignatura__semestre__carrera__nombre')
+    @admin.display(description="Día", ordering='plano__dia_orden')
+    def col_dia(self, obj):
+        fila = self._plano(obj)
+        return fila.dia_nombre if fila else "—"
+
+    @admin.display(description="Carrera", ordering='plano__carrera_nombre')
     def get_carrera(self, obj):
-        if getattr(obj.asignatura, "nombre", "") == "DESCANSO":
+        fila = self._plano(obj)
+        if fila is None or fila.es_descanso:
             return "—"
-        sem = getattr(obj.asignatura, 'semestre', None)
-        car = getattr(sem, 'carrera', None)
-        return getattr(car, 'nombre', '—')
+        return fila.carrera_nombre or "—"
 
-    @admin.display(description="Semestre", ordering='asignatura__semestre__numero')
+    @admin.display(description="Semestre", ordering='plano__semestre_numero')
     def get_semestre(self, obj):
-        if getattr(obj.asignatura, "nombre", "") == "DESCANSO":
+        fila = self._plano(obj)
+        if fila is None or fila.es_descanso or fila.semestre_numero is None:
             return "—"
-        sem = getattr(obj.asignatura, 'semestre', None)
-        return getattr(sem, 'numero', '—')
+        return fila.semestre_numero
 
     # ========= CONSULTA BASE ==========
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         jornada_seleccionada = request.GET.get("jornada")
 
-        dia_ordenes = obtener_orden_dias(request)
-        dia_order = Case(
-            *[When(dia=dia_obj, then=orden) for dia_obj, orden in dia_ordenes.items()],
-            default=99, output_field=IntegerField()
-        )
-
-        qs = qs.annotate(
-            dia_orden=dia_order,
-            carrera_nombre=Coalesce(F('asignatura__semestre__carrera__nombre'), Value("")),
-            sem_num=Coalesce(F('asignatura__semestre__numero'), Value(0)),
-        )
-
         if jornada_seleccionada:
             qs = qs.filter(jornada=jornada_seleccionada)
 
-        return qs.order_by("dia_orden", "hora_inicio", "jornada", "carrera_nombre", "sem_num", "id")
+        # Claves de orden copiadas en HorarioPlano (join por PK): el SQL es el
+        # mismo para todas las instituciones, sin una rama CASE por cada día.
+        return qs.order_by(
+            "plano__dia_orden", "plano__inicio_min", "jornada",
+            "plano__carrera_nombre", "plano__semestre_numero", "id",
+        )
 
     # ========= HELPERS ==========
+    def _plano(self, obj):
+        # Precargada por list_select_related; None si la copia aún no está
+        return getattr(obj, "plano", None)
+
     def _es_descanso(self, obj):
-        return getattr(obj.asignatura, "nombre", "") == "DESCANSO"
+        fila = self._plano(obj)
+        return fila is not None and fila.es_descanso
 
     def _titulo_descanso(self, obj):
-        d = Descanso.objects.filter(
-            institucion=obj.institucion,
-            usuario=obj.usuario,
-            dia=obj.dia,
-            hora_inicio=obj.hora_inicio,
-            hora_fin=obj.hora_fin,
-        ).first()
-        return d.nombre if d and d.nombre else "Descanso"
+        # Lo precarga get_changelist_instance (una consulta para toda la lista)
+        return getattr(obj, "titulo_descanso", None) or "Descanso"
+
+    def get_changelist_instance(self, request):
+        cl = super().get_changelist_instance(request)
+        filas = list(cl.result_list)  # evalúa (y cachea) la lista que pinta la plantilla
+        descansos = [h for h in filas if self._es_descanso(h)]
+        if descansos:
+            titulos = {
+                (usuario_id, dia_id, hi, hf): nombre
+                for usuario_id, dia_id, hi, hf, nombre in Descanso.objects.filter(
+                    institucion_id__in={h.institucion_id for h in descansos},
+                    usuario_id__in={h.usuario_id for h in descansos},
+                ).exclude(nombre="").values_list("usuario_id", "dia_id", "hora_inicio", "hora_fin", "nombre")
+            }
+            for h in descansos:
+                h.titulo_descanso = titulos.get((h.usuario_id, h.dia_id, h.hora_inicio, h.hora_fin))
+        return cl
 
     @admin.display(description="Actividad")
     def col_actividad(self, obj):
@@ -886,35 +1011,77 @@ class HorarioAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
                 '</div>',
                 titulo
             )
-        return str(obj.asignatura)
+        fila = self._plano(obj)
+        return fila.asignatura_nombre if fila else "—"
 
     @admin.display(description="Docente")
     def col_docente(self, obj):
-        return "—" if self._es_descanso(obj) else (obj.docente.nombre if obj.docente_id else "—")
+        fila = self._plano(obj)
+        return "—" if fila is None or fila.es_descanso else (fila.docente_nombre or "—")
 
     @admin.display(description="Aula")
     def col_aula(self, obj):
-        return "—" if self._es_descanso(obj) else (obj.aula.nombre if obj.aula_id else "—")
+        fila = self._plano(obj)
+        return "—" if fila is None or fila.es_descanso else (fila.aula_nombre or "—")
+
+    # ========= AUDITORÍA ==========
+    @admin.action(description="Auditar conflictos de la institución (descarga CSV)")
+    def auditar_conflictos(self, request, queryset):
+        insts = Institucion.objects.filter(
+            id__in=queryset.order_by().values("institucion_id").distinct()
+        ).order_by("id")
+        conflictos = [c for inst in insts for c in auditar_institucion(inst)]
+        response = HttpResponse(reporte_csv(conflictos), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = 'attachment; filename="auditoria_horarios.csv"'
+        return response
 
     # ========= FORM / SAVE ==========
     def get_form(self, request, obj=None, **kwargs):
-        form = super().get_form(request, obj, **kwargs)
-        if 'usuario' in form.base_fields:
-            form.base_fields['usuario'].widget = forms.HiddenInput()
-        return form
+        FormClass = super().get_form(request, obj, **kwargs)
+        if 'usuario' in FormClass.base_fields:
+            FormClass.base_fields['usuario'].widget = forms.HiddenInput()
+        # HorarioAdminForm recibe el request como argumento (validación con el usuario)
+        return type(FormClass.__name__, (FormClass,), {
+            "__init__": partialmethod(FormClass.__init__, request=request),
+        })
 
     def save_model(self, request, obj, form, change):
         if getattr(obj, 'usuario_id', None) is None:
             obj.usuario = request.user
         if getattr(obj, 'institucion_id', None) is None and hasattr(request.user, 'perfil'):
             obj.institucion = request.user.perfil.institucion
-        super().save_model(request, obj, form, change)
+        # El form ya validó la fila en lote: no repetir los chequeos de Horario.save()
+        obj.save(validar=False)
+
+    # Horario no tiene post_delete (borrado masivo rápido): la versión y la
+    # copia plana se actualizan aquí
+    def delete_model(self, request, obj):
+        horario_id = obj.pk
+        super().delete_model(request, obj)
+        plano.borrar([horario_id])
+        tocar_version(obj.institucion_id, obj.usuario_id)
+
+    def delete_queryset(self, request, queryset):
+        filas = list(queryset.values_list("id", "institucion_id", "usuario_id"))
+        super().delete_queryset(request, queryset)
+        plano.borrar(h_id for h_id, _, _ in filas)
+        for institucion_id, usuario_id in {(i, u) for _, i, u in filas}:
+            tocar_version(institucion_id, usuario_id)
 
     # ========= URL PERSONALIZADA ==========
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path('generar_horarios/', self.admin_site.admin_view(self.generar_horarios), name='generar_horarios'),
+            path('generacion/<int:job_id>/estado/', self.admin_site.admin_view(self.estado_generacion),
+                 name='estado_generacion'),
+            path('generacion/<int:job_id>/cancelar/', self.admin_site.admin_view(self.cancelar_generacion),
+                 name='cancelar_generacion'),
+            path('paquete_pdf/', self.admin_site.admin_view(self.paquete_pdf), name='paquete_pdf'),
+            path('exportar/<str:formato>/', self.admin_site.admin_view(self.exportar_planilla),
+                 name='exportar_horarios_admin'),
+            path('instantanea/', self.admin_site.admin_view(self.nueva_instantanea),
+                 name='guardar_instantanea'),
         ]
         return custom_urls + urls
 
@@ -922,6 +1089,81 @@ class HorarioAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
     def generar_horarios(self, request):
        return generar_horarios_view(request, self)
 
+    def _job(self, request, job_id):
+        qs = GeneracionJob.objects.all()
+        if not request.user.is_superuser:
+            qs = qs.filter(usuario=request.user)
+        return get_object_or_404(qs, pk=job_id)
+
+    def estado_generacion(self, request, job_id):
+        """JSON ligero para el polling de la lista de horarios."""
+        return JsonResponse(estado_job(self._job(request, job_id)))
+
+    def cancelar_generacion(self, request, job_id):
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        job = self._job(request, job_id)
+        if job.activo:
+            # El worker lo ve en el siguiente límite de lote
+            GeneracionJob.objects.filter(pk=job.pk).update(cancelacion_solicitada=True)
+            job.cancelacion_solicitada = True
+        return JsonResponse(estado_job(job))
+
+    # ========= PAQUETE PDF ==========
+    def paquete_pdf(self, request):
+        """ZIP con un PDF por docente y por semestre de la institución (?tipo= para uno solo)."""
+        inst = self._tenant(request)
+        inst_id = request.GET.get("institucion", "")
+        if request.user.is_superuser and inst_id:
+            inst = Institucion.objects.filter(id=inst_id).first() if inst_id.isdigit() else None
+            if inst is None:
+                messages.error(request, "La institución indicada no existe.")
+                return redirect("..")
+        if inst is None:
+            messages.error(request, "Tu usuario no tiene institución asociada.")
+            return redirect("..")
+        tipo = request.GET.get("tipo")
+        tipos = (tipo,) if tipo in TIPOS_PAQUETE else TIPOS_PAQUETE
+
+        archivo = tempfile.TemporaryFile()
+        generar_paquete(inst, archivo, tipos)
+        archivo.seek(0)
+        return FileResponse(archivo, as_attachment=True, filename=f"horarios_{inst.slug}.zip",
+                            content_type="application/zip")
+
+    # ========= CSV / XLSX ==========
+    def exportar_planilla(self, request, formato):
+        """Horarios de la institución en streaming, con los filtros de la lista (carrera, jornada, día)."""
+        qs = HorarioPlano.objects.all()
+        if not request.user.is_superuser:
+            qs = qs.filter(institucion=self._tenant(request))
+        return respuesta_planilla(filtrar_horarios(qs, request.GET), formato)
+
+    # ========= INSTANTÁNEAS ==========
+    def nueva_instantanea(self, request):
+        """Guarda mi horario actual como instantánea (ver HorarioGuardadoAdmin para restaurarla)."""
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        inst = self._tenant(request)
+        if inst is None:
+            messages.error(request, "Tu usuario no tiene institución asociada.")
+            return redirect("..")
+        guardado = guardar_instantanea(request.user, inst, nombre=request.POST.get("nombre", "").strip()[:100])
+        if guardado is None:
+            messages.warning(request, "No hay horario que guardar.")
+        else:
+            messages.success(
+                request, f"Horario guardado: «{guardado.nombre}» ({guardado.filas} filas, {guardado.tamano} bytes)."
+            )
+        return redirect("..")
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context["generacion"] = (
+            GeneracionJob.objects.filter(usuario=request.user).order_by("-creado").first()
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
 
 # ==========================
 # REGISTRO ADMIN
@@ -929,6 +1171,106 @@ class HorarioAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
 admin.site.register(Horario, HorarioAdmin)
 
 
+# ==========================
+# HORARIOS GUARDADOS (INSTANTÁNEAS)
+# ==========================
+class HorarioGuardadoAdmin(TenantScopedAdminMixin, admin.ModelAdmin):
+    list_display = ("nombre", "usuario", "fecha_creacion", "filas", "col_tamano", "conservar", "col_comparar")
+    list_filter = ("conservar",)
+    fields = ("nombre", "conservar", "usuario", "fecha_creacion", "filas", "col_tamano")
+    readonly_fields = ("usuario", "fecha_creacion", "filas", "col_tamano")
+    list_select_related = ("usuario",)
+    ordering = ("-fecha_creacion", "-id")
+    actions = ["restaurar", "comparar"]
+
+    def has_add_permission(self, request):
+        # Se crean desde la lista de horarios (o solas antes de cada generación)
+        return False
+
+    def get_queryset(self, request):
+        # Sin `contenido`: la lista no necesita los bytes
+        return super().get_queryset(request).defer("contenido")
+
+    @admin.display(description="Tamaño", ordering="tamano")
+    def col_tamano(self, obj):
+        return filesizeformat(obj.tamano)
+
+    @admin.display(description="Diferencias")
+    def col_comparar(self, obj):
+        return format_html(
+            '<a href="{}">Con el horario actual</a>',
+            reverse("admin:horarioguardado_diferencias", args=[obj.pk]),
+        )
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/diferencias/', self.admin_site.admin_view(self.diferencias_view),
+                 name='horarioguardado_diferencias'),
+        ] + super().get_urls()
+
+    def diferencias_view(self, request, pk):
+        """
+        Cambios por docente y por aula de la instantánea `pk` al horario
+        actual, o a otra instantánea con ?contra=<id>. ?formato=json: lo mismo en JSON.
+        """
+        qs = self.get_queryset(request).defer(None)
+        guardado = get_object_or_404(qs, pk=pk)
+        contra = request.GET.get("contra", "")
+        if contra and not contra.isdigit():
+            raise Http404("Instantánea no encontrada")
+        contra = get_object_or_404(qs, pk=contra) if contra else None
+        try:
+            datos = diferencias(guardado, contra)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect("admin:mi_app_horarioguardado_changelist")
+
+        datos = {
+            "antes": {"id": guardado.pk, "nombre": guardado.nombre},
+            "despues": {"id": contra.pk, "nombre": contra.nombre} if contra else None,
+            **datos,
+        }
+        if request.GET.get("formato") == "json":
+            return JsonResponse(datos, json_dumps_params={"ensure_ascii": False})
+        return TemplateResponse(request, "admin/mi_app/horario_diferencias.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Cambios desde «{guardado.nombre}»",
+            "datos": datos,
+            "tipos": TIPOS_CAMBIO,
+        })
+
+    @admin.action(description="Comparar (una: con el horario actual; dos: entre sí)")
+    def comparar(self, request, queryset):
+        elegidas = list(queryset.order_by("fecha_creacion", "id").values_list("pk", flat=True))
+        if len(elegidas) not in (1, 2):
+            messages.error(request, "Selecciona una o dos instantáneas para comparar.")
+            return None
+        url = reverse("admin:horarioguardado_diferencias", args=[elegidas[0]])
+        return redirect(f"{url}?contra={elegidas[1]}" if len(elegidas) == 2 else url)
+
+    @admin.action(description="Restaurar este horario (reemplaza el actual)")
+    def restaurar(self, request, queryset):
+        if queryset.count() != 1:
+            messages.error(request, "Selecciona una sola instantánea para restaurar.")
+            return None
+        guardado = HorarioGuardado.objects.select_related("institucion", "usuario").get(pk=queryset.get().pk)
+        try:
+            restauradas, omitidas = restaurar_instantanea(guardado)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return None
+        mensaje = f"Restaurado «{guardado.nombre}»: {restauradas} filas."
+        if omitidas:
+            messages.warning(request, f"{mensaje} {omitidas} omitidas (asignatura, docente, aula o día borrados).")
+        else:
+            messages.success(request, mensaje)
+        return None
+
+
+admin.site.register(HorarioGuardado, HorarioGuardadoAdmin)
+
+
 # ==========================
 # USER / GROUP SOLO SUPERUSER
 # ==========================
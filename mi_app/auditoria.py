@@ -0,0 +1,179 @@
+# auditoria.py
+"""
+Auditoría de conflictos de un horario ya guardado.
+
+Carga una sola vez los Horario de la institución (y sus no disponibilidades)
+y, por cada (recurso, día) — docente, aula y semestre —, recorre los tramos
+ordenados por hora de inicio con una línea de barrido: un heap con los tramos
+activos ordenados por hora de fin descarta los que ya terminaron, y cada tramo
+nuevo choca con los que siguen activos. Es O(n log n + conflictos).
+
+También se informan los horarios que empiezan fuera de la ventana de su
+jornada (models.error_jornada, la misma regla de Horario.clean) y los que
+caen en una no disponibilidad del docente. Los horarios de DESCANSO (docente y
+aula marcadores) no ocupan recursos y no se auditan.
+"""
+import csv
+import heapq
+import io
+from collections import namedtuple
+
+from .models import Horario, NoDisponibilidad, error_jornada
+from .utils import obtener_bloques_por_jornada
+
+FilaAuditoria = namedtuple(
+    "FilaAuditoria",
+    "id usuario dia_id dia jornada hora_inicio hora_fin "
+    "docente_id docente aula_id aula semestre_id semestre carrera asignatura",
+)
+# `horario`: FilaAuditoria; `otro`: FilaAuditoria, BloqueNoDisp o None.
+# El texto del reporte se arma recién en reporte_csv (formatear horas es lo más caro).
+Conflicto = namedtuple("Conflicto", "tipo dia recurso horario otro")
+BloqueNoDisp = namedtuple("BloqueNoDisp", "jornada hora_inicio hora_fin")
+
+TIPOS = {
+    "docente": "Choque de docente",
+    "aula": "Choque de aula",
+    "semestre": "Choque de semestre",
+    "jornada": "Fuera de la jornada",
+    "no_disponibilidad": "No disponibilidad del docente",
+}
+COLUMNAS_REPORTE = ("tipo", "dia", "recurso", "horario_id", "otro_id", "detalle")
+
+
+def _solapan(a_ini, a_fin, b_ini, b_fin):
+    return a_ini < b_fin and b_ini < a_fin
+
+
+def _hora(t):
+    return t.strftime("%H:%M")
+
+
+def _describir(f):
+    return f"#{f.id} {f.asignatura} {_hora(f.hora_inicio)}-{_hora(f.hora_fin)} ({f.usuario})"
+
+
+def detalle(c):
+    """Descripción legible de un Conflicto."""
+    if c.tipo == "jornada":
+        inicio, fin = obtener_bloques_por_jornada(c.horario.jornada)
+        ventana = f"{_hora(inicio)}-{_hora(fin)}" if inicio else "jornada inválida"
+        return f"{_describir(c.horario)} fuera de {c.horario.jornada} ({ventana})"
+    if c.tipo == "no_disponibilidad":
+        return (f"{_describir(c.horario)} choca con la no disponibilidad "
+                f"{_hora(c.otro.hora_inicio)}-{_hora(c.otro.hora_fin)}")
+    return f"{_describir(c.horario)} / {_describir(c.otro)}"
+
+
+# ==========================
+# Carga
+# ==========================
+def cargar_filas(inst):
+    """Horarios de `inst` (sin descansos) en una consulta, como FilaAuditoria."""
+    qs = (
+        Horario.objects.filter(institucion=inst, hora_inicio__isnull=False, hora_fin__isnull=False)
+        .exclude(asignatura__nombre="DESCANSO")
+        .values_list(
+            "id", "usuario__username", "dia_id", "dia__nombre", "jornada", "hora_inicio", "hora_fin",
+            "docente_id", "docente__nombre", "aula_id", "aula__nombre",
+            "asignatura__semestre_id", "asignatura__semestre__numero",
+            "asignatura__semestre__carrera__nombre", "asignatura__nombre",
+        )
+    )
+    return [FilaAuditoria(*fila) for fila in qs]
+
+
+# ==========================
+# Barrido
+# ==========================
+def barrer(tramos):
+    """
+    `tramos`: [(inicio, fin, dato)] de un mismo recurso y día. Devuelve los
+    pares (dato_a, dato_b) que se solapan, con a antes que b por inicio.
+    """
+    tramos = sorted(tramos, key=lambda t: (t[0], t[1]))
+    activos = []  # heap de (fin, orden, inicio, dato)
+    pares = []
+    for orden, (ini, fin, dato) in enumerate(tramos):
+        while activos and activos[0][0] <= ini:
+            heapq.heappop(activos)
+        for a_fin, _, a_ini, a_dato in activos:
+            if _solapan(a_ini, a_fin, ini, fin):
+                pares.append((a_dato, dato))
+        heapq.heappush(activos, (fin, orden, ini, dato))
+    return pares
+
+
+def auditar_filas(filas, no_disponibilidades=()):
+    """
+    Conflictos de `filas` (FilaAuditoria). `no_disponibilidades`:
+    [(docente_id, dia_id, jornada, hora_inicio, hora_fin)].
+    """
+    conflictos = []
+    grupos = {}
+    for f in filas:
+        for recurso, valor, nombre in (
+            ("docente", f.docente_id, f.docente),
+            ("aula", f.aula_id, f.aula),
+            ("semestre", f.semestre_id, f"Semestre {f.semestre} - {f.carrera}"),
+        ):
+            if valor is not None:
+                grupos.setdefault((recurso, valor, f.dia_id), (nombre, []))[1].append(
+                    (f.hora_inicio, f.hora_fin, f)
+                )
+
+        if error_jornada(f.jornada, f.hora_inicio):
+            conflictos.append(Conflicto("jornada", f.dia, f.jornada, f, None))
+
+    # Las no disponibilidades entran al barrido del docente como tramos más
+    for docente_id, dia_id, jornada, ini, fin in no_disponibilidades:
+        clave = ("docente", docente_id, dia_id)
+        if clave in grupos:
+            grupos[clave][1].append((ini, fin, BloqueNoDisp(jornada, ini, fin)))
+
+    for (recurso, _valor, _dia_id), (nombre, tramos) in grupos.items():
+        if len(tramos) < 2:
+            continue
+        for a, b in barrer(tramos):
+            a_nd, b_nd = isinstance(a, BloqueNoDisp), isinstance(b, BloqueNoDisp)
+            if a_nd and b_nd:
+                continue
+            if a_nd or b_nd:
+                nd, f = (a, b) if a_nd else (b, a)
+                if nd.jornada == f.jornada:
+                    conflictos.append(Conflicto("no_disponibilidad", f.dia, nombre, f, nd))
+                continue
+            conflictos.append(Conflicto(recurso, a.dia, nombre, a, b))
+    conflictos.sort(key=lambda c: (c.tipo, c.dia or "", c.recurso or "", c.horario.id))
+    return conflictos
+
+
+def auditar_institucion(inst):
+    """Carga los horarios de `inst` una sola vez y devuelve sus conflictos (2 consultas)."""
+    filas = cargar_filas(inst)
+    no_disp = NoDisponibilidad.objects.filter(institucion=inst).values_list(
+        "docente_id", "dia_id", "jornada", "hora_inicio", "hora_fin"
+    )
+    return auditar_filas(filas, list(no_disp))
+
+
+# ==========================
+# Reporte
+# ==========================
+def reporte_csv(conflictos):
+    """Reporte CSV (una fila por conflicto, con encabezado)."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(COLUMNAS_REPORTE)
+    for c in conflictos:
+        otro_id = c.otro.id if isinstance(c.otro, FilaAuditoria) else ""
+        w.writerow((TIPOS.get(c.tipo, c.tipo), c.dia, c.recurso, c.horario.id, otro_id, detalle(c)))
+    return buf.getvalue()
+
+
+def resumen(conflictos):
+    """{tipo: cantidad} para mensajes y logs."""
+    cuenta = {}
+    for c in conflictos:
+        cuenta[c.tipo] = cuenta.get(c.tipo, 0) + 1
+    return cuenta
@@ -0,0 +1,100 @@
+# cache_horarios.py
+"""
+Caché de los horarios agrupados por día de las vistas de un usuario
+(filas de HorarioPlano, ver plano.py).
+
+La clave es (institución, usuario, versión del horario del usuario, vista,
+filtros). La versión sube en la misma transacción que cualquier cambio que
+se vea en esas páginas (versiones.py), así que una entrada nunca queda
+vieja: el cambio cambia la clave y las entradas anteriores vencen solas
+(HORARIOS_CACHE_TIMEOUT). No hace falta borrar nada al escribir.
+
+Usa el alias "horarios" de CACHES (Redis con REDIS_URL, memoria del proceso
+si no). Si la caché falla, se calcula sin ella. Aciertos y fallos se cuentan
+en la misma caché: `estadisticas()` y el comando `estadisticas_cache`.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .plano import agrupar_por_dia, ordenados
+from .versiones import version_usuario
+
+logger = logging.getLogger(__name__)
+
+ALIAS = "horarios"
+EVENTOS = ("aciertos", "fallos")
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _clave(institucion_id, usuario_id, version, vista, filtros):
+    huella = hashlib.sha1(json.dumps(sorted(filtros.items()), default=str).encode()).hexdigest()[:16]
+    return f"horarios:{institucion_id}:{usuario_id}:v{version}:{vista}:{huella}"
+
+
+def _contar(evento):
+    clave = f"horarios:stats:{evento}"
+    try:
+        _cache().incr(clave)
+    except ValueError:  # primera vez: la clave aún no existe
+        _cache().add(clave, 0, timeout=None)
+        _cache().incr(clave)
+
+
+# ==========================
+# Lectura
+# ==========================
+def horarios_por_dia(usuario_id, vista, filtros=None, version=None):
+    """
+    {nombre del día: [HorarioPlano]} de `usuario_id` con `filtros` (campos de HorarioPlano),
+    desde la caché si está. `version`: lo que devuelve version_usuario (la
+    vista ya lo tiene por el GET condicional); se consulta si no se pasa.
+    Sin perfil no hay versión y no se cachea.
+    """
+    filtros = dict(filtros or {})
+
+    def calcular():
+        return agrupar_por_dia(ordenados(usuario_id=usuario_id, **filtros))
+
+    version = version or version_usuario(usuario_id)
+    if version is None:
+        return calcular()
+    numero, _, institucion_id = version
+    clave = _clave(institucion_id, usuario_id, numero, vista, filtros)
+
+    try:
+        datos = _cache().get(clave)
+        _contar("fallos" if datos is None else "aciertos")
+    except Exception as e:
+        logger.warning("Caché de horarios no disponible: %s", e)
+        return calcular()
+
+    if datos is None:
+        datos = calcular()
+        try:
+            _cache().set(clave, datos, getattr(settings, "HORARIOS_CACHE_TIMEOUT", 3600))
+        except Exception as e:
+            logger.warning("No se pudo guardar en la caché de horarios: %s", e)
+    return datos
+
+
+# ==========================
+# Estadísticas
+# ==========================
+def estadisticas():
+    """{"aciertos", "fallos", "tasa"} acumulados desde el último reinicio."""
+    valores = _cache().get_many([f"horarios:stats:{e}" for e in EVENTOS])
+    datos = {e: int(valores.get(f"horarios:stats:{e}") or 0) for e in EVENTOS}
+    total = datos["aciertos"] + datos["fallos"]
+    datos["tasa"] = round(datos["aciertos"] / total, 4) if total else 0.0
+    return datos
+
+
+def reiniciar_estadisticas():
+    _cache().delete_many([f"horarios:stats:{e}" for e in EVENTOS])
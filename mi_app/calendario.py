@@ -0,0 +1,154 @@
+# calendario.py
+"""
+Feeds iCalendar (.ics) por docente, aula y semestre.
+
+Cada Horario es un evento semanal (RRULE:FREQ=WEEKLY) que se repite
+`Asignatura.semanas` veces desde el inicio de clases, una fecha fija de la
+institución: derivarla de los cambios del horario correría el semestre
+entero en los calendarios suscritos con cada cambio. El acceso va por un
+token firmado con SECRET_KEY (institución, tipo e id), sin sesión: es la URL
+que se pega en Google Calendar, Outlook, etc.
+
+Los eventos se leen de HorarioPlano (solo las semanas vienen de Asignatura,
+por clave primaria).
+
+Los clientes consultan el feed cada pocos minutos; la vista responde con
+ETag y Last-Modified sacados de la versión del horario de la institución
+(versiones.py), así que mientras nada cambie devuelve 304 con una sola
+consulta, sin leer Horario.
+"""
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Aula, Docente, HorarioPlano, Semestre
+
+SAL = "mi_app.calendario"
+
+TIPOS = {
+    "docente": (Docente, "docente_id"),
+    "aula": (Aula, "aula_id"),
+    "semestre": (Semestre, "semestre_id"),
+}
+
+CAMPOS = (
+    "horario_id", "dia_orden", "hora_inicio", "hora_fin", "jornada", "asignatura_nombre",
+    "asignatura__semanas", "docente_nombre", "aula_nombre", "semestre_numero", "carrera_nombre",
+)
+
+
+# ==========================
+# Token
+# ==========================
+def token_calendario(tipo, obj):
+    """Token firmado del feed de `obj` (Docente, Aula o Semestre)."""
+    return signing.Signer(salt=SAL).sign(f"{obj.institucion_id}.{tipo}.{obj.pk}")
+
+
+def leer_token(token):
+    """(institucion_id, tipo, id) del token; lanza signing.BadSignature si no es válido."""
+    valor = signing.Signer(salt=SAL).unsign(token)
+    institucion_id, tipo, obj_id = valor.split(".")
+    if tipo not in TIPOS:
+        raise signing.BadSignature("Tipo de calendario desconocido")
+    return int(institucion_id), tipo, int(obj_id)
+
+
+def url_calendario(tipo, obj):
+    return reverse("calendario_ics", args=[token_calendario(tipo, obj)])
+
+
+# ==========================
+# Formato iCalendar
+# ==========================
+def _texto(valor):
+    return (
+        str(valor or "").replace("\\", "\\\\").replace(";", "\\;")
+        .replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _plegar(linea):
+    """Corta en líneas de 75 octetos como pide RFC 5545 (sin partir caracteres UTF-8)."""
+    partes, actual, largo = [], "", 0
+    for c in linea:
+        n = len(c.encode())
+        if largo + n > 75:
+            partes.append(actual)
+            actual, largo = " ", 1
+        actual += c
+        largo += n
+    partes.append(actual)
+    return "\r\n".join(partes)
+
+
+def _fecha_hora(d, t):
+    return f"{d:%Y%m%d}T{t:%H%M%S}"
+
+
+class SinInicioClases(Exception):
+    """La institución no tiene fecha de inicio de clases: no hay desde dónde repetir los eventos."""
+
+
+def inicio_clases(inst):
+    """
+    Primer día del período: Institucion.inicio_clases o, si no está,
+    HORARIOS_INICIO_CLASES (AAAA-MM-DD). None si no hay ninguno.
+    """
+    if inst.inicio_clases:
+        return inst.inicio_clases
+    fijo = getattr(settings, "HORARIOS_INICIO_CLASES", None)
+    return date.fromisoformat(str(fijo)) if fijo else None
+
+
+def generar_ics(institucion_id, tipo, obj_id, modificado=None):
+    """
+    Texto del feed (2 consultas). Lanza Model.DoesNotExist si el recurso no
+    es de la institución y SinInicioClases si la institución no tiene fecha
+    de inicio.
+    """
+    modelo, campo = TIPOS[tipo]
+    obj = modelo.objects.select_related("institucion").get(pk=obj_id, institucion_id=institucion_id)
+    inicio = inicio_clases(obj.institucion)
+    if inicio is None:
+        raise SinInicioClases(obj.institucion)
+    filas = (
+        HorarioPlano.objects.filter(institucion_id=institucion_id, es_descanso=False, **{campo: obj_id})
+        .order_by("dia_orden", "inicio_min", "horario_id")
+        .values_list(*CAMPOS)
+    )
+
+    sello = (modificado or timezone.now()).astimezone(dt_timezone.utc)
+    lineas = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Hache//Horarios//ES",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_texto(f'Horario {tipo} - {obj}')}",
+        f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+    ]
+    for (h_id, orden, ini, fin, jornada, asignatura, semanas,
+         docente, aula, semestre, carrera) in filas:
+        if not orden or ini is None or fin is None or fin <= ini:
+            continue
+        dia = inicio + timedelta(days=(orden - 1 - inicio.weekday()) % 7)
+        detalle = f"Docente: {docente}\nCarrera: {carrera or '—'} - Semestre {semestre or '—'}\nJornada: {jornada}"
+        lineas += [
+            "BEGIN:VEVENT",
+            f"UID:horario-{h_id}@{institucion_id}.hache",
+            f"DTSTAMP:{sello:%Y%m%dT%H%M%SZ}",
+            # Hora local sin zona ("flotante"): el cliente la toma en su zona (X-WR-TIMEZONE)
+            f"DTSTART:{_fecha_hora(dia, ini)}",
+            f"DTEND:{_fecha_hora(dia, fin)}",
+            f"RRULE:FREQ=WEEKLY;COUNT={max(semanas or 1, 1)}",
+            f"SUMMARY:{_texto(asignatura)}",
+            f"LOCATION:{_texto(aula)}",
+            f"DESCRIPTION:{_texto(detalle)}",
+            "END:VEVENT",
+        ]
+    lineas.append("END:VCALENDAR")
+    return "\r\n".join(_plegar(linea) for linea in lineas) + "\r\n"
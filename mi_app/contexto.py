@@ -0,0 +1,152 @@
+# contexto.py
+"""
+Instantánea inmutable de los datos que necesita una generación de horarios.
+
+`SchedulingContext.cargar` lee todo con un número fijo de consultas
+`values_list` (no depende de cuántas asignaturas haya) y los motores la
+consumen sin volver a tocar el ORM.
+"""
+from collections import namedtuple
+from dataclasses import dataclass, fields
+from types import MappingProxyType
+
+from .models import (
+    Aula, Asignatura, CarreraUniversitaria, NoDisponibilidad, Descanso, Horario
+)
+
+AsignaturaInfo = namedtuple(
+    "AsignaturaInfo",
+    "id nombre jornada semestre_id carrera_id aula_id horas_totales semanas docente_ids",
+)
+# Mismas claves que los dicts ligeros de horarios del motor clásico
+HorarioInfo = namedtuple(
+    "HorarioInfo",
+    "id aula_id hora_inicio hora_fin dia_id asignatura_id docente_id jornada semestre_id",
+)
+DiaInfo = namedtuple("DiaInfo", "id orden nombre")
+NoDispInfo = namedtuple("NoDispInfo", "docente_id dia_id jornada hora_inicio hora_fin")
+DescansoInfo = namedtuple("DescansoInfo", "id dia_id hora_inicio hora_fin nombre")
+
+
+@dataclass(frozen=True)
+class SchedulingContext:
+    institucion_id: int
+    usuario_id: int
+    duracion_hora: int
+    aulas: tuple                # ids de aula, en orden de id
+    dias_por_carrera: MappingProxyType  # carrera_id -> (DiaInfo, ...) por orden
+    asignaturas: tuple          # AsignaturaInfo, en orden de generación
+    no_disponibilidades: tuple  # NoDispInfo
+    no_disp_por_docente_dia: MappingProxyType  # (docente_id, dia_id) -> (NoDispInfo, ...)
+    descansos: tuple            # DescansoInfo del usuario
+    horarios: tuple             # HorarioInfo ya existentes en la institución
+
+    def __reduce__(self):
+        # MappingProxyType no se puede serializar: se envía como dict (p. ej. a
+        # los procesos de la generación en paralelo) y se vuelve a envolver.
+        campos = {f.name: getattr(self, f.name) for f in fields(self)}
+        for nombre, valor in campos.items():
+            if isinstance(valor, MappingProxyType):
+                campos[nombre] = dict(valor)
+        return (_reconstruir_contexto, (campos,))
+
+    @classmethod
+    def cargar(cls, usuario, institucion, sin_propios=False):
+        """
+        Carga la instantánea de `institucion` para `usuario` (7 consultas).
+        `sin_propios`: el horario actual de `usuario` no se carga como
+        ocupación (la generación completa lo reemplaza).
+        """
+        aulas = tuple(
+            Aula.objects.filter(institucion=institucion)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        dias_por_carrera = {}
+        dias_qs = (
+            CarreraUniversitaria.dias_clase.through.objects
+            .filter(carrerauniversitaria__institucion=institucion)
+            .order_by("diasemana__orden", "diasemana_id")
+            .values_list("carrerauniversitaria_id", "diasemana_id", "diasemana__orden", "diasemana__nombre")
+        )
+        for carrera_id, dia_id, orden, nombre in dias_qs:
+            dias_por_carrera.setdefault(carrera_id, []).append(DiaInfo(dia_id, orden, nombre))
+
+        docentes_por_asig = {}
+        docentes_qs = (
+            Asignatura.docentes.through.objects
+            .filter(asignatura__institucion=institucion)
+            .order_by("asignatura_id", "docente_id")
+            .values_list("asignatura_id", "docente_id")
+        )
+        for asig_id, docente_id in docentes_qs:
+            docentes_por_asig.setdefault(asig_id, []).append(docente_id)
+
+        asignaturas = tuple(
+            AsignaturaInfo(
+                id, nombre, jornada, semestre_id, carrera_id, aula_id,
+                horas_totales, semanas, tuple(docentes_por_asig.get(id, ())),
+            )
+            for id, nombre, jornada, semestre_id, carrera_id, aula_id, horas_totales, semanas in (
+                Asignatura.objects.filter(institucion=institucion)
+                .exclude(nombre="DESCANSO")
+                .order_by("semestre__carrera__nombre", "semestre__numero", "nombre")
+                .values_list(
+                    "id", "nombre", "jornada", "semestre_id", "semestre__carrera_id",
+                    "aula_id", "horas_totales", "semanas",
+                )
+            )
+        )
+
+        no_disponibilidades = tuple(
+            NoDispInfo(*fila)
+            for fila in NoDisponibilidad.objects.filter(institucion=institucion)
+            .order_by("id")
+            .values_list("docente_id", "dia_id", "jornada", "hora_inicio", "hora_fin")
+        )
+        no_disp_por_docente_dia = {}
+        for nd in no_disponibilidades:
+            no_disp_por_docente_dia.setdefault((nd.docente_id, nd.dia_id), []).append(nd)
+
+        descansos = tuple(
+            DescansoInfo(*fila)
+            for fila in Descanso.objects.filter(institucion=institucion, usuario=usuario)
+            .order_by("dia__orden", "hora_inicio")
+            .values_list("id", "dia_id", "hora_inicio", "hora_fin", "nombre")
+        )
+
+        existentes = Horario.objects.filter(institucion=institucion)
+        if sin_propios:
+            existentes = existentes.exclude(usuario=usuario)
+        horarios = tuple(
+            HorarioInfo(*fila)
+            for fila in existentes
+            .order_by("id")
+            .values_list(
+                "id", "aula_id", "hora_inicio", "hora_fin", "dia_id",
+                "asignatura_id", "docente_id", "jornada", "asignatura__semestre_id",
+            )
+        )
+
+        return cls(
+            institucion_id=institucion.id,
+            usuario_id=usuario.id,
+            duracion_hora=getattr(institucion, "duracion_hora_minutos", 45),
+            aulas=aulas,
+            dias_por_carrera=MappingProxyType({k: tuple(v) for k, v in dias_por_carrera.items()}),
+            asignaturas=asignaturas,
+            no_disponibilidades=no_disponibilidades,
+            no_disp_por_docente_dia=MappingProxyType(
+                {k: tuple(v) for k, v in no_disp_por_docente_dia.items()}
+            ),
+            descansos=descansos,
+            horarios=horarios,
+        )
+
+
+def _reconstruir_contexto(campos):
+    for f in fields(SchedulingContext):
+        if f.type is MappingProxyType:
+            campos[f.name] = MappingProxyType(campos[f.name])
+    return SchedulingContext(**campos)
@@ -0,0 +1,187 @@
+# diferencias.py
+"""
+Diferencias entre dos horarios: dos instantáneas (HorarioGuardado) o una
+instantánea y el horario actual (tabla Horario).
+
+Cada lado es una lista de Segmento. La comparación son dos uniones por hash,
+en tiempo lineal:
+
+1. Por (asignatura, docente, día, inicio): la sesión sigue en el mismo lugar;
+   si cambió el aula, el fin o la jornada es "modificada".
+2. Lo que quedó sin pareja, por (asignatura, docente): una sesión que se fue
+   y otra que apareció de la misma asignatura con el mismo docente es
+   "movida". El resto son "quitada" (solo antes) y "agregada" (solo después).
+
+Las parejas del paso 2 se forman en el orden de las listas, que llegan
+ordenadas por día y hora (la consulta de `segmentos_actuales` y
+instantaneas.decodificar), así que no hace falta ordenar aquí. Los DESCANSO
+no se comparan: no son de ningún docente.
+"""
+from collections import Counter, deque, namedtuple
+
+from .instantaneas import decodificar
+from .models import Asignatura, Aula, DiaSemana, Docente, Horario
+from .ocupacion import Segmento
+
+# `antes` / `despues`: Segmento o None (agregada / quitada)
+Cambio = namedtuple("Cambio", "tipo antes despues")
+
+TIPOS = {
+    "movida": "Movida",
+    "modificada": "Cambió aula o duración",
+    "agregada": "Agregada",
+    "quitada": "Quitada",
+}
+
+
+# ==========================
+# Lados de la comparación
+# ==========================
+def segmentos_actuales(institucion_id, usuario_id):
+    """Segmentos del horario actual de `usuario_id` en `institucion_id`, por día y hora (una consulta)."""
+    return [
+        Segmento(*fila) for fila in
+        Horario.objects.filter(institucion_id=institucion_id, usuario_id=usuario_id)
+        .order_by("dia_id", "hora_inicio", "id")
+        .values_list(*Segmento._fields)
+    ]
+
+
+def segmentos_guardados(guardado):
+    """Segmentos de una instantánea. Lanza ValueError si no se puede leer."""
+    if guardado.contenido is None:
+        raise ValueError("Esta instantánea no tiene filas guardadas y no se puede comparar.")
+    return decodificar(guardado.contenido)
+
+
+# ==========================
+# Comparación
+# ==========================
+def comparar(antes, despues, ignorar=()):
+    """
+    Lista de Cambio de `antes` a `despues` (listas de Segmento).
+    `ignorar`: ids de asignatura que no se comparan (los DESCANSO).
+    """
+    ignorar = set(ignorar)
+    antes = [s for s in antes if s.asignatura_id not in ignorar]
+    despues = [s for s in despues if s.asignatura_id not in ignorar]
+    cambios = []
+
+    # 1) Misma asignatura, docente, día e inicio
+    lugar = {}
+    for i, s in enumerate(antes):
+        lugar.setdefault((s.asignatura_id, s.docente_id, s.dia_id, s.hora_inicio), deque()).append(i)
+    emparejada = [False] * len(antes)
+    nuevas = []
+    for s in despues:
+        cola = lugar.get((s.asignatura_id, s.docente_id, s.dia_id, s.hora_inicio))
+        if cola:
+            i = cola.popleft()
+            emparejada[i] = True
+            if antes[i] != s:
+                cambios.append(Cambio("modificada", antes[i], s))
+        else:
+            nuevas.append(s)
+
+    # 2) Lo que quedó suelto: misma asignatura y docente en otro lugar
+    sueltas = {}
+    for i, s in enumerate(antes):
+        if not emparejada[i]:
+            sueltas.setdefault((s.asignatura_id, s.docente_id), deque()).append(s)
+    for s in nuevas:
+        cola = sueltas.get((s.asignatura_id, s.docente_id))
+        if cola:
+            cambios.append(Cambio("movida", cola.popleft(), s))
+        else:
+            cambios.append(Cambio("agregada", None, s))
+    for cola in sueltas.values():
+        cambios.extend(Cambio("quitada", s, None) for s in cola)
+    return cambios
+
+
+def _aulas(c):
+    return {s.aula_id for s in (c.antes, c.despues) if s is not None}
+
+
+# ==========================
+# Resumen
+# ==========================
+def _nombres(modelo, ids):
+    return dict(modelo.objects.filter(pk__in=ids).values_list("pk", "nombre"))
+
+
+def resumen(cambios):
+    """
+    Diccionario serializable (JSON) de `cambios`: totales por tipo, y por
+    docente y por aula sus totales y el detalle de cada sesión, con nombres
+    (cuatro consultas, una por modelo).
+    """
+    segmentos = [s for c in cambios for s in (c.antes, c.despues) if s is not None]
+    asignaturas = _nombres(Asignatura, {s.asignatura_id for s in segmentos})
+    docentes = _nombres(Docente, {s.docente_id for s in segmentos})
+    aulas = _nombres(Aula, {s.aula_id for s in segmentos})
+    dias = _nombres(DiaSemana, {s.dia_id for s in segmentos})
+
+    def sesion(s):
+        if s is None:
+            return None
+        return {
+            "dia": dias.get(s.dia_id, f"#{s.dia_id}"),
+            "inicio": s.hora_inicio.strftime("%H:%M") if s.hora_inicio else None,
+            "fin": s.hora_fin.strftime("%H:%M") if s.hora_fin else None,
+            "jornada": s.jornada,
+            "aula": aulas.get(s.aula_id, f"#{s.aula_id}"),
+        }
+
+    por_docente, por_aula = {}, {}
+    for c in cambios:
+        s = c.antes or c.despues
+        d = por_docente.setdefault(s.docente_id, {
+            "id": s.docente_id, "nombre": docentes.get(s.docente_id, f"#{s.docente_id}"),
+            "totales": Counter(), "cambios": [],
+        })
+        d["totales"][c.tipo] += 1
+        d["cambios"].append({
+            "tipo": c.tipo,
+            "asignatura": asignaturas.get(s.asignatura_id, f"#{s.asignatura_id}"),
+            "antes": sesion(c.antes),
+            "despues": sesion(c.despues),
+        })
+        for aula_id in _aulas(c):
+            a = por_aula.setdefault(aula_id, {
+                "id": aula_id, "nombre": aulas.get(aula_id, f"#{aula_id}"), "totales": Counter(),
+            })
+            a["totales"][c.tipo] += 1
+
+    def ordenar(filas):
+        return [
+            {**f, "totales": {t: f["totales"].get(t, 0) for t in TIPOS}}
+            for f in sorted(filas.values(), key=lambda f: (-sum(f["totales"].values()), f["nombre"]))
+        ]
+
+    totales = Counter(c.tipo for c in cambios)
+    return {
+        "totales": {t: totales.get(t, 0) for t in TIPOS},
+        "docentes": ordenar(por_docente),
+        "aulas": ordenar(por_aula),
+    }
+
+
+def descansos(institucion_id):
+    """Ids de las asignaturas DESCANSO de la institución (lo que `comparar` ignora)."""
+    return set(
+        Asignatura.objects.filter(institucion_id=institucion_id, nombre="DESCANSO").values_list("pk", flat=True)
+    )
+
+
+def diferencias(guardado, contra=None):
+    """
+    Resumen de los cambios de la instantánea `guardado` a `contra` (otra
+    instantánea) o, sin `contra`, al horario actual de su usuario.
+    """
+    antes = segmentos_guardados(guardado)
+    if contra is None:
+        despues = segmentos_actuales(guardado.institucion_id, guardado.usuario_id)
+    else:
+        despues = segmentos_guardados(contra)
+    return resumen(comparar(antes, despues, ignorar=descansos(guardado.institucion_id)))
@@ -0,0 +1,146 @@
+# exportacion.py
+"""
+Exportación a PDF con caché en disco.
+
+Renderizar `pdf_horarios.html` con WeasyPrint cuesta varios segundos de CPU en
+horarios grandes. El PDF se guarda en HORARIOS_EXPORT_DIR con una clave que
+resume exactamente lo que se imprime (filas y nombres visibles, filtros y
+versión de la plantilla): mientras el horario no cambie, las descargas
+siguientes sirven el archivo tal cual, y cualquier cambio real da otra clave.
+
+La huella sale de una consulta `values_list` sobre HorarioPlano (una tabla,
+barata frente al render). El render lo hace una tarea de Celery si hay
+workers, o la propia petición si no.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.template.loader import get_template
+
+from .models import HorarioPlano
+
+logger = logging.getLogger(__name__)
+
+# Subir al cambiar pdf_horarios.html: invalida los PDF ya generados
+VERSION_PLANTILLA = 2
+
+FILTROS = ("carrera", "docente")
+
+CAMPOS_HUELLA = (
+    "horario_id", "dia_orden", "dia_nombre", "hora_inicio", "hora_fin", "jornada",
+    "asignatura_nombre", "semestre_numero", "carrera_nombre", "docente_nombre", "aula_nombre",
+)
+
+
+def filtros_pdf(datos):
+    """Filtros reconocidos de `datos` (p. ej. request.GET), normalizados a enteros."""
+    filtros = {}
+    for campo in FILTROS:
+        valor = str(datos.get(campo) or "").strip()
+        if valor.isdigit():
+            filtros[campo] = int(valor)
+    return filtros
+
+
+def _queryset(usuario_id, filtros):
+    qs = HorarioPlano.objects.filter(usuario_id=usuario_id)
+    if "carrera" in filtros:
+        qs = qs.filter(carrera_id=filtros["carrera"])
+    if "docente" in filtros:
+        qs = qs.filter(docente_id=filtros["docente"])
+    return qs
+
+
+def _directorio(usuario_id):
+    return Path(getattr(settings, "HORARIOS_EXPORT_DIR", settings.BASE_DIR / "exports")) / str(usuario_id)
+
+
+def _prefijo(filtros):
+    return "-".join(f"{k}{v}" for k, v in sorted(filtros.items())) or "todo"
+
+
+# ==========================
+# Clave
+# ==========================
+def clave_pdf(usuario_id, filtros):
+    """Huella (sha256) de lo que imprimiría el PDF de `usuario_id` con `filtros` (una consulta)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([VERSION_PLANTILLA, usuario_id, sorted(filtros.items())]).encode())
+    for fila in _queryset(usuario_id, filtros).order_by("horario_id").values_list(*CAMPOS_HUELLA):
+        h.update(repr(fila).encode())
+    return h.hexdigest()
+
+
+def ruta_pdf(usuario_id, filtros, clave):
+    return _directorio(usuario_id) / f"{_prefijo(filtros)}_{clave[:32]}.pdf"
+
+
+def _marca_pendiente(ruta):
+    return ruta.with_suffix(".pendiente")
+
+
+def pdf_en_curso(ruta):
+    """
+    True si otro proceso ya está renderizando `ruta`: hay una marca de hace
+    menos de HORARIOS_PDF_PENDIENTE_SEGUNDOS (un render tarda segundos; una
+    marca más vieja es de un worker que se cayó y no se espera por ella).
+    """
+    try:
+        edad = time.time() - _marca_pendiente(ruta).stat().st_mtime
+    except FileNotFoundError:
+        return False
+    return edad < getattr(settings, "HORARIOS_PDF_PENDIENTE_SEGUNDOS", 120)
+
+
+def marcar_pendiente(ruta):
+    """Marca `ruta` como en curso; devuelve la marca (para quitarla si el envío falla)."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    marca = _marca_pendiente(ruta)
+    marca.touch()
+    return marca
+
+
+# ==========================
+# Render
+# ==========================
+def _escribir_pdf(html, destino):
+    from weasyprint import HTML  # import diferido: requiere librerías nativas (pango)
+
+    HTML(string=html).write_pdf(destino)
+
+
+def renderizar_pdf(usuario_id, filtros, clave=None):
+    """
+    Genera (si hace falta) el PDF de `usuario_id` con `filtros` y devuelve su
+    ruta. Escribe en un temporal y lo renombra, así nunca se sirve un PDF a
+    medias; al terminar borra los PDF anteriores de los mismos filtros.
+    """
+    clave = clave or clave_pdf(usuario_id, filtros)
+    ruta = ruta_pdf(usuario_id, filtros, clave)
+    if ruta.exists():
+        return ruta
+
+    usuario = get_user_model().objects.get(pk=usuario_id)
+    horarios = _queryset(usuario_id, filtros).order_by("dia_orden", "inicio_min", "horario_id")
+    html = get_template("pdf_horarios.html").render({"horarios": horarios, "usuario": usuario})
+
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        _escribir_pdf(html, temporal)
+        os.replace(temporal, ruta)
+    finally:
+        temporal.unlink(missing_ok=True)
+        _marca_pendiente(ruta).unlink(missing_ok=True)
+
+    for viejo in ruta.parent.glob(f"{_prefijo(filtros)}_*.pdf"):
+        if viejo != ruta:
+            viejo.unlink(missing_ok=True)
+    logger.info("PDF de horarios generado: %s", ruta)
+    return ruta
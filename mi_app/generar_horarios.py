@@ -1,21 +1,34 @@
 
-import time, gc, logging
+import time, logging
 from datetime import time as _time
+from django.conf import settings
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
 from mi_app.models import (
-    Horario, NoDisponibilidad, Descanso,
-    Institucion, Asignatura
+    Horario, Institucion, Asignatura, Docente, GeneracionJob
 )
 from mi_app.utils import (
     obtener_asignatura_descanso, obtener_docente_placeholder,
     obtener_aula_placeholder, asignar_horario_automatico
 )
+from mi_app.contexto import SchedulingContext
+from mi_app.instantaneas import guardar_instantanea
+from mi_app.lotes import ControladorLotes
+from mi_app.ocupacion import Segmento
+from mi_app.particion import resolver_por_componentes
+from mi_app.persistencia import guardar_segmentos
 from mi_app.tasks import generar_horarios_task
+from mi_app.plano import sincronizar
+from mi_app.versiones import tocar_version
+from mi_app.workers import hay_workers, olvidar_workers
 
 logger = logging.getLogger(__name__)
 
+MOTORES = ("bitmask", "clasico", "exacto")
+
 def generar_horarios_view(request, admin_instance):
     """
     Genera los horarios usando Celery si está disponible.
@@ -49,67 +62,161 @@ def generar_horarios_view(request, admin_instance):
             messages.error(request, "Tu usuario no tiene institución asociada.")
             return redirect("..")
 
-    # 2️⃣ Limpieza inicial
-    Horario.objects.filter(usuario=request.user, institucion=inst).delete()
+    motor = request.GET.get("motor")
+    if motor and motor not in MOTORES:
+        messages.error(request, f"Motor desconocido: {motor}. Opciones: {', '.join(MOTORES)}")
+        return redirect("..")
+
+    if GeneracionJob.hay_activa(request.user, inst):
+        messages.warning(request, "Ya hay una generación en curso; espera a que termine o cancélala.")
+        return redirect("..")
+
+    # 2️⃣ Instantánea del horario anterior (el horario se reemplaza al escribir
+    # el nuevo: si la generación se cancela o falla, queda el anterior)
+    if getattr(settings, "HORARIOS_INSTANTANEA_AL_GENERAR", True):
+        guardar_instantanea(
+            request.user, inst, nombre=f"Antes de generar ({timezone.localtime():%Y-%m-%d %H:%M})"
+        )
+    job = GeneracionJob.objects.create(usuario=request.user, institucion=inst, motor=motor or "")
 
     # 3️⃣ Si Celery está activo, ejecutar en segundo plano
-    try:
-        from mi_proyecto.celery import current_app
-        if current_app.control.inspect().active():
-            generar_horarios_task.delay(request.user.id, inst.id)
-            messages.success(request, "Generación de horarios enviada a Celery. Se procesará en segundo plano.")
+    if hay_workers():
+        try:
+            generar_horarios_task.delay(request.user.id, inst.id, motor, job.id)
+            messages.success(
+                request,
+                "Generación de horarios enviada a Celery. El avance se muestra en la lista de horarios.",
+            )
             return redirect("..")
-    except Exception as e:
-        logger.warning(f"Celery no disponible: {e}")
+        except Exception as e:
+            olvidar_workers()
+            logger.warning(f"Celery no disponible: {e}")
 
     # 4️⃣ Si no hay Celery, ejecuta localmente (modo Render)
-    todos_los_horarios_qs = Horario.objects.filter(institucion=inst).select_related(
-        "aula", "dia", "asignatura", "docente"
+    # import diferido: jobs importa este módulo
+    from mi_app.jobs import ejecutar_job
+    job = ejecutar_job(job)
+
+    # 7️⃣ Mensaje final
+    if job.estado == GeneracionJob.FALLIDO:
+        messages.error(request, f"❌ La generación falló: {job.error}")
+        return redirect("..")
+
+    errores = [f"{r['asignatura']} → {r['motivo']}" for r in job.fallidas]
+    if errores:
+        if len(errores) > 20:
+            errores = errores[:20] + ["... (algunas asignaturas más sin espacio)"]
+        for e in errores:
+            messages.warning(request, e)
+    else:
+        messages.success(request, "✅ ¡Horarios generados exitosamente!")
+
+    return redirect("..")
+
+
+def generar_horarios_local(usuario, inst, motor=None, presupuesto=None, avance=None):
+    """
+    Genera en el proceso actual los horarios de `usuario` en `inst`.
+    `motor`: "bitmask" (máscaras de bits), "clasico" (listas en memoria) o
+    "exacto" (búsqueda con retroceso, limitada a `presupuesto` segundos);
+    por defecto settings.HORARIOS_MOTOR. Devuelve la lista de errores.
+    """
+    resultados = generar_horarios_resultados(usuario, inst, motor, presupuesto, avance)
+    return [f"{nombre} → {motivo}" for nombre, ok, motivo in resultados if not ok]
+
+
+def generar_horarios_resultados(usuario, inst, motor=None, presupuesto=None, avance=None):
+    """
+    Igual que generar_horarios_local, pero devuelve el resultado de cada
+    asignatura: [(nombre, ok, motivo), ...]. El horario actual de `usuario`
+    en `inst` se reemplaza. `avance(hechas, total)` se llama en cada límite
+    de lote; si lanza una excepción, la generación se corta y queda el
+    horario anterior.
+    """
+    # Los marcadores se crean antes de cargar el contexto (SIN AULA es candidata)
+    obtener_docente_placeholder(inst)
+    obtener_aula_placeholder(inst)
+
+    contexto = SchedulingContext.cargar(usuario, inst, sin_propios=True)
+
+    motor = motor or getattr(settings, "HORARIOS_MOTOR", "bitmask")
+    if motor == "clasico":
+        # El motor clásico escribe por su cuenta (asignar_horario_automatico),
+        # lote a lote: se borra el horario anterior y se repone si algo falla
+        anteriores = [
+            Segmento(*fila) for fila in
+            Horario.objects.filter(usuario=usuario, institucion=inst).values_list(*Segmento._fields)
+        ]
+        guardar_segmentos(usuario, inst, [], reemplazar=True)
+        try:
+            resultados = _generar_clasico(usuario, inst, contexto, avance)
+        except Exception:
+            guardar_segmentos(usuario, inst, anteriores, validar=False, reemplazar=True)
+            raise
+        guardar_segmentos(usuario, inst, segmentos_descanso(inst, contexto))
+        sincronizar(inst.id, usuario.id)
+        return resultados
+
+    if motor == "exacto" and presupuesto is None:
+        presupuesto = getattr(settings, "HORARIOS_EXACTO_PRESUPUESTO", 20)
+
+    # Fase de cálculo: todo en memoria, sin tocar el ORM
+    t0 = time.monotonic()
+    procesos = getattr(settings, "HORARIOS_PROCESOS", None)
+    resultados, segmentos = resolver_por_componentes(contexto, motor, procesos, presupuesto, avance)
+    calculo = time.monotonic() - t0
+
+    # Fase de escritura: reemplazo del horario anterior por clases + descansos (6️⃣), en una transacción
+    guardar_segmentos(usuario, inst, segmentos + segmentos_descanso(inst, contexto), reemplazar=True)
+    logger.info(
+        "Motor %s: %d segmentos; cálculo %.1fs, escritura %.1fs",
+        motor, len(segmentos), calculo, time.monotonic() - t0 - calculo,
     )
-    todos_los_horarios = [
-        {
-            "id": h.id,
-            "aula_id": h.aula_id,
-            "hora_inicio": h.hora_inicio,
-            "hora_fin": h.hora_fin,
-            "dia_id": h.dia_id,
-            "asignatura_id": h.asignatura_id,
-            "docente_id": h.docente_id,
-            "jornada": h.jornada,
-            "semestre_id": getattr(h.asignatura.semestre, "id", None),
-        }
-        for h in todos_los_horarios_qs.iterator(chunk_size=30)
-    ]
-
-    todas_las_no_disp = list(NoDisponibilidad.objects.filter(institucion=inst))
-    todos_los_descansos = list(Descanso.objects.filter(institucion=inst, usuario=request.user))
+    return [(asig.nombre, ok, motivo) for asig, ok, motivo in resultados]
 
+
+def segmentos_descanso(inst, contexto):
+    """Segmentos de los descansos de `contexto` (asignatura DESCANSO y marcadores)."""
     asig_descanso = obtener_asignatura_descanso(inst)
     docente_placeholder = obtener_docente_placeholder(inst)
     aula_placeholder = obtener_aula_placeholder(inst)
 
+    segmentos = []
+    for d in contexto.descansos:
+        if d.hora_inicio < _time(13, 30):
+            jornada = "Mañana"
+        elif d.hora_inicio < _time(18, 15):
+            jornada = "Tarde"
+        else:
+            jornada = "Noche"
+
+        segmentos.append(Segmento(
+            asig_descanso.id, docente_placeholder.id, aula_placeholder.id,
+            d.dia_id, jornada, d.hora_inicio, d.hora_fin,
+        ))
+    return segmentos
+
+
+def _generar_clasico(usuario, inst, contexto, avance=None):
+    """Motor de listas en memoria (utils.asignar_horario_automatico)."""
+    todos_los_horarios = [h._asdict() for h in contexto.horarios]
+
     asignaturas_qs = (
         Asignatura.objects.select_related("semestre__carrera")
-        .prefetch_related("docentes")
+        .prefetch_related(Prefetch("docentes", queryset=Docente.objects.order_by("id")))
         .filter(institucion=inst)
         .exclude(nombre="DESCANSO")
         .order_by("semestre__carrera__nombre", "semestre__numero", "nombre")
     )
 
-    def dividir_en_lotes_iter(qs, tamano):
-        buf = []
-        for a in qs.iterator(chunk_size=25):
-            buf.append(a)
-            if len(buf) >= tamano:
-                yield buf
-                buf = []
-        if buf:
-            yield buf
-
-    errores = []
+    resultados = []
+    total = len(contexto.asignaturas)
+    controlador = ControladorLotes()
 
-    # 5️⃣ Procesar en lotes pequeños
-    for lote in dividir_en_lotes_iter(asignaturas_qs, 8):
+    # 5️⃣ Procesar en lotes (tamaño según el presupuesto de memoria)
+    for lote in controlador.lotes(asignaturas_qs.iterator(chunk_size=100)):
+        if avance:
+            avance(len(resultados), total)
         with transaction.atomic():
             docentes_por_asig = {a.id: list(a.docentes.all()) for a in lote}
             for asignatura in lote:
@@ -117,51 +224,14 @@ def generar_horarios_view(request, admin_instance):
                 ok, motivo = asignar_horario_automatico(
                     asignatura=asignatura,
                     horarios=todos_los_horarios,
-                    no_disponibilidades=todas_las_no_disp,
-                    descansos=todos_los_descansos,
-                    usuario=request.user,
+                    no_disponibilidades=contexto.no_disp_por_docente_dia,
+                    descansos=contexto.descansos,
+                    usuario=usuario,
                     institucion=inst,
                     docentes_precargados=docentes_precargados,
                     con_motivo=True,
                 )
-                if not ok:
-                    errores.append(f"{asignatura.nombre} → {motivo}")
-        gc.collect()
-        time.sleep(0.3)
-
-    # 6️⃣ Crear descansos
-    nuevos_descansos = []
-    for d in todos_los_descansos:
-        if d.hora_inicio < _time(13, 30):
-            jornada = "Mañana"
-        elif d.hora_inicio < _time(18, 15):
-            jornada = "Tarde"
-        else:
-            jornada = "Noche"
-
-        nuevos_descansos.append(
-            Horario(
-                usuario=request.user,
-                institucion=inst,
-                asignatura=asig_descanso,
-                docente=docente_placeholder,
-                aula=aula_placeholder,
-                dia=d.dia,
-                jornada=jornada,
-                hora_inicio=d.hora_inicio,
-                hora_fin=d.hora_fin,
-            )
-        )
-    if nuevos_descansos:
-        Horario.objects.bulk_create(nuevos_descansos)
-
-    # 7️⃣ Mensaje final
-    if errores:
-        if len(errores) > 20:
-            errores = errores[:20] + ["... (algunas asignaturas más sin espacio)"]
-        for e in errores:
-            messages.warning(request, e)
-    else:
-        messages.success(request, "✅ ¡Horarios generados exitosamente!")
+                resultados.append((asignatura.nombre, ok, motivo))
+            tocar_version(inst.id, usuario.id)
 
-    return redirect("..")
+    return resultados
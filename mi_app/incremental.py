@@ -0,0 +1,117 @@
+# incremental.py
+"""
+Reprogramación incremental del horario ya generado.
+
+Cuando cambia una asignatura, la no disponibilidad de un docente o un
+descanso, no hace falta borrar y regenerar toda la institución: se quitan
+solo las filas Horario de las asignaturas afectadas y se vuelven a ubicar con
+el motor de máscaras, tomando el resto del horario como ocupación fija.
+"""
+import logging
+import time
+from dataclasses import replace
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+
+from .contexto import SchedulingContext
+from .generar_horarios import segmentos_descanso
+from .models import Asignatura, Descanso, Horario
+from .particion import resolver_componente
+from .persistencia import guardar_segmentos
+from .utils import obtener_asignatura_descanso
+from .plano import sincronizar
+from .versiones import tocar_version
+
+logger = logging.getLogger(__name__)
+
+
+def _choca_con_descanso(horario, descansos_por_dia):
+    dia_id, ini, fin = horario
+    return any(
+        d_ini < fin and d_fin > ini for d_ini, d_fin in descansos_por_dia.get(dia_id, ())
+    )
+
+
+def reprogramar_incremental(usuario, inst, asignatura_ids=(), docente_ids=(), descansos=False):
+    """
+    Reubica en el horario de `usuario` solo lo afectado por un cambio:
+
+    - `asignatura_ids`: asignaturas editadas o creadas.
+    - `docente_ids`: docentes cuya no disponibilidad cambió (se reubican las
+      asignaturas que dicta: aquellas en que es el primer docente, el que
+      asigna el motor).
+    - `descansos`: los descansos del usuario cambiaron; se rehacen las filas
+      DESCANSO y se reubican las clases que ahora chocan con alguno.
+
+    Devuelve la lista de errores, o None si el usuario aún no tiene horario
+    generado en `inst` (no hay nada que mantener).
+    """
+    if not getattr(settings, "HORARIOS_INCREMENTAL", True):
+        return None
+
+    propios = Horario.objects.filter(usuario=usuario, institucion=inst)
+    if not propios.exists():
+        return None
+
+    t0 = time.monotonic()
+    asig_descanso = obtener_asignatura_descanso(inst)
+    afectadas = set(asignatura_ids)
+    if docente_ids:
+        # El motor asigna el docente de menor id (SchedulingContext.docente_ids[0])
+        afectadas.update(
+            Asignatura.docentes.through.objects
+            .filter(asignatura__institucion=inst)
+            .values("asignatura_id")
+            .annotate(asignado=Min("docente_id"))
+            .filter(asignado__in=docente_ids)
+            .values_list("asignatura_id", flat=True)
+        )
+
+    with transaction.atomic():
+        if descansos:
+            propios.filter(asignatura=asig_descanso).delete()
+            por_dia = {}
+            for dia_id, ini, fin in (
+                Descanso.objects.filter(institucion=inst, usuario=usuario)
+                .values_list("dia_id", "hora_inicio", "hora_fin")
+            ):
+                por_dia.setdefault(dia_id, []).append((ini, fin))
+            filas = (
+                propios.filter(dia_id__in=por_dia, hora_inicio__isnull=False, hora_fin__isnull=False)
+                .values_list("asignatura_id", "dia_id", "hora_inicio", "hora_fin")
+            )
+            afectadas.update(a for a, *h in filas if _choca_con_descanso(h, por_dia))
+
+        afectadas.discard(asig_descanso.id)
+        if afectadas:
+            propios.filter(asignatura_id__in=afectadas).delete()
+
+        # El resto del horario (de todos los usuarios) queda como ocupación fija
+        contexto = SchedulingContext.cargar(usuario, inst)
+        errores, segmentos = [], []
+        if afectadas:
+            contexto_afectadas = replace(
+                contexto,
+                asignaturas=tuple(a for a in contexto.asignaturas if a.id in afectadas),
+            )
+            resultados, segmentos = resolver_componente(contexto_afectadas, "bitmask")
+            errores = [f"{asig.nombre} → {motivo}" for asig, ok, motivo in resultados if not ok]
+        if descansos:
+            segmentos = segmentos + segmentos_descanso(inst, contexto)
+
+        # Una sola escritura: sube la versión y sincroniza la copia plana una vez,
+        # ya con el horario completo
+        if segmentos:
+            guardar_segmentos(usuario, inst, segmentos)
+        elif afectadas or descansos:
+            # Solo hubo borrados (nada que escribir): guardar_segmentos no corre
+            tocar_version(inst.id, usuario.id)
+            sincronizar(inst.id, usuario.id)
+
+    logger.info(
+        "Reprogramación incremental: %d asignaturas en %.1f ms",
+        len(afectadas), (time.monotonic() - t0) * 1000,
+    )
+    return errores
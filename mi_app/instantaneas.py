@@ -0,0 +1,243 @@
+# instantaneas.py
+"""
+Instantáneas del horario (HorarioGuardado): guardar el horario de un usuario
+antes de regenerarlo y volver a él de una vez.
+
+Formato (`contenido`): una cabecera fija (magia, formato, codec, filas) y,
+comprimidas con Brotli (o zlib si Brotli no está), las columnas de los
+Segmento: ids de asignatura, docente, aula y día como diferencias con la
+fila anterior (enteros de 32 bits), la jornada como índice en una lista y las
+horas en minutos desde la medianoche (16 bits). Las filas van ordenadas por
+día y hora, así que las diferencias son casi todas pequeñas y repetidas:
+10.000 filas ocupan unos pocos KB.
+
+Restaurar borra el horario actual del usuario y escribe el de la instantánea
+con persistencia.guardar_segmentos (COPY en PostgreSQL), en una transacción.
+Las filas cuya asignatura, docente, aula o día ya no existe se omiten.
+
+Retención (`aplicar_retencion`, al guardar y con el comando
+podar_instantaneas): se conservan siempre las HORARIOS_INSTANTANEAS_RECIENTES
+más nuevas y las marcadas `conservar`; de las demás, una por día durante
+HORARIOS_INSTANTANEAS_DIAS días; el resto se borra.
+"""
+import array
+import logging
+import struct
+import sys
+import zlib
+from datetime import time, timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Asignatura, Aula, DiaSemana, Docente, GeneracionJob, Horario, HorarioGuardado
+from .ocupacion import Segmento
+from .persistencia import guardar_segmentos
+
+try:
+    import brotli
+except ImportError:  # opcional: sin Brotli se comprime con zlib
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MAGIA = b"HGC"
+FORMATO = 1
+ZLIB, BROTLI = 1, 2
+CODECS = {"zlib": ZLIB, "brotli": BROTLI}
+CABECERA = struct.Struct("<3sBBI")  # magia, formato, codec, filas
+
+COLUMNAS_ID = ("asignatura_id", "docente_id", "aula_id", "dia_id")
+SIN_HORA = 0xFFFF
+
+# Modelo de cada columna de ids (para omitir al restaurar lo que ya no existe)
+MODELOS = {
+    "asignatura_id": Asignatura,
+    "docente_id": Docente,
+    "aula_id": Aula,
+    "dia_id": DiaSemana,
+}
+
+
+# ==========================
+# Formato
+# ==========================
+def _minutos(t):
+    return SIN_HORA if t is None else t.hour * 60 + t.minute
+
+
+def _bytes(arr):
+    # Siempre little-endian, sea cual sea la máquina que escribe o lee
+    if sys.byteorder == "big":
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _array(tipo, datos, inicio, n):
+    arr = array.array(tipo)
+    fin = inicio + n * arr.itemsize
+    arr.frombytes(datos[inicio:fin])
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr, fin
+
+
+def _diferencias(valores):
+    anterior = 0
+    for v in valores:
+        yield v - anterior
+        anterior = v
+
+
+def codificar(segmentos, codec=None):
+    """Bytes de la instantánea de `segmentos` (iterable de Segmento)."""
+    codec = codec or getattr(settings, "HORARIOS_INSTANTANEAS_CODEC", "brotli")
+    if codec == "brotli" and brotli is None:
+        codec = "zlib"
+    filas = sorted(segmentos, key=lambda s: (s.dia_id, _minutos(s.hora_inicio), s.asignatura_id))
+    jornadas = sorted({s.jornada for s in filas})
+    indice = {j: i for i, j in enumerate(jornadas)}
+
+    nombres = "\n".join(jornadas).encode()
+    partes = [struct.pack("<H", len(nombres)), nombres]
+    for columna in COLUMNAS_ID:
+        partes.append(_bytes(array.array("i", _diferencias(getattr(s, columna) for s in filas))))
+    partes.append(_bytes(array.array("B", (indice[s.jornada] for s in filas))))
+    partes.append(_bytes(array.array("H", (_minutos(s.hora_inicio) for s in filas))))
+    partes.append(_bytes(array.array("H", (_minutos(s.hora_fin) for s in filas))))
+    crudo = b"".join(partes)
+
+    if codec == "brotli":
+        comprimido = brotli.compress(crudo, quality=9)
+    else:
+        comprimido = zlib.compress(crudo, 9)
+    return CABECERA.pack(MAGIA, FORMATO, CODECS[codec], len(filas)) + comprimido
+
+
+def decodificar(contenido):
+    """Lista de Segmento de una instantánea. Lanza ValueError si el formato no es válido."""
+    contenido = bytes(contenido or b"")
+    if len(contenido) < CABECERA.size:
+        raise ValueError("La instantánea está vacía o incompleta.")
+    magia, formato, codec, n = CABECERA.unpack_from(contenido)
+    if magia != MAGIA or formato != FORMATO:
+        raise ValueError("Formato de instantánea desconocido.")
+    cuerpo = contenido[CABECERA.size:]
+    if codec == BROTLI:
+        if brotli is None:
+            raise ValueError("La instantánea está comprimida con Brotli y no está instalado.")
+        crudo = brotli.decompress(cuerpo)
+    elif codec == ZLIB:
+        crudo = zlib.decompress(cuerpo)
+    else:
+        raise ValueError(f"Codec de instantánea desconocido: {codec}")
+
+    (largo,) = struct.unpack_from("<H", crudo)
+    pos = 2 + largo
+    jornadas = crudo[2:pos].decode().split("\n")
+    columnas = []
+    for _ in COLUMNAS_ID:
+        diferencias, pos = _array("i", crudo, pos, n)
+        columnas.append(accumulate(diferencias))
+    indices, pos = _array("B", crudo, pos, n)
+    inicios, pos = _array("H", crudo, pos, n)
+    fines, pos = _array("H", crudo, pos, n)
+
+    horas = {}
+
+    def hora(m):
+        if m == SIN_HORA:
+            return None
+        if m not in horas:
+            horas[m] = time(m // 60, m % 60)
+        return horas[m]
+
+    return [
+        Segmento(asignatura_id, docente_id, aula_id, dia_id, jornadas[j], hora(ini), hora(fin))
+        for asignatura_id, docente_id, aula_id, dia_id, j, ini, fin
+        in zip(*columnas, indices, inicios, fines)
+    ]
+
+
+# ==========================
+# Guardar y restaurar
+# ==========================
+def guardar_instantanea(usuario, inst, nombre=None, conservar=False):
+    """
+    Guarda el horario actual de `usuario` en `inst` (una consulta de lectura
+    y un INSERT) y aplica la retención. Devuelve el HorarioGuardado, o None
+    si no hay horario que guardar.
+    """
+    segmentos = [
+        Segmento(*fila) for fila in
+        Horario.objects.filter(institucion=inst, usuario=usuario).values_list(*Segmento._fields)
+    ]
+    if not segmentos:
+        return None
+    contenido = codificar(segmentos)
+    codec = {v: k for k, v in CODECS.items()}[CABECERA.unpack_from(contenido)[2]]
+    guardado = HorarioGuardado.objects.create(
+        institucion=inst, usuario=usuario,
+        nombre=nombre or f"Horario del {timezone.localtime():%Y-%m-%d %H:%M}",
+        contenido=contenido, filas=len(segmentos), tamano=len(contenido), conservar=conservar,
+        datos={"formato": FORMATO, "codec": codec},
+    )
+    logger.info("Instantánea %s: %d filas en %d bytes (%s)", guardado.pk, len(segmentos), len(contenido), codec)
+    aplicar_retencion(inst.id, usuario.id)
+    return guardado
+
+
+def restaurar_instantanea(guardado):
+    """
+    Reemplaza el horario del usuario de `guardado` por el de la instantánea,
+    en una transacción. Devuelve (restauradas, omitidas); omitidas son las
+    filas cuya asignatura, docente, aula o día ya no existe en la institución.
+    Lanza ValueError si el usuario tiene una generación en curso (la escritura
+    de esa generación reemplazaría lo restaurado).
+    """
+    if guardado.contenido is None:
+        raise ValueError("Esta instantánea no tiene filas guardadas y no se puede restaurar.")
+    inst, usuario = guardado.institucion, guardado.usuario
+    if GeneracionJob.hay_activa(usuario, inst):
+        raise ValueError("Hay una generación en curso; espera a que termine o cancélala antes de restaurar.")
+    segmentos = decodificar(guardado.contenido)
+
+    existentes = {
+        columna: set(modelo.objects.filter(
+            institucion=inst, pk__in={getattr(s, columna) for s in segmentos},
+        ).values_list("pk", flat=True))
+        for columna, modelo in MODELOS.items()
+    }
+    validos = [s for s in segmentos if all(getattr(s, c) in ids for c, ids in existentes.items())]
+
+    guardar_segmentos(usuario, inst, validos, validar=False, reemplazar=True)
+    omitidas = len(segmentos) - len(validos)
+    if omitidas:
+        logger.warning("Instantánea %s: %d filas omitidas (datos borrados)", guardado.pk, omitidas)
+    return len(validos), omitidas
+
+
+# ==========================
+# Retención
+# ==========================
+def aplicar_retencion(institucion_id, usuario_id, ahora=None):
+    """Borra las instantáneas de `usuario_id` que la política no conserva. Devuelve cuántas."""
+    recientes = getattr(settings, "HORARIOS_INSTANTANEAS_RECIENTES", 10)
+    limite = (ahora or timezone.now()) - timedelta(days=getattr(settings, "HORARIOS_INSTANTANEAS_DIAS", 90))
+    filas = (
+        HorarioGuardado.objects.filter(institucion_id=institucion_id, usuario_id=usuario_id)
+        .order_by("-fecha_creacion", "-id")
+        .values_list("id", "fecha_creacion", "conservar")
+    )
+    dias, borrar = set(), []
+    for i, (guardado_id, fecha, conservar) in enumerate(filas):
+        dia = timezone.localdate(fecha)
+        if conservar or i < recientes or (fecha >= limite and dia not in dias):
+            dias.add(dia)
+        else:
+            borrar.append(guardado_id)
+    if not borrar:
+        return 0
+    return HorarioGuardado.objects.filter(id__in=borrar).delete()[0]
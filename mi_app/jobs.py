@@ -0,0 +1,92 @@
+# jobs.py
+"""
+Ejecución de una generación registrada en GeneracionJob.
+
+La usan tanto la vista (modo local) como la tarea de Celery: el job guarda
+estado, porcentaje de avance, resultado por asignatura y tiempos, y en cada
+límite de lote se comprueba si alguien pidió cancelarlo.
+"""
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .auditoria import auditar_institucion, resumen
+from .generar_horarios import generar_horarios_resultados
+from .models import GeneracionJob
+
+logger = logging.getLogger(__name__)
+
+
+class GeneracionCancelada(Exception):
+    """Se pidió cancelar el job; se lanza en el siguiente límite de lote."""
+
+
+def ejecutar_job(job, presupuesto=None):
+    """Ejecuta `job` (GeneracionJob) y deja en él el resultado. Devuelve el job."""
+    job.estado = GeneracionJob.EN_CURSO
+    job.iniciado = timezone.now()
+    job.save(update_fields=["estado", "iniciado"])
+
+    def avance(hechas, total):
+        progreso = int(100 * hechas / total) if total else 0
+        GeneracionJob.objects.filter(pk=job.pk).update(procesadas=hechas, total=total, progreso=progreso)
+        if GeneracionJob.objects.filter(pk=job.pk, cancelacion_solicitada=True).exists():
+            raise GeneracionCancelada()
+
+    try:
+        resultados = generar_horarios_resultados(
+            job.usuario, job.institucion, motor=job.motor or None,
+            presupuesto=presupuesto, avance=avance,
+        )
+    except GeneracionCancelada:
+        job.refresh_from_db(fields=["procesadas", "total", "progreso"])
+        job.estado = GeneracionJob.CANCELADO
+        logger.info("Generación %s cancelada en %d/%d", job.pk, job.procesadas, job.total)
+    except Exception as e:
+        logger.exception("Generación %s fallida", job.pk)
+        job.refresh_from_db(fields=["procesadas", "total", "progreso"])
+        job.estado = GeneracionJob.FALLIDO
+        job.error = str(e)
+    else:
+        job.estado = GeneracionJob.COMPLETADO
+        job.resultados = [
+            {"asignatura": nombre, "ok": ok, "motivo": motivo} for nombre, ok, motivo in resultados
+        ]
+        job.total = job.procesadas = len(resultados)
+        job.progreso = 100
+        if getattr(settings, "HORARIOS_AUDITAR_TRAS_GENERAR", True):
+            _auditar(job)
+
+    job.terminado = timezone.now()
+    job.save(update_fields=[
+        "estado", "resultados", "procesadas", "total", "progreso", "error", "terminado",
+    ])
+    return job
+
+
+def _auditar(job):
+    """Revisa el horario recién escrito; los conflictos solo se registran en el log."""
+    conflictos = auditar_institucion(job.institucion)
+    if conflictos:
+        logger.warning("Generación %s: %d conflicto(s) en el horario %s", job.pk, len(conflictos), resumen(conflictos))
+
+
+def estado_job(job, max_fallidas=50):
+    """Resumen JSON-serializable de `job` para el polling del admin."""
+    fallidas = job.fallidas
+    return {
+        "id": job.pk,
+        "estado": job.estado,
+        "estado_display": job.get_estado_display(),
+        "activo": job.activo,
+        "progreso": job.progreso,
+        "procesadas": job.procesadas,
+        "total": job.total,
+        "motor": job.motor,
+        "duracion": job.duracion,
+        "error": job.error,
+        "cancelacion_solicitada": job.cancelacion_solicitada,
+        "n_fallidas": len(fallidas),
+        "fallidas": fallidas[:max_fallidas],
+    }
@@ -0,0 +1,101 @@
+# lotes.py
+"""
+Control adaptativo del tamaño de lote según un presupuesto de memoria.
+
+Reemplaza el esquema fijo "lotes de 8 + gc.collect() + sleep(0.3)": después
+de cada lote se mide la memoria del proceso (RSS en /proc, o tracemalloc si
+está activo) y el lote crece mientras sobre margen, se achica al acercarse al
+presupuesto y solo se hace una pausa cuando el presupuesto se supera de verdad.
+"""
+import gc
+import logging
+import os
+import time
+import tracemalloc
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def memoria_en_uso():
+    """Bytes en uso por el proceso (RSS); None si no se puede medir."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return None
+
+
+class ControladorLotes:
+    """
+    Parte un iterable en lotes de tamaño variable.
+
+    - uso < `holgura` del presupuesto: el lote se duplica (hasta `maximo`).
+    - uso > `alerta` del presupuesto: el lote se reduce a la mitad y se llama a gc.
+    - uso > presupuesto tras gc: pausa de `pausa` segundos y lote mínimo.
+    Sin presupuesto (0/None) o sin forma de medir, el lote solo crece.
+    """
+
+    holgura = 0.5
+    alerta = 0.8
+
+    def __init__(self, presupuesto_mb=None, inicial=8, minimo=1, maximo=256, pausa=0.3,
+                 medir=memoria_en_uso):
+        if presupuesto_mb is None:
+            presupuesto_mb = getattr(settings, "HORARIOS_MEMORIA_MB", 0)
+        self.presupuesto = (presupuesto_mb or 0) * MB
+        self.tamano = inicial
+        self.minimo = minimo
+        self.maximo = maximo
+        self.pausa = pausa
+        self.medir = medir
+        self.pausas = 0
+
+    def lotes(self, iterable):
+        lote = []
+        for item in iterable:
+            lote.append(item)
+            if len(lote) >= self.tamano:
+                yield lote
+                lote = []
+                self.ajustar()
+        if lote:
+            yield lote
+
+    def _cambiar(self, nuevo, motivo, uso):
+        nuevo = max(self.minimo, min(self.maximo, nuevo))
+        if nuevo != self.tamano:
+            logger.info(
+                "Lotes: %d → %d (%s; memoria %.0f/%.0f MB)",
+                self.tamano, nuevo, motivo, (uso or 0) / MB, self.presupuesto / MB,
+            )
+            self.tamano = nuevo
+
+    def ajustar(self):
+        """Decide el tamaño del próximo lote según la memoria actual."""
+        uso = self.medir() if self.presupuesto else None
+        if uso is None:
+            self._cambiar(self.tamano * 2, "sin presupuesto", uso)
+            return
+
+        if uso < self.presupuesto * self.holgura:
+            self._cambiar(self.tamano * 2, "holgura", uso)
+        elif uso > self.presupuesto * self.alerta:
+            gc.collect()
+            uso = self.medir() or 0
+            if uso > self.presupuesto:
+                self.pausas += 1
+                logger.warning(
+                    "Lotes: memoria %.0f MB sobre el presupuesto (%.0f MB); pausa de %.1fs",
+                    uso / MB, self.presupuesto / MB, self.pausa,
+                )
+                time.sleep(self.pausa)
+                self._cambiar(self.minimo, "presupuesto superado", uso)
+            else:
+                self._cambiar(self.tamano // 2, "cerca del presupuesto", uso)
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mi_app.auditoria import TIPOS, auditar_institucion, reporte_csv, resumen
+from mi_app.models import Institucion
+
+
+class Command(BaseCommand):
+    help = (
+        'Audita los horarios guardados: choques de docente, aula y semestre, horarios '
+        'fuera de su jornada y no disponibilidades de docentes. Escribe un reporte CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institucion', action='append', default=[],
+                            help='Slug o id de la institución (repetible; por defecto, todas)')
+        parser.add_argument('--salida', default=None,
+                            help='Archivo CSV para el reporte (por defecto, solo el resumen)')
+        parser.add_argument('--json', action='store_true', help='Resumen en JSON (una institución por línea)')
+        parser.add_argument('--fallar', action='store_true',
+                            help='Terminar con error si hay algún conflicto')
+
+    def _instituciones(self, claves):
+        if not claves:
+            return list(Institucion.objects.order_by('id'))
+        insts = []
+        for clave in claves:
+            filtro = {'id': int(clave)} if clave.isdigit() else {'slug': clave}
+            inst = Institucion.objects.filter(**filtro).first()
+            if inst is None:
+                raise CommandError(f'Institución no encontrada: {clave}')
+            insts.append(inst)
+        return insts
+
+    def handle(self, *args, **opts):
+        todos = []
+        for inst in self._instituciones(opts['institucion']):
+            t0 = time.perf_counter()
+            conflictos = auditar_institucion(inst)
+            segundos = time.perf_counter() - t0
+            todos += conflictos
+            cuenta = resumen(conflictos)
+            if opts['json']:
+                self.stdout.write(json.dumps({
+                    'institucion': inst.slug, 'conflictos': len(conflictos),
+                    'por_tipo': cuenta, 'segundos': round(segundos, 3),
+                }))
+            else:
+                detalle = ', '.join(f'{TIPOS[t]}: {n}' for t, n in sorted(cuenta.items())) or 'sin conflictos'
+                estilo = self.style.WARNING if conflictos else self.style.SUCCESS
+                self.stdout.write(estilo(f'{inst.nombre} ({inst.slug}): {detalle} [{segundos:.2f}s]'))
+
+        if opts['salida']:
+            with open(opts['salida'], 'w', encoding='utf-8', newline='') as f:
+                f.write(reporte_csv(todos))
+            self.stdout.write(f'Reporte: {opts["salida"]} ({len(todos)} conflictos)')
+
+        if opts['fallar'] and todos:
+            raise CommandError(f'{len(todos)} conflicto(s) en los horarios')
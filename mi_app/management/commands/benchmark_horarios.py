@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mi_app.generar_horarios import MOTORES
+from mi_app.sintetico import crear_institucion_sintetica, medir_generacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera instituciones sintéticas reproducibles (por semilla y tamaño) y mide la '
+        'generación de horarios: tiempo, consultas, memoria pico, minutos ubicados y fallidas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='10,100,1000',
+                            help='Número de asignaturas por nivel, separados por coma (def. 10,100,1000)')
+        parser.add_argument('--motores', default='bitmask',
+                            help=f'Motores a comparar, separados por coma ({", ".join(MOTORES)})')
+        parser.add_argument('--seed', type=int, default=1, help='Semilla de los datos sintéticos')
+        parser.add_argument('--carreras', type=int, default=None)
+        parser.add_argument('--docentes', type=int, default=None)
+        parser.add_argument('--aulas', type=int, default=None)
+        parser.add_argument('--presupuesto', type=float, default=None,
+                            help='Segundos máximos para el motor exacto')
+        parser.add_argument('--sin-memoria', action='store_true',
+                            help='No medir la memoria pico (evita la segunda pasada con tracemalloc)')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON (una medición por línea)')
+        parser.add_argument('--conservar', action='store_true',
+                            help='Conservar las instituciones creadas (por defecto se revierte todo)')
+
+    def handle(self, *args, **opts):
+        try:
+            tamanos = [int(t) for t in opts['tamanos'].split(',') if t.strip()]
+        except ValueError:
+            raise CommandError('--tamanos debe ser una lista de enteros, p. ej. 10,100,1000')
+        motores = [m.strip() for m in opts['motores'].split(',') if m.strip()]
+        desconocidos = set(motores) - set(MOTORES)
+        if desconocidos:
+            raise CommandError(f'Motor desconocido: {", ".join(sorted(desconocidos))}')
+
+        if not opts['json']:
+            self.stdout.write(
+                f'{"motor":<8} {"asig.":>6} {"seg.":>8} {"consultas":>9} {"mem. MB":>8} '
+                f'{"min. ubicados":>17} {"fallidas":>8}'
+            )
+
+        with transaction.atomic():
+            for n in tamanos:
+                inst, user = crear_institucion_sintetica(
+                    seed=opts['seed'], n_asignaturas=n, n_carreras=opts['carreras'],
+                    n_docentes=opts['docentes'], n_aulas=opts['aulas'],
+                )
+                for motor in motores:
+                    m = medir_generacion(
+                        user, inst, motor=motor, presupuesto=opts['presupuesto'], memoria=not opts['sin_memoria'],
+                    )
+                    if opts['json']:
+                        self.stdout.write(json.dumps({**m._asdict(), 'seed': opts['seed']}))
+                    else:
+                        memoria = '-' if m.memoria_pico_mb is None else f'{m.memoria_pico_mb:.1f}'
+                        self.stdout.write(
+                            f'{m.motor:<8} {m.asignaturas:>6} {m.segundos:>8.2f} {m.consultas:>9} '
+                            f'{memoria:>8} {m.minutos_ubicados:>8}/{m.minutos_pedidos:<8} '
+                            f'{m.fallidas:>8}'
+                        )
+            if not opts['conservar']:
+                transaction.set_rollback(True)
+
+        if opts['conservar']:
+            self.stdout.write(self.style.SUCCESS('Instituciones sintéticas conservadas.'))
@@ -0,0 +1,31 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from mi_app.cache_horarios import ALIAS, estadisticas, reiniciar_estadisticas
+
+
+class Command(BaseCommand):
+    help = (
+        'Aciertos y fallos de la caché de horarios agrupados (alias "horarios" de CACHES), '
+        'para dimensionarla'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Poner los contadores en cero después de mostrarlos')
+
+    def handle(self, *args, **opts):
+        datos = {'backend': type(caches[ALIAS]).__name__, **estadisticas()}
+        if opts['json']:
+            self.stdout.write(json.dumps(datos))
+        else:
+            self.stdout.write(
+                f'Caché "{ALIAS}" ({datos["backend"]}): {datos["aciertos"]} aciertos, '
+                f'{datos["fallos"]} fallos, tasa de aciertos {datos["tasa"]:.1%}'
+            )
+        if opts['reiniciar']:
+            reiniciar_estadisticas()
+            self.stdout.write('Contadores reiniciados.')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mi_app.models import Institucion
+from mi_app.paquete_pdf import TIPOS_PAQUETE, documentos_paquete, escribir_paquete
+
+
+class Command(BaseCommand):
+    help = 'Genera un ZIP con el horario en PDF de cada docente y de cada semestre de una institución'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institucion', required=True, help='Slug o id de la institución')
+        parser.add_argument('--salida', default=None, help='Archivo ZIP (por defecto, horarios_<slug>.zip)')
+        parser.add_argument('--tipo', action='append', choices=TIPOS_PAQUETE, default=[],
+                            help='Solo docentes o solo semestres (repetible; por defecto, ambos)')
+        parser.add_argument('--procesos', type=int, default=None,
+                            help='Procesos para renderizar (por defecto, HORARIOS_PROCESOS o núcleos)')
+
+    def handle(self, *args, **opts):
+        clave = opts['institucion']
+        filtro = {'id': int(clave)} if clave.isdigit() else {'slug': clave}
+        inst = Institucion.objects.filter(**filtro).first()
+        if inst is None:
+            raise CommandError(f'Institución no encontrada: {clave}')
+        salida = opts['salida'] or f'horarios_{inst.slug}.zip'
+
+        t0 = time.perf_counter()
+        documentos = documentos_paquete(inst, opts['tipo'] or TIPOS_PAQUETE)
+        t1 = time.perf_counter()
+        n = escribir_paquete(documentos, salida, opts['procesos'])
+        t2 = time.perf_counter()
+        self.stdout.write(self.style.SUCCESS(
+            f'{salida}: {n} PDF (HTML {t1 - t0:.2f}s, render {t2 - t1:.2f}s)'
+        ))
@@ -1,48 +1,16 @@
 from django.core.management.base import BaseCommand
-from mi_app.models import DiaSemana, Asignatura, Horario
+
+from mi_app.models import DiaSemana
+from mi_app.signals import DIAS, rellenar_orden_dias
 
 class Command(BaseCommand):
-    help = 'Asigna el campo orden a los días de la semana y corrige los campos "dia" en Asignatura y Horario'
+    help = 'Asigna el campo orden a los días de la semana de todas las instituciones (un único UPDATE)'
 
     def handle(self, *args, **kwargs):
-        dias = [
-            ('LU', 'Lunes'),
-            ('MA', 'Martes'),
-            ('MI', 'Miercoles'),
-            ('JU', 'Jueves'),
-            ('VI', 'Viernes'),
-            ('SA', 'Sabado'),
-            ('DO', 'Domingo'),
-        ]
-        
-        # Actualizar el orden de los días de la semana
-        for i, (codigo, nombre) in enumerate(dias, start=1):
-            dia = DiaSemana.objects.filter(nombre=nombre).first()
-            if dia:
-                dia.orden = i
-                dia.save()
-                self.stdout.write(self.style.SUCCESS(f'{nombre} actualizado a orden {i}'))
-            else:
-                self.stdout.write(self.style.WARNING(f'{nombre} no encontrado'))
-
-        # Corregir el campo 'dia' de Asignatura con instancias válidas
-        for asignatura in Asignatura.objects.all():
-            if asignatura.dia and isinstance(asignatura.dia, str):
-                try:
-                    dia_instancia = DiaSemana.objects.get(nombre__iexact=asignatura.dia.strip())
-                    asignatura.dia = dia_instancia
-                    asignatura.save()
-                    self.stdout.write(self.style.SUCCESS(f"Asignatura '{asignatura.nombre}' actualizada."))
-                except DiaSemana.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f"Día '{asignatura.dia}' no encontrado para '{asignatura.nombre}'"))
+        actualizados = rellenar_orden_dias()
+        self.stdout.write(self.style.SUCCESS(f'{actualizados} días actualizados'))
 
-        # Corregir el campo 'dia' de Horario con instancias válidas
-        for horario in Horario.objects.all():
-            if horario.dia and hasattr(horario.dia, 'nombre'):
-                try:
-                    dia_instancia = DiaSemana.objects.get(nombre__iexact=horario.dia.nombre.strip())
-                    horario.dia = dia_instancia
-                    horario.save()
-                    self.stdout.write(self.style.SUCCESS(f"Horario de '{horario.asignatura.nombre}' actualizado."))
-                except DiaSemana.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f"Día '{horario.dia.nombre}' no encontrado para '{horario.asignatura.nombre}'"))
+        # Días con un código fuera de la semana estándar: se dejan como están
+        otros = DiaSemana.objects.exclude(codigo__in=[codigo for codigo, _, _ in DIAS])
+        for codigo, nombre, institucion in otros.values_list('codigo', 'nombre', 'institucion__nombre'):
+            self.stdout.write(self.style.WARNING(f"'{nombre}' ({codigo}) de {institucion}: código desconocido"))
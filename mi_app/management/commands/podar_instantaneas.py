@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from mi_app.instantaneas import aplicar_retencion
+from mi_app.models import HorarioGuardado
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica la política de retención a las instantáneas del horario (HorarioGuardado) '
+        'de todos los usuarios: HORARIOS_INSTANTANEAS_RECIENTES y HORARIOS_INSTANTANEAS_DIAS'
+    )
+
+    def handle(self, *args, **opts):
+        pares = list(
+            HorarioGuardado.objects.order_by()
+            .values_list('institucion_id', 'usuario_id').distinct()
+        )
+        borradas = sum(aplicar_retencion(institucion_id, usuario_id) for institucion_id, usuario_id in pares)
+        self.stdout.write(self.style.SUCCESS(f'{borradas} instantáneas borradas.'))
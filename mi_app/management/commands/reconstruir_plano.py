@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mi_app.models import Institucion
+from mi_app.plano import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Rehace la copia plana de los horarios (HorarioPlano), p. ej. después de '
+        'cambios masivos hechos con update() que no pasan por las señales'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institucion', default=None,
+                            help='Slug o id de la institución (por defecto, todas)')
+
+    def handle(self, *args, **opts):
+        institucion_id = None
+        clave = opts['institucion']
+        if clave:
+            filtro = {'id': int(clave)} if clave.isdigit() else {'slug': clave}
+            institucion_id = Institucion.objects.filter(**filtro).values_list('id', flat=True).first()
+            if institucion_id is None:
+                raise CommandError(f'Institución no encontrada: {clave}')
+        n = reconstruir(institucion_id)
+        self.stdout.write(self.style.SUCCESS(f'{n} filas planas reconstruidas.'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0008_remove_asignatura_intensidad_horaria_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='diasemana',
+            options={'default_permissions': (), 'ordering': ['orden'], 'permissions': ()},
+        ),
+        migrations.AlterModelOptions(
+            name='institucion',
+            options={'verbose_name': 'Institución', 'verbose_name_plural': 'Instituciones'},
+        ),
+        migrations.CreateModel(
+            name='GeneracionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motor', models.CharField(blank=True, max_length=10)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido'), ('cancelado', 'Cancelado')], default='pendiente', max_length=10)),
+                ('progreso', models.PositiveSmallIntegerField(default=0, help_text='Porcentaje (0-100)')),
+                ('procesadas', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('resultados', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('cancelacion_solicitada', models.BooleanField(default=False)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generaciones', to='mi_app.institucion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Generación de horarios',
+                'verbose_name_plural': 'Generaciones de horarios',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['institucion', 'usuario', 'creado'], name='mi_app_gene_institu_fe7869_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Case, IntegerField, When
+
+# Copia fija de signals.DIAS (código -> orden) al momento de esta migración:
+# las migraciones no deben depender del código actual de la app
+ORDEN_POR_CODIGO = {
+    "LU": 1,
+    "MA": 2,
+    "MI": 3,
+    "JU": 4,
+    "VI": 5,
+    "SA": 6,
+    "DO": 7,
+}
+
+
+def rellenar(apps, schema_editor):
+    """Asigna `orden` a todos los días según su código, en un único UPDATE."""
+    DiaSemana = apps.get_model('mi_app', 'DiaSemana')
+    DiaSemana.objects.filter(codigo__in=list(ORDEN_POR_CODIGO)).update(
+        orden=Case(
+            *[When(codigo=codigo, then=orden) for codigo, orden in ORDEN_POR_CODIGO.items()],
+            output_field=IntegerField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0009_generacionjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
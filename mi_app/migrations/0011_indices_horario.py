@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0010_rellenar_orden_dias'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='horario',
+            name='docente',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='mi_app.docente'),
+        ),
+        migrations.AlterField(
+            model_name='horario',
+            name='institucion',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='mi_app.institucion'),
+        ),
+        migrations.AlterField(
+            model_name='horario',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['usuario', 'dia', 'hora_inicio'], name='mi_app_hora_usuario_2f01dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['institucion', 'dia', 'hora_inicio'], name='mi_app_hora_institu_62f4ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['docente', 'dia', 'hora_inicio'], name='mi_app_hora_docente_04bcf0_idx'),
+        ),
+    ]
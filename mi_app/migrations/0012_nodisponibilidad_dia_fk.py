@@ -0,0 +1,21 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Paso 1/3: columna FK temporal junto al día en texto."""
+
+    dependencies = [
+        ('mi_app', '0011_indices_horario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nodisponibilidad',
+            name='dia_fk',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='mi_app.diasemana',
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+def rellenar(apps, schema_editor):
+    """
+    Paso 2/3: resuelve el nombre del día al DiaSemana de la misma institución
+    (por nombre o por código, sin distinguir mayúsculas), con una
+    actualización por (institución, nombre) en vez de una por fila.
+    Si alguna fila no tiene día en su institución la migración se detiene
+    sin borrar nada: hay que crear ese día o corregir la fila y volver a migrar.
+    """
+    DiaSemana = apps.get_model('mi_app', 'DiaSemana')
+    NoDisponibilidad = apps.get_model('mi_app', 'NoDisponibilidad')
+
+    dias = {}
+    for dia_id, institucion_id, nombre, codigo in DiaSemana.objects.values_list('id', 'institucion_id', 'nombre', 'codigo'):
+        dias[(institucion_id, codigo.strip().lower())] = dia_id
+        dias[(institucion_id, nombre.strip().lower())] = dia_id
+
+    pares = NoDisponibilidad.objects.values_list('institucion_id', 'dia').distinct()
+    asignados, sin_dia = {}, []
+    for institucion_id, nombre in pares:
+        dia_id = dias.get((institucion_id, (nombre or '').strip().lower()))
+        if dia_id is None:
+            sin_dia.append((institucion_id, nombre))
+        else:
+            asignados[(institucion_id, nombre)] = dia_id
+
+    if sin_dia:
+        detalle = []
+        for institucion_id, nombre in sin_dia:
+            ids = list(
+                NoDisponibilidad.objects.filter(institucion_id=institucion_id, dia=nombre)
+                .order_by('id').values_list('id', flat=True)
+            )
+            detalle.append(f"institución {institucion_id}, día {nombre!r}: NoDisponibilidad {ids}")
+        raise RuntimeError(
+            "Hay no disponibilidades cuyo día no existe en su institución. Crea ese "
+            "DiaSemana o corrige las filas y vuelve a migrar:\n  " + "\n  ".join(detalle)
+        )
+
+    for (institucion_id, nombre), dia_id in asignados.items():
+        NoDisponibilidad.objects.filter(institucion_id=institucion_id, dia=nombre).update(dia_fk_id=dia_id)
+
+
+def vaciar(apps, schema_editor):
+    DiaSemana = apps.get_model('mi_app', 'DiaSemana')
+    NoDisponibilidad = apps.get_model('mi_app', 'NoDisponibilidad')
+    for dia_id, nombre in DiaSemana.objects.values_list('id', 'nombre'):
+        NoDisponibilidad.objects.filter(dia_fk_id=dia_id).update(dia=nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0012_nodisponibilidad_dia_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, vaciar),
+    ]
@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Paso 3/3: la FK reemplaza al día en texto y se indexa el choque por día."""
+
+    dependencies = [
+        ('mi_app', '0013_rellenar_nodisponibilidad_dia'),
+    ]
+
+    operations = [
+        # Con default, al revertir la columna de texto se puede volver a crear
+        # con filas existentes (0013 la rellena después)
+        migrations.AlterField(
+            model_name='nodisponibilidad',
+            name='dia',
+            field=models.CharField(default='', max_length=10),
+        ),
+        migrations.RemoveField(
+            model_name='nodisponibilidad',
+            name='dia',
+        ),
+        migrations.RenameField(
+            model_name='nodisponibilidad',
+            old_name='dia_fk',
+            new_name='dia',
+        ),
+        migrations.AlterField(
+            model_name='nodisponibilidad',
+            name='dia',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='no_disponibilidades', to='mi_app.diasemana',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='nodisponibilidad',
+            index=models.Index(
+                fields=['institucion', 'docente', 'dia', 'hora_inicio', 'hora_fin'],
+                name='mi_app_nodi_institu_8e5cb6_idx',
+            ),
+        ),
+    ]
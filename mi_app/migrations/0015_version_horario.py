@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0014_nodisponibilidad_dia_diasemana'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institucion',
+            name='horario_modificado',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='institucion',
+            name='version_horario',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
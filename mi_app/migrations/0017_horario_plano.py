@@ -0,0 +1,99 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copia fija de plano.ORIGEN al momento de esta migración: las migraciones no
+# deben depender del código actual de la app
+ORIGEN = {
+    'horario_id': 'id',
+    'institucion_id': 'institucion_id',
+    'usuario_id': 'usuario_id',
+    'asignatura_id': 'asignatura_id',
+    'docente_id': 'docente_id',
+    'aula_id': 'aula_id',
+    'dia_id': 'dia_id',
+    'carrera_id': 'asignatura__semestre__carrera_id',
+    'semestre_id': 'asignatura__semestre_id',
+    'dia_orden': 'dia__orden',
+    'dia_nombre': 'dia__nombre',
+    'jornada': 'jornada',
+    'hora_inicio': 'hora_inicio',
+    'hora_fin': 'hora_fin',
+    'asignatura_nombre': 'asignatura__nombre',
+    'docente_nombre': 'docente__nombre',
+    'aula_nombre': 'aula__nombre',
+    'carrera_nombre': 'asignatura__semestre__carrera__nombre',
+    'semestre_numero': 'asignatura__semestre__numero',
+}
+LOTE = 1000
+
+
+def _minutos(t):
+    return None if t is None else t.hour * 60 + t.minute
+
+
+def rellenar(apps, schema_editor):
+    """Copia todos los Horario a HorarioPlano, en lotes de LOTE filas."""
+    Horario = apps.get_model('mi_app', 'Horario')
+    HorarioPlano = apps.get_model('mi_app', 'HorarioPlano')
+
+    campos = tuple(ORIGEN)
+    filas = []
+    for valores in Horario.objects.order_by().values_list(*ORIGEN.values()).iterator(chunk_size=LOTE):
+        datos = dict(zip(campos, valores))
+        datos['inicio_min'] = _minutos(datos['hora_inicio'])
+        datos['fin_min'] = _minutos(datos['hora_fin'])
+        datos['es_descanso'] = datos['asignatura_nombre'] == 'DESCANSO'
+        datos['carrera_nombre'] = datos['carrera_nombre'] or ''
+        filas.append(HorarioPlano(**datos))
+        if len(filas) >= LOTE:
+            HorarioPlano.objects.bulk_create(filas)
+            filas = []
+    if filas:
+        HorarioPlano.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0016_version_horario_usuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HorarioPlano',
+            fields=[
+                ('horario', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='plano', serialize=False, to='mi_app.horario')),
+                ('dia_orden', models.PositiveSmallIntegerField(default=0)),
+                ('dia_nombre', models.CharField(max_length=20)),
+                ('jornada', models.CharField(max_length=10)),
+                ('hora_inicio', models.TimeField(null=True)),
+                ('hora_fin', models.TimeField(null=True)),
+                ('inicio_min', models.PositiveSmallIntegerField(null=True)),
+                ('fin_min', models.PositiveSmallIntegerField(null=True)),
+                ('asignatura_nombre', models.CharField(max_length=100)),
+                ('es_descanso', models.BooleanField(default=False)),
+                ('docente_nombre', models.CharField(max_length=100)),
+                ('aula_nombre', models.CharField(max_length=100)),
+                ('carrera_nombre', models.CharField(blank=True, max_length=100)),
+                ('semestre_numero', models.PositiveIntegerField(null=True)),
+                ('asignatura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.asignatura')),
+                ('aula', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.aula')),
+                ('carrera', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.carrerauniversitaria')),
+                ('dia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.diasemana')),
+                ('docente', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.docente')),
+                ('institucion', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.institucion')),
+                ('semestre', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mi_app.semestre')),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'default_permissions': (),
+                'indexes': [models.Index(fields=['usuario', 'dia_orden', 'inicio_min'], name='mi_app_hora_usuario_9d19e8_idx'), models.Index(fields=['usuario', 'carrera', 'dia_orden', 'inicio_min'], name='mi_app_hora_usuario_04a2c2_idx'), models.Index(fields=['institucion', 'dia_orden', 'inicio_min'], name='mi_app_hora_institu_c520c2_idx'), models.Index(fields=['docente', 'dia_orden', 'inicio_min'], name='mi_app_hora_docente_905267_idx')],
+            },
+        ),
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0017_horario_plano'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horarioguardado',
+            name='conservar',
+            field=models.BooleanField(default=False, help_text='La política de retención no la borra.'),
+        ),
+        migrations.AddField(
+            model_name='horarioguardado',
+            name='contenido',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='horarioguardado',
+            name='filas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='horarioguardado',
+            name='tamano',
+            field=models.PositiveIntegerField(default=0, help_text='Bytes de `contenido`'),
+        ),
+        migrations.AlterField(
+            model_name='horarioguardado',
+            name='datos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='horarioguardado',
+            index=models.Index(fields=['institucion', 'usuario', 'fecha_creacion'], name='mi_app_hora_institu_6e7298_idx'),
+        ),
+    ]
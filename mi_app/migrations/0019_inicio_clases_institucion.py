@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0018_horario_guardado_columnar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institucion',
+            name='inicio_clases',
+            field=models.DateField(blank=True, help_text='Primer día de clases del período. Los calendarios (.ics) empiezan en esta fecha; sin ella (ni HORARIOS_INICIO_CLASES) no se publican.', null=True),
+        ),
+    ]
@@ -10,6 +10,27 @@ JORNADAS = [
     ('Noche', 'Noche'),
 ]
 
+# Ventana (inicio, fin) en que puede empezar una clase de cada jornada
+VENTANAS_JORNADA = {
+    'Mañana': (time(7, 30), time(12, 50)),
+    'Tarde': (time(13, 30), time(18, 15)),
+    'Noche': (time(18, 15), time(21, 45)),
+}
+
+
+def error_jornada(jornada, hora_inicio):
+    """
+    Mensaje si `hora_inicio` no cae en la ventana de `jornada`, o None. Es la
+    única regla de jornada (Horario.clean, validacion y auditoria): cuenta
+    solo el inicio, una clase puede terminar después del cierre.
+    """
+    inicio, fin = VENTANAS_JORNADA.get(jornada, (None, None))
+    if inicio is None:
+        return f"Jornada inválida: {jornada}"
+    if not (inicio <= hora_inicio <= fin):
+        return f"La hora no coincide con la jornada ({jornada}: {inicio:%H:%M} - {fin:%H:%M})."
+    return None
+
 DIAS_SEMANA = [
     ('Lunes', 'Lunes'),
     ('Martes', 'Martes'),
@@ -37,6 +58,14 @@ class Institucion(models.Model):
             "en minutos totales y luego distribuirlos por semana."
         )
     )
+    inicio_clases = models.DateField(
+        null=True, blank=True,
+        help_text="Primer día de clases del período. Los calendarios (.ics) empiezan en esta fecha; "
+                  "sin ella (ni HORARIOS_INICIO_CLASES) no se publican.",
+    )
+    # Sube con cada cambio del horario (ver versiones.py): ETag / Last-Modified de las lecturas
+    version_horario = models.PositiveBigIntegerField(default=0, editable=False)
+    horario_modificado = models.DateTimeField(null=True, blank=True, editable=False)
         
     class Meta:
         verbose_name = "Institución"
@@ -49,6 +78,10 @@ class Institucion(models.Model):
 class PerfilUsuario(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='perfil')
     institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name='usuarios')
+    # Versión de lo que ve este usuario (sus horarios y descansos, y los nombres
+    # compartidos de la institución): ETag / Last-Modified de sus vistas
+    version_horario = models.PositiveBigIntegerField(default=0, editable=False)
+    horario_modificado = models.DateTimeField(null=True, blank=True, editable=False)
     
     class Meta:
         verbose_name = "Perfil usuario"
@@ -242,46 +275,72 @@ class Asignatura(models.Model):
 class NoDisponibilidad(models.Model):
     institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name="no_disponibilidades",null=False, blank=False)
     docente = models.ForeignKey(Docente, on_delete=models.CASCADE, related_name="no_disponibilidades")
-    # Guardas el día como string del choice (tu lógica actual lo usa así):
-    dia = models.CharField(max_length=10, choices=DIAS_SEMANA)
+    dia = models.ForeignKey(DiaSemana, on_delete=models.CASCADE, related_name="no_disponibilidades")
     jornada = models.CharField(max_length=10, choices=JORNADAS)
     hora_inicio = models.TimeField()
     hora_fin = models.TimeField()
 
+    class Meta:
+        indexes = [
+            # Choque al guardar un Horario: (institucion, docente, dia, rango de horas)
+            models.Index(fields=['institucion', 'docente', 'dia', 'hora_inicio', 'hora_fin']),
+        ]
+
+    def clean(self):
+        super().clean()
+        if self.dia_id and self.institucion_id and self.dia.institucion_id != self.institucion_id:
+            raise ValidationError({'dia': "El día seleccionado no pertenece a tu institución."})
+
     def __str__(self):
         return f"{self.docente.nombre} NO disponible - {self.dia} ({self.jornada} {self.hora_inicio}-{self.hora_fin})"
 
 
 class Horario(models.Model):
-    institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name="horarios",null=False, blank=False)
-    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="horarios")
+    # usuario, institucion y docente sin índice propio: son prefijo de los índices de Meta
+    institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name="horarios",null=False, blank=False, db_index=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="horarios", db_index=False)
     asignatura = models.ForeignKey(Asignatura, on_delete=models.CASCADE)
-    docente = models.ForeignKey(Docente, on_delete=models.CASCADE)
+    docente = models.ForeignKey(Docente, on_delete=models.CASCADE, db_index=False)
     aula = models.ForeignKey(Aula, on_delete=models.CASCADE)
     dia = models.ForeignKey(DiaSemana, on_delete=models.CASCADE)
     jornada = models.CharField(max_length=10, choices=JORNADAS)
     hora_inicio = models.TimeField(blank=True, null=True)
     hora_fin = models.TimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Lecturas por usuario (inicio, listados, PDF), en orden de día y hora
+            models.Index(fields=['usuario', 'dia', 'hora_inicio']),
+            # Admin y contexto de generación: todo lo de la institución
+            models.Index(fields=['institucion', 'dia', 'hora_inicio']),
+            # Horario de un docente y choques (docente, día, rango de horas)
+            models.Index(fields=['docente', 'dia', 'hora_inicio']),
+        ]
+
     def clean(self):
         super().clean()
-        if self.hora_inicio and self.hora_fin:
-            if self.jornada == 'Mañana' and not (time(7, 30) <= self.hora_inicio <= time(12, 50)):
-                raise ValidationError("La hora no coincide con la jornada (Mañana: 07:30 - 12:50).")
-            elif self.jornada == 'Tarde' and not (time(13, 30) <= self.hora_inicio <= time(18, 15)):
-                raise ValidationError("La hora no coincide con la jornada (Tarde: 13:30 - 18:15).")
-            elif self.jornada == 'Noche' and not (time(18, 15) <= self.hora_inicio <= time(21, 45)):
-                raise ValidationError("La hora no coincide con la jornada (Noche: 18:15 - 21:45).")
-
-    def save(self, *args, **kwargs):
+        # Una jornada fuera de JORNADAS ya la rechaza la validación del campo
+        if self.hora_inicio and self.hora_fin and self.jornada in VENTANAS_JORNADA:
+            mensaje = error_jornada(self.jornada, self.hora_inicio)
+            if mensaje:
+                raise ValidationError(mensaje)
+
+    def save(self, *args, validar=True, **kwargs):
+        """
+        `validar=False` omite los chequeos por fila: para quien ya validó la
+        fila en lote con validacion.validar_horarios (p. ej. el admin).
+        """
+        if not validar:
+            return super().save(*args, **kwargs)
+
         if not self.dia_id or not self.hora_inicio or not self.hora_fin:
             raise ValidationError("Debes especificar el día, hora de inicio y fin.")
 
         conflictos = NoDisponibilidad.objects.filter(
-            institucion=self.institucion,
-            docente=self.docente,
+            institucion_id=self.institucion_id,
+            docente_id=self.docente_id,
             jornada=self.jornada,
-            dia=self.dia.nombre,   # NoDisponibilidad.dia es string; DiaSemana.nombre coincide
+            dia_id=self.dia_id,
             hora_inicio__lt=self.hora_fin,
             hora_fin__gt=self.hora_inicio
         )
@@ -292,12 +351,161 @@ class Horario(models.Model):
         super().save(*args, **kwargs)
 
 
+class HorarioPlano(models.Model):
+    """
+    Copia desnormalizada de Horario para las lecturas (vistas, exportaciones y
+    admin): nombres, claves de orden, ids de carrera/semestre y minutos ya
+    resueltos, así que cada lectura es un recorrido por índice de una sola
+    tabla. La mantiene plano.py; no se edita a mano.
+
+    `horario` no tiene restricción en la BD ni borrado en cascada: así el
+    borrado masivo de Horario sigue siendo rápido, y quien lo hace
+    sincroniza después (plano.sincronizar). Las demás FK sí borran en cascada.
+    """
+    horario = models.OneToOneField(
+        Horario, on_delete=models.DO_NOTHING, primary_key=True, related_name="plano", db_constraint=False,
+    )
+    # institucion, usuario y docente sin índice propio: son prefijo de los índices de Meta
+    institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name="+", db_index=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", db_index=False)
+    asignatura = models.ForeignKey(Asignatura, on_delete=models.CASCADE, related_name="+")
+    docente = models.ForeignKey(Docente, on_delete=models.CASCADE, related_name="+", db_index=False)
+    aula = models.ForeignKey(Aula, on_delete=models.CASCADE, related_name="+")
+    dia = models.ForeignKey(DiaSemana, on_delete=models.CASCADE, related_name="+")
+    carrera = models.ForeignKey(CarreraUniversitaria, on_delete=models.CASCADE, null=True, related_name="+")
+    semestre = models.ForeignKey(Semestre, on_delete=models.CASCADE, null=True, related_name="+")
+
+    dia_orden = models.PositiveSmallIntegerField(default=0)
+    dia_nombre = models.CharField(max_length=20)
+    jornada = models.CharField(max_length=10)
+    hora_inicio = models.TimeField(null=True)
+    hora_fin = models.TimeField(null=True)
+    # Minutos desde la medianoche (orden y solapes sin convertir horas)
+    inicio_min = models.PositiveSmallIntegerField(null=True)
+    fin_min = models.PositiveSmallIntegerField(null=True)
+    asignatura_nombre = models.CharField(max_length=100)
+    es_descanso = models.BooleanField(default=False)
+    docente_nombre = models.CharField(max_length=100)
+    aula_nombre = models.CharField(max_length=100)
+    carrera_nombre = models.CharField(max_length=100, blank=True)
+    semestre_numero = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        default_permissions = ()
+        indexes = [
+            # Vistas y exportaciones de un usuario, completas o por carrera
+            models.Index(fields=['usuario', 'dia_orden', 'inicio_min']),
+            models.Index(fields=['usuario', 'carrera', 'dia_orden', 'inicio_min']),
+            # Admin y calendarios: todo lo de la institución
+            models.Index(fields=['institucion', 'dia_orden', 'inicio_min']),
+            # Horario de un docente
+            models.Index(fields=['docente', 'dia_orden', 'inicio_min']),
+        ]
+
+    def __str__(self):
+        return f"{self.dia_nombre} {self.hora_inicio}-{self.hora_fin} {self.asignatura_nombre}"
+
+
 class HorarioGuardado(models.Model):
+    """
+    Instantánea del horario de un usuario en una institución, para volver a
+    ella (instantaneas.py). `contenido` guarda las filas en columnas de ids y
+    minutos, comprimidas; `datos` queda para metadatos (codec, tamaño sin
+    comprimir) y para las instantáneas viejas, que no se pueden restaurar.
+    """
     institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name="horarios_guardados",null=False, blank=False)
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="horarios_guardados")
     nombre = models.CharField(max_length=100, default="Horario sin nombre")
-    datos = models.JSONField()
+    datos = models.JSONField(default=dict, blank=True)
+    contenido = models.BinaryField(null=True, editable=False)
+    filas = models.PositiveIntegerField(default=0)
+    tamano = models.PositiveIntegerField(default=0, help_text="Bytes de `contenido`")
+    conservar = models.BooleanField(default=False, help_text="La política de retención no la borra.")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Retención y listado: las de un usuario, de la más nueva a la más vieja
+            models.Index(fields=['institucion', 'usuario', 'fecha_creacion']),
+        ]
+
     def __str__(self):
         return f"{self.nombre} - {self.usuario.username}"
+
+
+class GeneracionJob(models.Model):
+    """
+    Una ejecución de "Generar horarios" (local o en Celery): estado, avance,
+    resultado por asignatura y tiempos. El admin la consulta por polling y
+    puede pedir su cancelación.
+    """
+    PENDIENTE = "pendiente"
+    EN_CURSO = "en_curso"
+    COMPLETADO = "completado"
+    FALLIDO = "fallido"
+    CANCELADO = "cancelado"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_CURSO, "En curso"),
+        (COMPLETADO, "Completado"),
+        (FALLIDO, "Fallido"),
+        (CANCELADO, "Cancelado"),
+    ]
+
+    institucion = models.ForeignKey(Institucion, on_delete=models.CASCADE, related_name="generaciones")
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="generaciones")
+    motor = models.CharField(max_length=10, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje (0-100)")
+    procesadas = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    # [{"asignatura": nombre, "ok": bool, "motivo": texto}, ...]
+    resultados = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    cancelacion_solicitada = models.BooleanField(default=False)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creado']
+        verbose_name = "Generación de horarios"
+        verbose_name_plural = "Generaciones de horarios"
+        indexes = [
+            models.Index(fields=['institucion', 'usuario', 'creado']),
+        ]
+
+    def __str__(self):
+        return f"Generación {self.pk} ({self.get_estado_display()})"
+
+    @property
+    def activo(self):
+        return self.estado in (self.PENDIENTE, self.EN_CURSO)
+
+    @classmethod
+    def hay_activa(cls, usuario, institucion):
+        """
+        True si `usuario` tiene una generación pendiente o en curso en
+        `institucion`. Un job más viejo que el time limit de Celery quedó
+        huérfano (worker caído) y no cuenta.
+        """
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+        vigencia = timezone.now() - timedelta(seconds=getattr(settings, "CELERY_TASK_TIME_LIMIT", 1800))
+        return cls.objects.filter(
+            usuario=usuario, institucion=institucion, creado__gte=vigencia,
+            estado__in=(cls.PENDIENTE, cls.EN_CURSO),
+        ).exists()
+
+    @property
+    def duracion(self):
+        """Segundos entre inicio y fin (o hasta ahora si sigue en curso)."""
+        if not self.iniciado:
+            return None
+        from django.utils import timezone
+        return ((self.terminado or timezone.now()) - self.iniciado).total_seconds()
+
+    @property
+    def fallidas(self):
+        return [r for r in self.resultados if not r.get("ok")]
@@ -0,0 +1,275 @@
+# ocupacion.py
+"""
+Motor de ocupación por máscaras de bits.
+
+Cada recurso se guarda como un entero cuyos bits marcan los tramos ocupados
+del día (aulas, descansos y no disponibilidades por día; docentes y semestres
+por franja horaria). Un chequeo de solape pasa a ser un AND y
+el final de un tramo libre se obtiene con el bit menos significativo, sin
+recorrer listas ni construir objetos datetime.
+
+`asignar_horario_bitmask` toma exactamente las mismas decisiones que
+`utils.asignar_horario_automatico` (mismo orden de días y aulas, mismos pasos
+de 15 minutos y mismo relleno final por fragmentos), pero trabaja solo sobre
+un SchedulingContext y no toca el ORM.
+"""
+from collections import namedtuple
+from datetime import time
+
+from .utils import obtener_bloques_por_jornada
+
+PASO = 15  # minutos
+
+
+# ==========================
+# Utilidades de máscara
+# ==========================
+# Las máscaras usan medios minutos: un horario [a, b) ocupa los bits 2a..2b-1 y
+# una consulta [p, q) mira los bits 2p..2q-2. Así un horario de duración cero en
+# el minuto c (bit 2c-1) choca solo con consultas que lo contienen
+# estrictamente, igual que la comparación `inicio < fin and fin > inicio`.
+def a_minutos(t, techo=False):
+    """time -> minutos desde medianoche (con `techo`, redondea segundos hacia arriba)."""
+    m = t.hour * 60 + t.minute
+    if techo and (t.second or t.microsecond):
+        m += 1
+    return m
+
+
+def a_hora(m):
+    return time(m // 60, m % 60)
+
+
+def rango(inicio, fin):
+    """Máscara con los bits [inicio, fin)."""
+    if fin <= inicio:
+        return 0
+    return ((1 << (fin - inicio)) - 1) << inicio
+
+
+def marca(inicio, fin):
+    """Máscara de un horario ocupado en los minutos [inicio, fin)."""
+    if fin > inicio:
+        return rango(2 * inicio, 2 * fin)
+    if fin == inicio and inicio > 0:
+        return 1 << (2 * inicio - 1)
+    return 0
+
+
+def franja(inicio, fin):
+    """Máscara de consulta: `franja(p, q) & m` es distinto de cero si [p, q) choca con `m`."""
+    return rango(2 * inicio, 2 * fin - 1)
+
+
+def primer_choque(mask, inicio):
+    """
+    Menor minuto T tal que la consulta [inicio, x) choca con `mask` si y solo
+    si x > T. None si no hay nada ocupado desde `inicio`.
+    """
+    x = mask >> (2 * inicio)
+    if not x:
+        return None
+    t = 2 * inicio + (x & -x).bit_length() - 1
+    return (t + 1) // 2
+
+
+# ==========================
+# Mapa de ocupación
+# ==========================
+class MapaOcupacion:
+    """
+    Estado compartido de una generación, equivalente a la lista ligera de
+    horarios + no disponibilidades + descansos que usa el motor clásico.
+    Se va actualizando a medida que se ubican asignaturas.
+    """
+
+    def __init__(self):
+        self.aulas = {}          # dia_id -> {aula_id: mask}
+        self.docentes = {}       # docente_id -> mask
+        self.semestres = {}      # semestre_id -> mask
+        self.no_disp = {}        # (docente_id, dia_id) -> mask
+        self.descansos = {}      # dia_id -> mask
+        self.fin_descansos = {}  # dia_id -> minuto de fin del último descanso
+        self.carga_por_dia = {}  # dia_id -> nº de horarios del día
+
+    @classmethod
+    def desde_contexto(cls, contexto):
+        """Construye el mapa a partir de un SchedulingContext."""
+        mapa = cls()
+        for h in contexto.horarios:
+            mapa.registrar(h.dia_id, h.aula_id, h.docente_id, h.semestre_id, h.hora_inicio, h.hora_fin)
+        for clave, bloques in contexto.no_disp_por_docente_dia.items():
+            m = 0
+            for nd in bloques:
+                m |= marca(a_minutos(nd.hora_inicio), a_minutos(nd.hora_fin, techo=True))
+            mapa.no_disp[clave] = m
+        for d in contexto.descansos:
+            fin = a_minutos(d.hora_fin, techo=True)
+            mapa.descansos[d.dia_id] = mapa.descansos.get(d.dia_id, 0) | marca(a_minutos(d.hora_inicio), fin)
+            mapa.fin_descansos[d.dia_id] = max(mapa.fin_descansos.get(d.dia_id, fin), fin)
+        return mapa
+
+    def registrar(self, dia_id, aula_id, docente_id, semestre_id, hora_inicio, hora_fin):
+        """Marca un horario como ocupado (acepta time o minutos)."""
+        self.carga_por_dia[dia_id] = self.carga_por_dia.get(dia_id, 0) + 1
+        if hora_inicio is None or hora_fin is None:
+            return
+        if isinstance(hora_inicio, time):
+            hora_inicio = a_minutos(hora_inicio)
+        if isinstance(hora_fin, time):
+            hora_fin = a_minutos(hora_fin, techo=True)
+        m = marca(hora_inicio, hora_fin)
+        if not m:
+            return
+        if aula_id is not None:
+            por_aula = self.aulas.setdefault(dia_id, {})
+            por_aula[aula_id] = por_aula.get(aula_id, 0) | m
+        if docente_id is not None:
+            self.docentes[docente_id] = self.docentes.get(docente_id, 0) | m
+        if semestre_id is not None:
+            self.semestres[semestre_id] = self.semestres.get(semestre_id, 0) | m
+
+
+# ==========================
+# Motor
+# ==========================
+Segmento = namedtuple(
+    "Segmento", "asignatura_id docente_id aula_id dia_id jornada hora_inicio hora_fin"
+)
+
+
+Preparacion = namedtuple(
+    "Preparacion", "docente_id semestre_id jornada minutos_semana ini_j fin_j candidatas dias"
+)
+
+
+def preparar_asignatura(asignatura, contexto):
+    """
+    Validaciones previas comunes a los motores. Devuelve (motivo, None) si la
+    asignatura no se puede ubicar, o (None, Preparacion).
+    """
+    if not asignatura.docente_ids:
+        return "Asignatura sin docente", None
+    if asignatura.semestre_id is None:
+        return "Sin semestre", None
+
+    dias = contexto.dias_por_carrera.get(asignatura.carrera_id, ())
+    if not dias:
+        return "Carrera sin días de clase", None
+
+    horas_totales = asignatura.horas_totales or 0
+    semanas = asignatura.semanas or 0
+    if horas_totales <= 0 or semanas <= 0:
+        return "Horas totales o semanas inválidas", None
+
+    minutos_semana = max(60, int(round((horas_totales * contexto.duracion_hora / semanas) / 15.0 + 0.5) * 15))
+
+    inicio_jornada, fin_jornada = obtener_bloques_por_jornada(asignatura.jornada)
+    if inicio_jornada is None:
+        return f"Jornada inválida: {asignatura.jornada}", None
+
+    aulas = contexto.aulas
+    if not aulas:
+        return "No hay aulas disponibles", None
+    candidatas = (asignatura.aula_id,) if asignatura.aula_id in aulas else aulas
+
+    return None, Preparacion(
+        asignatura.docente_ids[0], asignatura.semestre_id, asignatura.jornada, minutos_semana,
+        a_minutos(inicio_jornada), a_minutos(fin_jornada), candidatas, dias,
+    )
+
+
+def asignar_horario_bitmask(asignatura, contexto, ocupacion):
+    """
+    Ubica `asignatura` (AsignaturaInfo) con los datos de `contexto`, sin
+    consultar la base de datos. Devuelve (ok, motivo, segmentos) y deja los
+    segmentos registrados en `ocupacion`; persistirlos es tarea del llamador.
+    """
+    motivo, prep = preparar_asignatura(asignatura, contexto)
+    if motivo:
+        return False, motivo, []
+    docente_id, semestre_id, jornada, minutos_semana, ini_j, fin_j, candidatas, dias_validos = prep
+
+    ocupados = ocupacion.docentes.get(docente_id, 0) | ocupacion.semestres.get(semestre_id, 0)
+
+    dias_ordenados = sorted(dias_validos, key=lambda d: (ocupacion.carga_por_dia.get(d.id, 0), d.orden))
+
+    restante = minutos_semana
+    tramos = []  # (dia_id, aula_id, inicio_min, fin_min)
+
+    for dia in dias_ordenados:
+        if restante <= 0:
+            break
+
+        desc = ocupacion.descansos.get(dia.id, 0)
+        fin_desc = ocupacion.fin_descansos.get(dia.id)
+        aulas_dia = ocupacion.aulas.get(dia.id, {})
+        comun = ocupados | ocupacion.no_disp.get((docente_id, dia.id), 0)
+        bloqueo = comun | desc
+
+        current = ini_j
+        while current < fin_j and restante > 0:
+            nxt = min(current + PASO, fin_j)
+            consulta = franja(current, nxt)
+
+            if desc & consulta:
+                current = fin_desc
+                continue
+
+            aula_id = None
+            if not consulta & comun:
+                for a in candidatas:
+                    if not consulta & aulas_dia.get(a, 0):
+                        aula_id = a
+                        break
+            if aula_id is None:
+                current += PASO
+                continue
+
+            # Tramo abierto en `current`: se extiende de 15 en 15 hasta el
+            # primer choque, que se calcula de una vez.
+            inicio = current
+            tope = primer_choque(bloqueo | aulas_dia.get(aula_id, 0), inicio)
+            if tope is None or tope >= fin_j:
+                cierre, current = fin_j, fin_j
+            else:
+                cierre = inicio + (tope - inicio) // PASO * PASO
+                nxt = min(cierre + PASO, fin_j)
+                current = fin_desc if desc & franja(cierre, nxt) else nxt
+
+            take = min(cierre - inicio, restante)
+            tramos.append((dia.id, aula_id, inicio, inicio + take))
+            restante -= take
+
+    # Relleno por fragmentos de 15 minutos en orden inverso de días
+    if restante > 0 and tramos:
+        for dia in reversed(dias_ordenados):
+            if restante <= 0:
+                break
+            aulas_dia = ocupacion.aulas.get(dia.id, {})
+            bloqueo = (ocupados | ocupacion.no_disp.get((docente_id, dia.id), 0)
+                       | ocupacion.descansos.get(dia.id, 0))
+            current = ini_j
+            while current < fin_j and restante > 0:
+                nxt = min(current + PASO, fin_j)
+                consulta = franja(current, nxt)
+                if not consulta & bloqueo:
+                    for aula_id in candidatas:
+                        if not consulta & aulas_dia.get(aula_id, 0):
+                            take = min(PASO, restante)
+                            tramos.append((dia.id, aula_id, current, current + take))
+                            restante -= take
+                current = nxt
+
+    if not tramos:
+        return False, f"No se encontró hueco suficiente para {minutos_semana} minutos", []
+
+    segmentos = []
+    for dia_id, aula_id, ini, fin in tramos:
+        ocupacion.registrar(dia_id, aula_id, docente_id, semestre_id, ini, fin)
+        segmentos.append(Segmento(
+            asignatura.id, docente_id, aula_id, dia_id, jornada, a_hora(ini), a_hora(fin)
+        ))
+    if restante > 0:
+        return True, f"Asignada parcialmente ({minutos_semana - restante}/{minutos_semana} min)", segmentos
+    return True, "Asignada completamente", segmentos
@@ -0,0 +1,128 @@
+# paquete_pdf.py
+"""
+Paquete de PDF de una institución: uno por docente y uno por semestre, en un ZIP.
+
+Los horarios se cargan en una sola consulta (HorarioPlano, sin joins) y se
+agrupan en memoria; el HTML
+de cada PDF se arma en el proceso principal (plantillas de Django, rápido) y
+solo WeasyPrint, que es lo que consume CPU, corre en un ProcessPoolExecutor.
+Cada proceso del pool parsea una vez la hoja de estilos común y la
+configuración de fuentes y las reutiliza en todos sus renders. Los PDF se
+escriben en el ZIP a medida que terminan, sin juntarlos en memoria.
+"""
+import logging
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.text import slugify
+
+from .plano import ordenados
+from .procesos import inicializar_worker, procesos_permitidos
+
+logger = logging.getLogger(__name__)
+
+TIPOS_PAQUETE = ("docentes", "semestres")
+
+# Estilos comunes a todos los PDF del paquete (se parsean una vez por proceso)
+CSS_PAQUETE = """
+@page { size: A4 landscape; margin: 1cm; }
+body { font-family: "Helvetica", sans-serif; font-size: 11px; }
+h2 { color: #2c3e50; }
+table { width: 100%; border-collapse: collapse; }
+th { background-color: #3498db; color: white; }
+th, td { padding: 6px; border: 1px solid #ccc; text-align: center; }
+"""
+
+_estilos = {}
+
+
+# ==========================
+# Documentos
+# ==========================
+def documentos_paquete(inst, tipos=TIPOS_PAQUETE):
+    """
+    [(nombre_archivo, html)] del paquete de `inst`, en orden estable. Una
+    consulta para todos los horarios; los descansos no van en el paquete.
+    """
+    por_docente, por_semestre = {}, {}
+    for h in ordenados(institucion=inst, es_descanso=False):
+        if h.docente_id:
+            docente = SimpleNamespace(id=h.docente_id, nombre=h.docente_nombre)
+            por_docente.setdefault(h.docente_id, (docente, []))[1].append(h)
+        if h.semestre_id is not None:
+            semestre = SimpleNamespace(
+                id=h.semestre_id, numero=h.semestre_numero, carrera=SimpleNamespace(nombre=h.carrera_nombre)
+            )
+            por_semestre.setdefault(h.semestre_id, (semestre, []))[1].append(h)
+
+    documentos = []
+    if "docentes" in tipos:
+        plantilla = get_template("admin/mi_app/horario_docente_pdf.html")
+        for docente, filas in sorted(por_docente.values(), key=lambda d: (d[0].nombre, d[0].id)):
+            documentos.append((
+                f"docentes/{slugify(docente.nombre) or 'docente'}-{docente.id}.pdf",
+                plantilla.render({"docente": docente, "horarios": filas}),
+            ))
+    if "semestres" in tipos:
+        plantilla = get_template("admin/mi_app/horario_semestre_pdf.html")
+        for semestre, filas in sorted(
+            por_semestre.values(), key=lambda s: (s[0].carrera.nombre, s[0].numero, s[0].id)
+        ):
+            documentos.append((
+                f"semestres/{slugify(semestre.carrera.nombre) or 'carrera'}-semestre-{semestre.numero}-{semestre.id}.pdf",
+                plantilla.render({"semestre": semestre, "horarios": filas}),
+            ))
+    return documentos
+
+
+# ==========================
+# Render
+# ==========================
+def _pdf_de_html(html):
+    """HTML -> bytes de PDF, con los estilos y fuentes compartidos del proceso."""
+    from weasyprint import CSS, HTML  # import diferido: requiere librerías nativas (pango)
+    from weasyprint.text.fonts import FontConfiguration
+
+    if not _estilos:
+        fuentes = FontConfiguration()
+        _estilos.update(fuentes=fuentes, css=CSS(string=CSS_PAQUETE, font_config=fuentes))
+    return HTML(string=html).write_pdf(stylesheets=[_estilos["css"]], font_config=_estilos["fuentes"])
+
+
+def _renderizar(documento):
+    nombre, html = documento
+    return nombre, _pdf_de_html(html)
+
+
+def escribir_paquete(documentos, destino, procesos=None):
+    """
+    Renderiza `documentos` ([(nombre, html)]) y los escribe en el ZIP
+    `destino` (ruta o archivo abierto). `procesos`: máximo de procesos (por
+    defecto HORARIOS_PROCESOS o los núcleos disponibles; uno dentro de un
+    worker de Celery); con uno solo se renderiza en el proceso actual.
+    Devuelve la cantidad de PDF escritos.
+    """
+    procesos = procesos_permitidos(procesos or getattr(settings, "HORARIOS_PROCESOS", None))
+    procesos = min(procesos, len(documentos)) or 1
+
+    # Los PDF ya vienen comprimidos: guardarlos tal cual es más rápido
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED) as zf:
+        if procesos <= 1:
+            for nombre, pdf in map(_renderizar, documentos):
+                zf.writestr(nombre, pdf)
+        else:
+            logger.info("Paquete PDF: %d documentos en %d procesos", len(documentos), procesos)
+            with ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_worker) as pool:
+                # map conserva el orden y entrega cada PDF apenas está listo
+                chunk = max(1, len(documentos) // (procesos * 4))
+                for nombre, pdf in pool.map(_renderizar, documentos, chunksize=chunk):
+                    zf.writestr(nombre, pdf)
+    return len(documentos)
+
+
+def generar_paquete(inst, destino, tipos=TIPOS_PAQUETE, procesos=None):
+    """Paquete ZIP de `inst` en `destino`. Devuelve la cantidad de PDF."""
+    return escribir_paquete(documentos_paquete(inst, tipos), destino, procesos)
@@ -0,0 +1,161 @@
+# particion.py
+"""
+Generación en paralelo por componentes independientes.
+
+Dos asignaturas se afectan si comparten docente o semestre, o si pueden ir
+el mismo día: además de las aulas, los motores reparten la carga entre días
+(ocupacion.carga_por_dia, la `carga` del motor exacto), así que una
+asignatura ubicada un día cambia el orden de días de las siguientes. Con
+esos recursos se arma un grafo asignatura ↔ recurso; cada componente conexa
+se resuelve por separado (en un ProcessPoolExecutor cuando hay más de una) y
+los resultados se vuelven a unir en el orden original de las asignaturas,
+listos para un único bulk_create. El resultado es el mismo que en serie.
+
+Los horarios ya existentes en la institución se copian en cada componente,
+así que la ocupación previa se respeta igual que en la generación serial.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+
+from .ocupacion import MapaOcupacion, asignar_horario_bitmask, preparar_asignatura
+from .procesos import inicializar_worker, procesos_permitidos
+from .solucionador import resolver_exacto
+
+logger = logging.getLogger(__name__)
+
+LOTE_AVANCE = 25  # asignaturas entre avisos de avance
+
+
+# ==========================
+# Componentes
+# ==========================
+def componentes(contexto):
+    """
+    Parte `contexto.asignaturas` en grupos que no comparten recursos.
+    Devuelve una lista de tuplas de AsignaturaInfo; dentro de cada grupo se
+    conserva el orden original y los grupos salen por su primera asignatura.
+    """
+    padre = {}
+
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    def unir(a, b):
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            padre[rb] = ra
+
+    for i, asignatura in enumerate(contexto.asignaturas):
+        nodo = ("asignatura", i)
+        padre[nodo] = nodo
+        motivo, prep = preparar_asignatura(asignatura, contexto)
+        if motivo:
+            continue  # no se ubica: queda sola
+        # El día cubre también las aulas: dos asignaturas que comparten un
+        # aula un día comparten ese día (y su carga)
+        recursos = [("docente", prep.docente_id), ("semestre", prep.semestre_id)]
+        recursos += [("dia", dia.id) for dia in prep.dias]
+        for recurso in recursos:
+            padre.setdefault(recurso, recurso)
+            unir(nodo, recurso)
+
+    grupos = {}
+    for i, asignatura in enumerate(contexto.asignaturas):
+        grupos.setdefault(raiz(("asignatura", i)), []).append(asignatura)
+    return [tuple(g) for g in grupos.values()]
+
+
+# ==========================
+# Resolución
+# ==========================
+def resolver_componente(contexto, motor, presupuesto=None, avance=None):
+    """
+    Ubica las asignaturas de `contexto` con el motor indicado ("bitmask" o
+    "exacto"). Devuelve (resultados, segmentos) con resultados =
+    [(asignatura, ok, motivo)]. No toca el ORM: se puede ejecutar en otro proceso.
+    `avance(hechas, total)` se llama cada LOTE_AVANCE asignaturas (y puede
+    lanzar una excepción para cortar la generación).
+    """
+    total = len(contexto.asignaturas)
+    if motor == "exacto":
+        if avance:
+            avance(0, total)
+        resultados, segmentos, completo = resolver_exacto(contexto, presupuesto)
+        if not completo:
+            logger.info("Motor exacto: presupuesto agotado en un componente de %d asignaturas", total)
+        return resultados, segmentos
+
+    ocupacion = MapaOcupacion.desde_contexto(contexto)
+    resultados, segmentos = [], []
+    for i, asignatura in enumerate(contexto.asignaturas):
+        if avance and i % LOTE_AVANCE == 0:
+            avance(i, total)
+        ok, motivo, segs = asignar_horario_bitmask(asignatura, contexto, ocupacion)
+        resultados.append((asignatura, ok, motivo))
+        segmentos.extend(segs)
+    return resultados, segmentos
+
+
+def resolver_por_componentes(contexto, motor, procesos=None, presupuesto=None, avance=None):
+    """
+    Resuelve `contexto` partiéndolo en componentes independientes.
+    `procesos`: máximo de procesos (por defecto, núcleos disponibles; uno
+    dentro de un worker de Celery, ver procesos.procesos_permitidos). Con un
+    solo componente o un solo proceso se resuelve todo en el proceso actual.
+    `avance(hechas, total)`: ver resolver_componente; en paralelo se llama
+    cada vez que termina un componente.
+    Devuelve (resultados, segmentos) en el orden original de las asignaturas.
+    """
+    procesos = procesos_permitidos(procesos)
+    if procesos <= 1:
+        return resolver_componente(contexto, motor, presupuesto, avance)
+    grupos = componentes(contexto)
+    if len(grupos) <= 1:
+        return resolver_componente(contexto, motor, presupuesto, avance)
+
+    total = len(contexto.asignaturas)
+    trabajadores = min(procesos, len(grupos))
+    logger.info("Generación en paralelo: %d componentes, %d procesos", len(grupos), trabajadores)
+
+    # Los grupos grandes primero, para que no queden solos al final
+    pendientes = sorted(range(len(grupos)), key=lambda g: -len(grupos[g]))
+    with ProcessPoolExecutor(max_workers=trabajadores, initializer=inicializar_worker) as pool:
+        futuros = {}
+        for g in pendientes:
+            parcial = None
+            if presupuesto is not None:
+                # Reparto del presupuesto: todos los componentes terminan en
+                # `presupuesto` segundos aunque haya más componentes que procesos.
+                parcial = min(presupuesto, presupuesto * trabajadores * len(grupos[g]) / total)
+            futuros[g] = pool.submit(
+                resolver_componente, replace(contexto, asignaturas=grupos[g]), motor, parcial
+            )
+        grupo_de = {f: g for g, f in futuros.items()}
+        try:
+            hechas = 0
+            for futuro in as_completed(grupo_de):
+                futuro.result()
+                hechas += len(grupos[grupo_de[futuro]])
+                if avance:
+                    avance(hechas, total)
+        except BaseException:
+            # Cancelación o error: no esperar a los componentes en cola
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        partes = [futuros[g].result() for g in range(len(grupos))]
+
+    posicion = {asig.id: i for i, asig in enumerate(contexto.asignaturas)}
+    resultados = sorted(
+        (r for parte_resultados, _ in partes for r in parte_resultados),
+        key=lambda r: posicion[r[0].id],
+    )
+    # sort estable: dentro de una asignatura se conserva el orden del motor
+    segmentos = sorted(
+        (s for _, parte_segmentos in partes for s in parte_segmentos),
+        key=lambda s: posicion[s.asignatura_id],
+    )
+    return resultados, segmentos
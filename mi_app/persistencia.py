@@ -0,0 +1,109 @@
+# persistencia.py
+"""
+Etapa de escritura de la generación de horarios.
+
+Los motores solo calculan `Segmento`s (ids y horas, sin objetos del ORM);
+aquí se escriben todos de una vez dentro de una única transacción. En
+PostgreSQL se usa COPY, que evita el parseo y la planificación de miles de
+INSERT; en otros motores de BD, bulk_create con un batch_size configurable.
+Con HORARIOS_VALIDAR_GENERADOS, antes de escribir se validan todas las filas
+en lote (validacion.validar_horarios) y un error aborta la escritura.
+"""
+import csv
+import io
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Horario
+from .plano import sincronizar
+from .validacion import validar_o_fallar
+from .versiones import tocar_version
+
+logger = logging.getLogger(__name__)
+
+# Orden de columnas de COPY (nombres de campo del modelo Horario)
+CAMPOS_COPY = (
+    "institucion_id", "usuario_id", "asignatura_id", "docente_id", "aula_id",
+    "dia_id", "jornada", "hora_inicio", "hora_fin",
+)
+
+
+def _usar_copy():
+    return connection.vendor == "postgresql" and getattr(settings, "HORARIOS_USAR_COPY", True)
+
+
+def _csv_segmentos(usuario_id, institucion_id, segmentos):
+    """Segmentos en CSV (orden CAMPOS_COPY), listo para COPY ... FROM STDIN."""
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    for s in segmentos:
+        w.writerow((
+            institucion_id, usuario_id, s.asignatura_id, s.docente_id, s.aula_id,
+            s.dia_id, s.jornada,
+            "" if s.hora_inicio is None else s.hora_inicio.isoformat(),
+            "" if s.hora_fin is None else s.hora_fin.isoformat(),
+        ))
+    buf.seek(0)
+    return buf
+
+
+def _copiar(usuario_id, institucion_id, segmentos):
+    opts = Horario._meta
+    qn = connection.ops.quote_name
+    columnas = ", ".join(qn(opts.get_field(c.removesuffix("_id")).column) for c in CAMPOS_COPY)
+    sql = f"COPY {qn(opts.db_table)} ({columnas}) FROM STDIN WITH (FORMAT csv)"
+    buf = _csv_segmentos(usuario_id, institucion_id, segmentos)
+
+    with connection.cursor() as cursor:
+        crudo = cursor.cursor
+        if hasattr(crudo, "copy_expert"):  # psycopg2
+            crudo.copy_expert(sql, buf)
+        else:                              # psycopg 3
+            with crudo.copy(sql) as copia:
+                copia.write(buf.getvalue())
+
+
+def guardar_segmentos(usuario, inst, segmentos, validar=None, reemplazar=False):
+    """
+    Escribe `segmentos` como filas Horario de `usuario` en `inst`, en una sola
+    transacción. Devuelve el número de filas escritas.
+    `validar`: valida el lote antes de escribir (por defecto,
+    HORARIOS_VALIDAR_GENERADOS); si alguna fila falla lanza ValidationError.
+    `reemplazar`: borra antes, en la misma transacción, el horario actual de
+    `usuario` en `inst`; si algo falla queda el anterior.
+    """
+    segmentos = list(segmentos)
+    if not segmentos and not reemplazar:
+        return 0
+    if validar is None:
+        validar = getattr(settings, "HORARIOS_VALIDAR_GENERADOS", False)
+
+    t0 = time.monotonic()
+    filas = None
+    if validar or not _usar_copy():
+        filas = [
+            Horario(usuario_id=usuario.id, institucion_id=inst.id, **s._asdict())
+            for s in segmentos
+        ]
+
+    with transaction.atomic():
+        if reemplazar:
+            # Borrado masivo sin señales: la versión y la copia plana se ponen al día abajo
+            Horario.objects.filter(usuario_id=usuario.id, institucion_id=inst.id).delete()
+        if validar:
+            # Después del borrado: el horario reemplazado no cuenta como choque
+            validar_o_fallar(filas)
+        if _usar_copy():
+            _copiar(usuario.id, inst.id, segmentos)
+        else:
+            Horario.objects.bulk_create(filas, batch_size=getattr(settings, "HORARIOS_BATCH_SIZE", 1000))
+        tocar_version(inst.id, usuario.id)
+        sincronizar(inst.id, usuario.id)
+    logger.info(
+        "Persistencia: %d horarios en %.1f ms (%s)", len(segmentos),
+        (time.monotonic() - t0) * 1000, "COPY" if _usar_copy() else "bulk_create",
+    )
+    return len(segmentos)
@@ -0,0 +1,224 @@
+# planillas.py
+"""
+Exportación de horarios a CSV y XLSX en streaming.
+
+Las filas salen de HorarioPlano con `.values_list(...).iterator()` (sin instanciar modelos ni
+cargar todo el resultado) y cada bloque de filas se entrega al cliente apenas
+se escribe, así que la memoria no crece con la cantidad de horarios y los
+primeros bytes llegan enseguida.
+
+El XLSX se arma a mano (un .xlsx es un ZIP con unos pocos XML): el ZIP se
+escribe sobre un destino sin `seek`, con lo que zipfile usa descriptores de
+datos y no necesita volver atrás; las celdas van como texto en línea, sin
+tabla de cadenas compartidas que habría que juntar en memoria.
+"""
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import Http404, StreamingHttpResponse
+
+COLUMNAS = (
+    ("Día", "dia_nombre"),
+    ("Jornada", "jornada"),
+    ("Hora inicio", "hora_inicio"),
+    ("Hora fin", "hora_fin"),
+    ("Carrera", "carrera_nombre"),
+    ("Semestre", "semestre_numero"),
+    ("Asignatura", "asignatura_nombre"),
+    ("Docente", "docente_nombre"),
+    ("Aula", "aula_nombre"),
+)
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# Filtros de ver_horarios y sus equivalentes en la lista del admin
+FILTROS = {
+    "carrera": "carrera_id",
+    "semestre": "semestre_id",
+    "plano__semestre__id__exact": "semestre_id",
+    "jornada": "jornada",
+    "jornada__exact": "jornada",
+    "dia": "dia_id",
+    "dia__id__exact": "dia_id",
+}
+
+FILAS_POR_BLOQUE = 500
+
+
+# ==========================
+# Filas
+# ==========================
+def filtrar_horarios(qs, datos):
+    """
+    Aplica a `qs` (de HorarioPlano) los filtros presentes en `datos` (p. ej.
+    request.GET). Los ids que no son números se ignoran, como en
+    exportacion.filtros_pdf.
+    """
+    for parametro, campo in FILTROS.items():
+        valor = str(datos.get(parametro) or "").strip()
+        if not valor or (campo.endswith("_id") and not valor.isdigit()):
+            continue
+        qs = qs.filter(**{campo: valor})
+    return qs
+
+
+def filas_horarios(qs):
+    """Tuplas en el orden de COLUMNAS, leídas por cursor (sin cargar todo el resultado)."""
+    return (
+        qs.order_by("dia_orden", "inicio_min", "horario_id")
+        .values_list(*(campo for _, campo in COLUMNAS))
+        .iterator(chunk_size=2000)
+    )
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "strftime"):
+        return valor.strftime("%H:%M")
+    return valor
+
+
+def _bloques(filas, n=FILAS_POR_BLOQUE):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= n:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+# ==========================
+# CSV
+# ==========================
+def csv_en_streaming(filas):
+    """Genera el CSV (con BOM, para que Excel respete los acentos) en trozos de texto."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")
+    w.writerow([titulo for titulo, _ in COLUMNAS])
+    for bloque in _bloques(filas):
+        w.writerows([_texto(v) for v in fila] for fila in bloque)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+# ==========================
+# XLSX
+# ==========================
+class _Sumidero:
+    """Destino de escritura sin seek: junta lo escrito hasta que se vacía."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Horarios" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_HOJA_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_HOJA_FIN = '</sheetData></worksheet>'
+
+
+def _celda(valor):
+    valor = _texto(valor)
+    if isinstance(valor, int):
+        return f'<c t="n"><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(valor))}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return "<row>" + "".join(_celda(v) for v in valores) + "</row>"
+
+
+def xlsx_en_streaming(filas):
+    """Genera el XLSX en trozos de bytes (una hoja, encabezado en la primera fila)."""
+    sumidero = _Sumidero()
+    with zipfile.ZipFile(sumidero, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield sumidero.vaciar()
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja:
+            hoja.write((_HOJA_INICIO + _fila_xml(t for t, _ in COLUMNAS)).encode())
+            for bloque in _bloques(filas):
+                hoja.write("".join(_fila_xml(fila) for fila in bloque).encode())
+                datos = sumidero.vaciar()
+                if datos:
+                    yield datos
+            hoja.write(_HOJA_FIN.encode())
+    yield sumidero.vaciar()
+
+
+def exportar(filas, formato):
+    """Iterador de trozos del archivo en `formato` ("csv" o "xlsx")."""
+    if formato == "xlsx":
+        return xlsx_en_streaming(filas)
+    return csv_en_streaming(filas)
+
+
+def respuesta_planilla(qs, formato, nombre="horarios"):
+    """StreamingHttpResponse con las filas de `qs` en CSV o XLSX."""
+    if formato not in FORMATOS:
+        raise Http404("Formato no soportado")
+    content_type, extension = FORMATOS[formato]
+    response = StreamingHttpResponse(exportar(filas_horarios(qs), formato), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{nombre}.{extension}"'
+    return response
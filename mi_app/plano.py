@@ -0,0 +1,160 @@
+# plano.py
+"""
+Mantenimiento de HorarioPlano, la copia desnormalizada de Horario que leen
+las vistas, las exportaciones y el admin.
+
+- Al final de cada generación (y de cada reprogramación) `sincronizar`
+  compara por id el horario del usuario con su copia: borra las filas
+  planas cuyo Horario ya no existe e inserta en lote las que faltan. Los
+  borrados masivos de Horario se resuelven igual, llamando a `sincronizar`
+  después.
+- Las ediciones a mano (admin) rehacen solo las filas tocadas: `refrescar`
+  con el filtro de Horario que corresponda (la fila, una asignatura, un
+  semestre), o un UPDATE directo cuando solo cambia un nombre (`renombrar`).
+  Las señales están en signals.py.
+- Los borrados de asignaturas, docentes, aulas, etc. llegan solos: las FK
+  de HorarioPlano borran en cascada.
+- Los update() masivos no pasan por nada de esto: `reconstruir` (comando
+  `reconstruir_plano`) rehace la copia entera.
+"""
+import logging
+
+from django.db import transaction
+
+from .models import Horario, HorarioPlano
+
+logger = logging.getLogger(__name__)
+
+# Campo de HorarioPlano -> camino desde Horario
+ORIGEN = {
+    "horario_id": "id",
+    "institucion_id": "institucion_id",
+    "usuario_id": "usuario_id",
+    "asignatura_id": "asignatura_id",
+    "docente_id": "docente_id",
+    "aula_id": "aula_id",
+    "dia_id": "dia_id",
+    "carrera_id": "asignatura__semestre__carrera_id",
+    "semestre_id": "asignatura__semestre_id",
+    "dia_orden": "dia__orden",
+    "dia_nombre": "dia__nombre",
+    "jornada": "jornada",
+    "hora_inicio": "hora_inicio",
+    "hora_fin": "hora_fin",
+    "asignatura_nombre": "asignatura__nombre",
+    "docente_nombre": "docente__nombre",
+    "aula_nombre": "aula__nombre",
+    "carrera_nombre": "asignatura__semestre__carrera__nombre",
+    "semestre_numero": "asignatura__semestre__numero",
+}
+
+# Nombres que se copian: modelo -> {campo del modelo: campo de HorarioPlano}
+NOMBRES = {
+    "Docente": ("docente_id", {"nombre": "docente_nombre"}),
+    "Aula": ("aula_id", {"nombre": "aula_nombre"}),
+    "CarreraUniversitaria": ("carrera_id", {"nombre": "carrera_nombre"}),
+    "DiaSemana": ("dia_id", {"nombre": "dia_nombre", "orden": "dia_orden"}),
+}
+
+LOTE = 1000
+
+
+def ordenados(**filtros):
+    """Filas planas que cumplen `filtros`, en el orden de la semana (día, hora), por índice."""
+    return HorarioPlano.objects.filter(**filtros).order_by("dia_orden", "inicio_min", "horario_id")
+
+
+def agrupar_por_dia(filas):
+    """{nombre del día: [filas]} de `filas` ya ordenadas (lo que pintan las grillas por día)."""
+    por_dia = {}
+    for fila in filas:
+        por_dia.setdefault(fila.dia_nombre, []).append(fila)
+    return por_dia
+
+
+def _minutos(t):
+    return None if t is None else t.hour * 60 + t.minute
+
+
+def filas_planas(horarios):
+    """
+    HorarioPlano (sin guardar) de los Horario de `horarios`, en una
+    consulta. Se lee todo antes de insertar: la consulta puede depender de
+    la misma tabla plana (sincronizar). La migración 0017 tiene su propia
+    copia de esto.
+    """
+    campos = tuple(ORIGEN)
+    for valores in list(horarios.order_by().values_list(*ORIGEN.values())):
+        datos = dict(zip(campos, valores))
+        datos["inicio_min"] = _minutos(datos["hora_inicio"])
+        datos["fin_min"] = _minutos(datos["hora_fin"])
+        datos["es_descanso"] = datos["asignatura_nombre"] == "DESCANSO"
+        datos["carrera_nombre"] = datos["carrera_nombre"] or ""
+        yield HorarioPlano(**datos)
+
+
+def insertar_planas(horarios):
+    """Inserta en lotes las filas planas de `horarios`. Devuelve cuántas."""
+    filas, total = [], 0
+    for fila in filas_planas(horarios):
+        filas.append(fila)
+        if len(filas) >= LOTE:
+            HorarioPlano.objects.bulk_create(filas)
+            total += len(filas)
+            filas = []
+    if filas:
+        HorarioPlano.objects.bulk_create(filas)
+        total += len(filas)
+    return total
+
+
+# ==========================
+# Mantenimiento
+# ==========================
+def sincronizar(institucion_id, usuario_id):
+    """
+    Pone al día la copia del horario de `usuario_id` en `institucion_id`:
+    borra las filas de Horario que ya no existen e inserta las nuevas.
+    Devuelve (borradas, insertadas).
+    """
+    propios = Horario.objects.filter(institucion_id=institucion_id, usuario_id=usuario_id)
+    planos = HorarioPlano.objects.filter(institucion_id=institucion_id, usuario_id=usuario_id)
+    with transaction.atomic():
+        borradas = planos.exclude(horario_id__in=propios.values("id")).delete()[0]
+        insertadas = insertar_planas(propios.exclude(id__in=planos.values("horario_id")))
+    if borradas or insertadas:
+        logger.info("Horario plano: %d filas borradas, %d insertadas", borradas, insertadas)
+    return borradas, insertadas
+
+
+def refrescar(**filtros):
+    """Rehace las filas planas de los Horario que cumplen `filtros` (lookups de Horario)."""
+    origen = Horario.objects.filter(**filtros)
+    with transaction.atomic():
+        HorarioPlano.objects.filter(horario_id__in=origen.values("id")).delete()
+        return insertar_planas(origen)
+
+
+def renombrar(instancia):
+    """Copia a las filas planas los nombres de `instancia` (Docente, Aula, carrera o día): un UPDATE."""
+    campo, copiados = NOMBRES[type(instancia).__name__]
+    return HorarioPlano.objects.filter(**{campo: instancia.pk}).update(
+        **{destino: getattr(instancia, origen) for origen, destino in copiados.items()}
+    )
+
+
+def borrar(horario_ids):
+    """Quita las filas planas de Horario borrados uno a uno (sin cascada, ver HorarioPlano)."""
+    return HorarioPlano.objects.filter(horario_id__in=list(horario_ids)).delete()[0]
+
+
+def reconstruir(institucion_id=None):
+    """Rehace toda la copia (de una institución o de todas). Devuelve las filas insertadas."""
+    horarios = Horario.objects.all()
+    planos = HorarioPlano.objects.all()
+    if institucion_id is not None:
+        horarios = horarios.filter(institucion_id=institucion_id)
+        planos = planos.filter(institucion_id=institucion_id)
+    with transaction.atomic():
+        planos.delete()
+        return insertar_planas(horarios)
@@ -0,0 +1,30 @@
+# procesos.py
+"""
+Utilidades comunes a los ProcessPoolExecutor (generación por componentes,
+paquete de PDF).
+"""
+import logging
+import multiprocessing
+import os
+
+import django
+
+logger = logging.getLogger(__name__)
+
+
+def procesos_permitidos(procesos=None):
+    """
+    Procesos que se pueden usar: `procesos` o los núcleos disponibles, y uno
+    solo dentro de un proceso daemon (los hijos del pool prefork de Celery no
+    pueden tener hijos: ahí se trabaja en el proceso actual).
+    """
+    procesos = procesos or os.cpu_count() or 1
+    if procesos > 1 and multiprocessing.current_process().daemon:
+        logger.info("Proceso daemon (worker de Celery): sin pool de procesos")
+        return 1
+    return procesos
+
+
+def inicializar_worker():
+    """`initializer` de los pools: con "spawn" el proceso hijo arranca sin apps cargadas."""
+    django.setup()
@@ -1,7 +1,12 @@
 # mi_app/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Institucion, DiaSemana
+from .models import (
+    Asignatura, Aula, CarreraUniversitaria, Descanso, DiaSemana, Docente, Horario, HorarioPlano, Institucion,
+    Semestre,
+)
+from . import plano
+from .versiones import tocar_todas, tocar_version
 
 DIAS = [
     ("LU", "Lunes", 1),
@@ -23,3 +28,79 @@ def crear_dias_por_defecto(sender, instance, created, **kwargs):
             codigo=codigo,
             defaults={"nombre": nombre, "orden": orden},
         )
+
+
+# Versión del horario: lo que cambia una fila o un nombre visible en los horarios.
+# Horario sin post_delete a propósito (ver versiones.py).
+@receiver(post_save, sender=Horario)
+@receiver(post_save, sender=Descanso)
+@receiver(post_delete, sender=Descanso)
+def tocar_version_usuario(sender, instance, **kwargs):
+    tocar_version(instance.institucion_id, instance.usuario_id)
+
+
+# Datos compartidos de la institución: suben la versión de todos sus usuarios
+@receiver(post_save, sender=Asignatura)
+@receiver(post_delete, sender=Asignatura)
+@receiver(post_save, sender=Docente)
+@receiver(post_delete, sender=Docente)
+@receiver(post_save, sender=Aula)
+@receiver(post_delete, sender=Aula)
+@receiver(post_save, sender=Semestre)
+@receiver(post_delete, sender=Semestre)
+@receiver(post_save, sender=CarreraUniversitaria)
+@receiver(post_delete, sender=CarreraUniversitaria)
+def tocar_version_horario(sender, instance, **kwargs):
+    tocar_version(instance.institucion_id)
+
+
+# Copia plana (plano.py): ediciones a mano. Los borrados llegan por cascada y
+# los altas nuevas aún no tienen filas que actualizar.
+@receiver(post_save, sender=Horario)
+def refrescar_plano_horario(sender, instance, **kwargs):
+    plano.refrescar(id=instance.pk)
+
+
+@receiver(post_save, sender=Asignatura)
+def refrescar_plano_asignatura(sender, instance, created, **kwargs):
+    if not created:
+        plano.refrescar(asignatura_id=instance.pk)
+
+
+@receiver(post_save, sender=Semestre)
+def refrescar_plano_semestre(sender, instance, created, **kwargs):
+    if not created:
+        plano.refrescar(asignatura__semestre_id=instance.pk)
+
+
+@receiver(post_save, sender=Docente)
+@receiver(post_save, sender=Aula)
+@receiver(post_save, sender=CarreraUniversitaria)
+@receiver(post_save, sender=DiaSemana)
+def renombrar_plano(sender, instance, created, **kwargs):
+    if not created:
+        plano.renombrar(instance)
+
+def rellenar_orden_dias():
+    """
+    Asigna `orden` a todos los días según su código, en un único UPDATE
+    (la migración 0010 tiene su propia copia), y lo copia a HorarioPlano:
+    el update() no pasa por renombrar_plano y las vistas ordenan por la
+    copia. Devuelve la cantidad de días actualizados.
+    """
+    from django.db import transaction
+    from django.db.models import Case, IntegerField, OuterRef, Subquery, When
+
+    codigos = [codigo for codigo, _, _ in DIAS]
+    with transaction.atomic():
+        actualizados = DiaSemana.objects.filter(codigo__in=codigos).update(
+            orden=Case(
+                *[When(codigo=codigo, then=orden) for codigo, _, orden in DIAS],
+                output_field=IntegerField(),
+            )
+        )
+        HorarioPlano.objects.filter(dia__codigo__in=codigos).update(
+            dia_orden=Subquery(DiaSemana.objects.filter(pk=OuterRef("dia_id")).values("orden")[:1])
+        )
+        tocar_todas()
+    return actualizados
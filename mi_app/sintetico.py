@@ -0,0 +1,181 @@
+# sintetico.py
+"""
+Instituciones sintéticas reproducibles y medición del pipeline de generación.
+
+`crear_institucion_sintetica` arma una institución completa (carreras,
+semestres, asignaturas, docentes con no disponibilidad, aulas y descansos) a
+partir de una semilla y un tamaño; la misma semilla produce siempre los
+mismos datos. `medir_generacion` ejecuta la generación y devuelve tiempo,
+consultas, memoria pico, minutos ubicados y asignaturas fallidas.
+
+El tiempo se mide en una pasada sin tracemalloc (el trazado hace mucho más
+lentas las asignaciones y no afecta igual a todos los motores); la memoria
+pico sale de una segunda pasada trazada. Es solo la del proceso principal:
+los procesos del pool de la generación en paralelo (procesos.py) no se
+trazan, así que con HORARIOS_PROCESOS > 1 no incluye lo que usan ellos.
+"""
+import random
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import time as _time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .contexto import SchedulingContext
+from .generar_horarios import generar_horarios_local
+from .models import (
+    Institucion, PerfilUsuario, DiaSemana, Aula, Docente, CarreraUniversitaria,
+    Semestre, Asignatura, NoDisponibilidad, Descanso, Horario,
+)
+from .ocupacion import a_minutos, preparar_asignatura
+from .utils import obtener_asignatura_descanso
+from .plano import sincronizar
+from .versiones import tocar_version
+
+Medicion = namedtuple(
+    "Medicion",
+    "motor asignaturas segundos consultas memoria_pico_mb minutos_pedidos minutos_ubicados fallidas",
+)
+
+JORNADAS_PESOS = (("Mañana", 5), ("Tarde", 3), ("Noche", 2))
+NO_DISP_BLOQUES = {
+    "Mañana": [(_time(7, 30), _time(9, 0)), (_time(10, 30), _time(12, 50))],
+    "Tarde": [(_time(13, 30), _time(15, 0)), (_time(16, 30), _time(18, 15))],
+    "Noche": [(_time(18, 15), _time(20, 0))],
+}
+
+
+# ==========================
+# Generador
+# ==========================
+def crear_institucion_sintetica(seed=1, n_asignaturas=100, n_carreras=None, semestres_por_carrera=4,
+                                n_docentes=None, n_aulas=None):
+    """
+    Crea una institución sintética y su usuario coordinador. Los tamaños que
+    no se indiquen se derivan de `n_asignaturas`. Devuelve (institucion, usuario).
+    """
+    rnd = random.Random(seed)
+    n_carreras = n_carreras or max(1, round(n_asignaturas / 30))
+    n_docentes = n_docentes or max(3, n_asignaturas // 3)
+    n_aulas = n_aulas or max(2, n_asignaturas // 8)
+
+    etiqueta = f"{seed}-{n_asignaturas}"
+    inst = Institucion.objects.create(nombre=f"Sintética {etiqueta}", slug=f"sintetica-{etiqueta}")
+    user = User.objects.create_user(f"bench-{etiqueta}", password=None, is_staff=True)
+    PerfilUsuario.objects.create(user=user, institucion=inst)
+    dias = list(DiaSemana.objects.filter(institucion=inst).order_by("orden"))[:6]  # lunes a sábado
+
+    aulas = Aula.objects.bulk_create([Aula(institucion=inst, nombre=f"Aula {i + 1}") for i in range(n_aulas)])
+    docentes = Docente.objects.bulk_create([
+        Docente(institucion=inst, nombre=f"Docente {i + 1}", correo=f"docente{i + 1}@sintetica.test")
+        for i in range(n_docentes)
+    ])
+
+    semestres = []
+    for c in range(n_carreras):
+        carrera = CarreraUniversitaria.objects.create(institucion=inst, nombre=f"Carrera {c + 1}")
+        n_dias = rnd.randint(4, 6)
+        inicio = rnd.randint(0, 6 - n_dias)
+        carrera.dias_clase.set(dias[inicio:inicio + n_dias])
+        semestres += Semestre.objects.bulk_create([
+            Semestre(institucion=inst, carrera=carrera, numero=n + 1)
+            for n in range(semestres_por_carrera)
+        ])
+
+    jornadas = [j for j, peso in JORNADAS_PESOS for _ in range(peso)]
+    asignaturas = Asignatura.objects.bulk_create([
+        Asignatura(
+            institucion=inst,
+            nombre=f"Asignatura {i + 1:04d}",
+            semestre=rnd.choice(semestres),
+            jornada=rnd.choice(jornadas),
+            aula=rnd.choice(aulas) if rnd.random() < 0.15 else None,
+            horas_totales=rnd.choice((32, 48, 64, 96)),
+            semanas=16,
+        )
+        for i in range(n_asignaturas)
+    ])
+    Through = Asignatura.docentes.through
+    Through.objects.bulk_create([
+        Through(asignatura_id=asig.id, docente_id=doc.id)
+        for asig in asignaturas
+        for doc in rnd.sample(docentes, 2 if rnd.random() < 0.2 else 1)
+    ])
+
+    no_disp = []
+    for doc in docentes:
+        if rnd.random() >= 0.3:
+            continue
+        for _ in range(rnd.randint(1, 2)):
+            jornada = rnd.choice(jornadas)
+            ini, fin = rnd.choice(NO_DISP_BLOQUES[jornada])
+            no_disp.append(NoDisponibilidad(
+                institucion=inst, docente=doc, dia=rnd.choice(dias),
+                jornada=jornada, hora_inicio=ini, hora_fin=fin,
+            ))
+    NoDisponibilidad.objects.bulk_create(no_disp)
+
+    Descanso.objects.bulk_create([
+        Descanso(institucion=inst, usuario=user, dia=dia, nombre="Pausa",
+                 hora_inicio=_time(10, 0), hora_fin=_time(10, 20))
+        for dia in dias[:5]
+    ])
+    return inst, user
+
+
+# ==========================
+# Medición
+# ==========================
+def _limpiar(usuario, inst):
+    Horario.objects.filter(usuario=usuario, institucion=inst).delete()
+    tocar_version(inst.id, usuario.id)
+    sincronizar(inst.id, usuario.id)
+
+
+def medir_generacion(usuario, inst, motor=None, presupuesto=None, memoria=True):
+    """
+    Ejecuta la generación completa (limpieza incluida) y devuelve una
+    Medicion. `memoria`: repite la generación con tracemalloc para la memoria
+    pico del proceso principal; sin ella, `memoria_pico_mb` es None.
+    """
+    motor = motor or getattr(settings, "HORARIOS_MOTOR", "bitmask")
+
+    _limpiar(usuario, inst)
+    with CaptureQueriesContext(connection) as ctx:
+        t0 = time.perf_counter()
+        errores = generar_horarios_local(usuario, inst, motor=motor, presupuesto=presupuesto)
+        segundos = time.perf_counter() - t0
+
+    pico = None
+    if memoria:
+        _limpiar(usuario, inst)
+        tracemalloc.start()
+        try:
+            errores = generar_horarios_local(usuario, inst, motor=motor, presupuesto=presupuesto)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    # Fuera de la medición: minutos pedidos vs. ubicados
+    contexto = SchedulingContext.cargar(usuario, inst)
+    pedidos = 0
+    for asig in contexto.asignaturas:
+        motivo, prep = preparar_asignatura(asig, contexto)
+        if prep:
+            pedidos += prep.minutos_semana
+    ubicados = sum(
+        a_minutos(fin) - a_minutos(ini)
+        for ini, fin in Horario.objects.filter(usuario=usuario, institucion=inst)
+        .exclude(asignatura=obtener_asignatura_descanso(inst))
+        .values_list("hora_inicio", "hora_fin")
+    )
+
+    return Medicion(
+        motor=motor, asignaturas=len(contexto.asignaturas), segundos=segundos,
+        consultas=len(ctx.captured_queries), memoria_pico_mb=None if pico is None else pico / (1024 * 1024),
+        minutos_pedidos=pedidos, minutos_ubicados=ubicados, fallidas=len(errores),
+    )
@@ -0,0 +1,316 @@
+# solucionador.py
+"""
+Motor exacto: búsqueda con retroceso (branch & bound) sobre sesiones.
+
+Cada asignatura se parte en sesiones de hasta DURACION_MAX_SESION minutos.
+El dominio de una sesión es, por día, una máscara de inicios posibles en la
+grilla de 15 minutos. Se elige siempre la sesión más restringida (menos
+inicios libres), y al ubicarla se podan los dominios de las sesiones que
+comparten docente, semestre o aula fija (forward checking). Una sesión puede
+quedar sin ubicar; la búsqueda maximiza los minutos ubicados y, al agotarse
+el presupuesto de tiempo, devuelve la mejor solución encontrada.
+
+A diferencia de los motores voraces, los cruces de docente, semestre y no
+disponibilidad se evalúan por día.
+"""
+import time
+from collections import namedtuple
+
+from .ocupacion import PASO, Segmento, a_minutos, a_hora, rango, marca, franja, preparar_asignatura
+
+DURACION_MAX_SESION = 120  # minutos
+_SALTAR = object()         # valor "sesión sin ubicar"
+
+Sesion = namedtuple("Sesion", "asignatura jornada docente_id semestre_id duracion aulas dias")
+
+
+def _duraciones(minutos):
+    """Reparte `minutos` (múltiplo de 15) en sesiones parejas de hasta DURACION_MAX_SESION."""
+    k = -(-minutos // DURACION_MAX_SESION)
+    base, extra = divmod(minutos // PASO, k)
+    return [(base + (1 if i < extra else 0)) * PASO for i in range(k)]
+
+
+def _inicios_prohibidos(inicio, fin, duracion):
+    """Máscara de inicios (índice = minuto // 15) de una sesión de `duracion` que choca con [inicio, fin)."""
+    lo = (inicio - duracion) // PASO + 1
+    hi = (fin - 1) // PASO
+    return rango(max(lo, 0), hi + 1)
+
+
+class Solucionador:
+    def __init__(self, contexto, presupuesto):
+        self.contexto = contexto
+        self.presupuesto = presupuesto
+        self.motivos = {}    # asignatura_id -> motivo de descarte previo
+        self.sesiones = []
+        self.minutos = {}    # asignatura_id -> minutos/semana pedidos
+
+        # Ocupación previa por día (horarios ya existentes de la institución)
+        self.ocup_docente = {}
+        self.ocup_semestre = {}
+        self.ocup_aula = {}
+        for h in contexto.horarios:
+            if h.hora_inicio is None or h.hora_fin is None:
+                continue
+            m = marca(a_minutos(h.hora_inicio), a_minutos(h.hora_fin, techo=True))
+            for tabla, clave in ((self.ocup_docente, h.docente_id),
+                                 (self.ocup_semestre, h.semestre_id),
+                                 (self.ocup_aula, h.aula_id)):
+                if clave is not None:
+                    tabla[(h.dia_id, clave)] = tabla.get((h.dia_id, clave), 0) | m
+
+        self.descansos = {}
+        for d in contexto.descansos:
+            m = marca(a_minutos(d.hora_inicio), a_minutos(d.hora_fin, techo=True))
+            self.descansos[d.dia_id] = self.descansos.get(d.dia_id, 0) | m
+
+        self.no_disp = {}
+        for (docente_id, dia_id), bloques in contexto.no_disp_por_docente_dia.items():
+            m = 0
+            for nd in bloques:
+                m |= marca(a_minutos(nd.hora_inicio), a_minutos(nd.hora_fin, techo=True))
+            self.no_disp[(dia_id, docente_id)] = m
+
+        for asig in contexto.asignaturas:
+            motivo, prep = preparar_asignatura(asig, contexto)
+            if motivo:
+                self.motivos[asig.id] = motivo
+                continue
+            self.minutos[asig.id] = prep.minutos_semana
+            for dur in _duraciones(prep.minutos_semana):
+                self.sesiones.append((asig, prep, dur))
+
+    # ---------- dominios iniciales ----------
+    def _dominio_inicial(self, prep, dur):
+        dominio = {}
+        primero = -(-prep.ini_j // PASO)
+        for dia in prep.dias:
+            bloqueo = (self.descansos.get(dia.id, 0)
+                       | self.no_disp.get((dia.id, prep.docente_id), 0)
+                       | self.ocup_docente.get((dia.id, prep.docente_id), 0)
+                       | self.ocup_semestre.get((dia.id, prep.semestre_id), 0))
+            if len(prep.candidatas) == 1:
+                bloqueo |= self.ocup_aula.get((dia.id, prep.candidatas[0]), 0)
+            mask = 0
+            i = primero
+            while i * PASO + dur <= prep.fin_j:
+                if not franja(i * PASO, i * PASO + dur) & bloqueo:
+                    mask |= 1 << i
+                i += 1
+            dominio[dia.id] = mask
+        return dominio
+
+    # ---------- búsqueda ----------
+    def resolver(self):
+        """Devuelve (resultados, segmentos, completo) con resultados = [(asignatura, ok, motivo)]."""
+        n = len(self.sesiones)
+        ses = [
+            Sesion(asig, prep.jornada, prep.docente_id, prep.semestre_id, dur, prep.candidatas, prep.dias)
+            for asig, prep, dur in self.sesiones
+        ]
+        dominio = [self._dominio_inicial(prep, dur) for _, prep, dur in self.sesiones]
+        tamano = [sum(m.bit_count() for m in d.values()) for d in dominio]
+
+        por_docente, por_semestre, por_aula_fija = {}, {}, {}
+        for i, s in enumerate(ses):
+            por_docente.setdefault(s.docente_id, []).append(i)
+            por_semestre.setdefault(s.semestre_id, []).append(i)
+            if len(s.aulas) == 1:
+                por_aula_fija.setdefault(s.aulas[0], []).append(i)
+        vecinos = [
+            sorted((set(por_docente[s.docente_id]) | set(por_semestre[s.semestre_id])) - {i})
+            for i, s in enumerate(ses)
+        ]
+        grado = [len(v) for v in vecinos]
+        orden_dia = {dia.id: dia.orden for s in ses for dia in s.dias}
+
+        ocup_docente = dict(self.ocup_docente)
+        ocup_semestre = dict(self.ocup_semestre)
+        ocup_aula = dict(self.ocup_aula)
+        carga = {}   # dia_id -> sesiones ubicadas
+        usos = {}    # (asignatura_id, dia_id) -> sesiones ubicadas
+
+        asignado = [None] * n
+        libre = [True] * n
+        ubicado = 0
+        potencial = sum(s.duracion for i, s in enumerate(ses) if tamano[i])
+        total = potencial
+        mejor, mejor_valor = None, -1
+        rastro = []
+
+        def valores(v):
+            s = ses[v]
+            dias = sorted(
+                (d for d in s.dias if dominio[v][d.id]),
+                key=lambda d: (usos.get((s.asignatura.id, d.id), 0), carga.get(d.id, 0), d.orden),
+            )
+            for dia in dias:
+                mask = dominio[v][dia.id]
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    inicio = (bit.bit_length() - 1) * PASO
+                    consulta = franja(inicio, inicio + s.duracion)
+                    for aula in s.aulas:
+                        if not consulta & ocup_aula.get((dia.id, aula), 0):
+                            yield (dia.id, inicio, aula)
+                            break
+            yield _SALTAR
+
+        def podar(u, dia_id, prohibidos):
+            nonlocal potencial
+            viejo = dominio[u].get(dia_id, 0)
+            nuevo = viejo & ~prohibidos
+            if nuevo == viejo:
+                return
+            rastro.append((u, dia_id, viejo))
+            dominio[u][dia_id] = nuevo
+            tamano[u] -= (viejo ^ nuevo).bit_count()
+            if not tamano[u]:
+                potencial -= ses[u].duracion
+
+        def ocupar(tabla, clave, m):
+            rastro.append((tabla, clave, tabla.get(clave)))
+            tabla[clave] = tabla.get(clave, 0) | m
+
+        def contar(tabla, clave):
+            rastro.append((tabla, clave, tabla.get(clave)))
+            tabla[clave] = tabla.get(clave, 0) + 1
+
+        def aplicar(v, valor):
+            nonlocal ubicado, potencial
+            s = ses[v]
+            libre[v] = False
+            asignado[v] = valor
+            potencial -= s.duracion
+            if valor is _SALTAR:
+                return
+            dia_id, inicio, aula = valor
+            fin = inicio + s.duracion
+            ubicado += s.duracion
+            m = marca(inicio, fin)
+            ocupar(ocup_docente, (dia_id, s.docente_id), m)
+            ocupar(ocup_semestre, (dia_id, s.semestre_id), m)
+            ocupar(ocup_aula, (dia_id, aula), m)
+            contar(carga, dia_id)
+            contar(usos, (s.asignatura.id, dia_id))
+
+            afectados = vecinos[v]
+            if aula in por_aula_fija:
+                afectados = sorted((set(afectados) | set(por_aula_fija[aula])) - {v})
+            for u in afectados:
+                if libre[u] and tamano[u]:
+                    podar(u, dia_id, _inicios_prohibidos(inicio, fin, ses[u].duracion))
+
+        def deshacer(v, marca_rastro):
+            nonlocal ubicado, potencial
+            s = ses[v]
+            while len(rastro) > marca_rastro:
+                a, b, viejo = rastro.pop()
+                if isinstance(a, int):
+                    if not tamano[a]:
+                        potencial += ses[a].duracion
+                    tamano[a] += (dominio[a][b] ^ viejo).bit_count()
+                    dominio[a][b] = viejo
+                elif viejo is None:
+                    del a[b]
+                else:
+                    a[b] = viejo
+            if asignado[v] is not _SALTAR:
+                ubicado -= s.duracion
+            potencial += s.duracion
+            asignado[v] = None
+            libre[v] = True
+
+        def elegir():
+            elegido, clave = None, None
+            for i in range(n):
+                if libre[i] and tamano[i]:
+                    k = (tamano[i], -ses[i].duracion, -grado[i], i)
+                    if clave is None or k < clave:
+                        elegido, clave = i, k
+            return elegido
+
+        limite = time.monotonic() + self.presupuesto
+        pila = []   # [v, generador de valores, marca de rastro]
+        completo = False
+        pasos = 0
+        bajar = True
+        while True:
+            pasos += 1
+            if not pasos & 255 and time.monotonic() > limite:
+                break
+            if bajar:
+                if ubicado + potencial <= mejor_valor:
+                    bajar = False
+                    continue
+                v = elegir()
+                if v is None:
+                    if ubicado > mejor_valor:
+                        mejor, mejor_valor = list(asignado), ubicado
+                        if mejor_valor == total:
+                            completo = True
+                            break
+                    bajar = False
+                    continue
+                pila.append([v, valores(v), len(rastro)])
+            if not pila:
+                completo = True
+                break
+            v, gen, marca_rastro = pila[-1]
+            if asignado[v] is not None:
+                deshacer(v, marca_rastro)
+            valor = next(gen, None)
+            if valor is None:
+                pila.pop()
+                bajar = False
+                continue
+            if valor is _SALTAR and ubicado + potencial - ses[v].duracion <= mejor_valor:
+                bajar = False
+                continue
+            aplicar(v, valor)
+            bajar = True
+
+        if mejor is None:
+            mejor = list(asignado)
+        return self._resultados(ses, mejor, orden_dia) + (completo,)
+
+    def _resultados(self, ses, solucion, orden_dia):
+        posicion = {asig.id: i for i, asig in enumerate(self.contexto.asignaturas)}
+        ubicados = {}
+        segmentos = []
+        for s, valor in zip(ses, solucion):
+            if valor is None or valor is _SALTAR:
+                continue
+            dia_id, inicio, aula = valor
+            ubicados[s.asignatura.id] = ubicados.get(s.asignatura.id, 0) + s.duracion
+            segmentos.append((posicion[s.asignatura.id], orden_dia[dia_id], inicio, Segmento(
+                s.asignatura.id, s.docente_id, aula, dia_id, s.jornada,
+                a_hora(inicio), a_hora(inicio + s.duracion),
+            )))
+        segmentos.sort(key=lambda x: x[:3])
+
+        resultados = []
+        for asig in self.contexto.asignaturas:
+            if asig.id in self.motivos:
+                resultados.append((asig, False, self.motivos[asig.id]))
+                continue
+            pedidos = self.minutos[asig.id]
+            hechos = ubicados.get(asig.id, 0)
+            if not hechos:
+                resultados.append((asig, False, f"No se encontró hueco suficiente para {pedidos} minutos"))
+            elif hechos < pedidos:
+                resultados.append((asig, True, f"Asignada parcialmente ({hechos}/{pedidos} min)"))
+            else:
+                resultados.append((asig, True, "Asignada completamente"))
+        return resultados, [seg for *_, seg in segmentos]
+
+
+def resolver_exacto(contexto, presupuesto):
+    """
+    Resuelve todas las asignaturas de `contexto` con un límite de `presupuesto`
+    segundos. Devuelve (resultados, segmentos, completo); `completo` indica que
+    la búsqueda terminó (solución óptima) antes de agotar el presupuesto.
+    """
+    return Solucionador(contexto, presupuesto).resolver()
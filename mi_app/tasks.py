@@ -1,18 +1,30 @@
 from mi_proyecto.celery import shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Institucion
-from .generar_horarios import generar_horarios_view
+from .models import Institucion, GeneracionJob
+from .utils import obtener_institucion
+from .exportacion import renderizar_pdf
+from . import workers  # noqa: F401  (registra el latido del worker)
 
 @shared_task
-def generar_horarios_task(user_id, institucion_id=None):
-    User = get_user_model()
-    user = User.objects.get(id=user_id)
-    inst = Institucion.objects.get(id=institucion_id) if institucion_id else None
+def generar_horarios_task(user_id, institucion_id=None, motor=None, job_id=None):
+    # import diferido: jobs -> generar_horarios importa este módulo
+    from .jobs import ejecutar_job
 
-    class DummyRequest:
-        def __init__(self, user):
-            self.user = user
-            self.GET = {}
+    if job_id:
+        job = GeneracionJob.objects.select_related("usuario", "institucion").get(pk=job_id)
+    else:
+        User = get_user_model()
+        user = User.objects.get(id=user_id)
+        inst = Institucion.objects.get(id=institucion_id) if institucion_id else obtener_institucion(user)
+        job = GeneracionJob.objects.create(usuario=user, institucion=inst, motor=motor or "")
 
-    dummy_request = DummyRequest(user)
-    return generar_horarios_view(dummy_request, None)
\ No newline at end of file
+    # El motor exacto usa casi todo el margen del soft time limit de Celery
+    presupuesto = getattr(settings, "HORARIOS_EXACTO_PRESUPUESTO_CELERY", 1200)
+    job = ejecutar_job(job, presupuesto=presupuesto)
+    return {"job": job.pk, "estado": job.estado, "fallidas": len(job.fallidas)}
+
+
+@shared_task
+def exportar_pdf_task(usuario_id, filtros, clave):
+    return str(renderizar_pdf(usuario_id, filtros, clave))
@@ -1,3 +1,1510 @@
-from django.test import TestCase
+import csv
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import re
+import shutil
+import tempfile
+import time as time_mod
+import zipfile
+from datetime import date, time
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .contexto import SchedulingContext
+from .generar_horarios import generar_horarios_local
+from .ocupacion import MapaOcupacion, asignar_horario_bitmask, a_minutos
+from .solucionador import resolver_exacto
+from .particion import componentes, resolver_por_componentes
+from .incremental import reprogramar_incremental
+from .persistencia import guardar_segmentos, _csv_segmentos
+from .validacion import validar_horarios
+from . import exportacion
+from .calendario import token_calendario, url_calendario
+from .paquete_pdf import documentos_paquete, escribir_paquete
+from .auditoria import FilaAuditoria, auditar_filas, auditar_institucion, barrer
+from .utils import horarios_ordenados, ordenar_por_dia
+from .versiones import tocar_version, version_horario
+from .ocupacion import Segmento
+from .lotes import ControladorLotes
+from .sintetico import crear_institucion_sintetica, medir_generacion
+from .jobs import ejecutar_job
+from .tasks import generar_horarios_task
+from . import diferencias, instantaneas
+from . import cache_horarios, plano, views, workers
+from django.core.cache import caches
+from django.db.models import F
+from django.http import HttpResponse
+
+from .models import (
+    Institucion, PerfilUsuario, DiaSemana, Aula, Docente, CarreraUniversitaria,
+    Semestre, Asignatura, NoDisponibilidad, Descanso, Horario, HorarioPlano, HorarioGuardado, GeneracionJob,
+    error_jornada,
+)
+
+
+def crear_institucion_densa(seed=7, n_asignaturas=40, n_docentes=8, n_aulas=3):
+    """Institución pequeña pero muy cargada (fuerza huecos, descansos y relleno)."""
+    rnd = random.Random(seed)
+    inst = Institucion.objects.create(nombre=f"Inst {seed}", slug=f"inst-{seed}")
+    user = User.objects.create_user(f"coord{seed}", password="x", is_staff=True)
+    PerfilUsuario.objects.create(user=user, institucion=inst)
+    otro = User.objects.create_user(f"otro{seed}", password="x", is_staff=True)
+
+    dias = list(DiaSemana.objects.filter(institucion=inst).order_by("orden"))
+    aulas = [Aula.objects.create(institucion=inst, nombre=f"A{i}") for i in range(n_aulas)]
+    docentes = [
+        Docente.objects.create(institucion=inst, nombre=f"D{i}", correo=f"d{i}@x.co")
+        for i in range(n_docentes)
+    ]
+    carreras = []
+    for c in range(2):
+        car = CarreraUniversitaria.objects.create(institucion=inst, nombre=f"Carrera {c}")
+        car.dias_clase.set(dias[:5] if c == 0 else dias[1:4])
+        carreras.append(car)
+    semestres = [
+        Semestre.objects.create(institucion=inst, carrera=car, numero=n)
+        for car in carreras for n in (1, 2)
+    ]
+    for i in range(n_asignaturas):
+        asig = Asignatura.objects.create(
+            institucion=inst,
+            nombre=f"Asig {i:03d}",
+            semestre=rnd.choice(semestres),
+            jornada=rnd.choice(["Mañana", "Mañana", "Tarde", "Noche"]),
+            aula=rnd.choice(aulas) if rnd.random() < 0.3 else None,
+            horas_totales=rnd.choice([32, 48, 64, 96]),
+            semanas=16,
+        )
+        asig.docentes.set(rnd.sample(docentes, rnd.choice([1, 1, 2])))
+
+    martes = DiaSemana.objects.get(institucion=inst, nombre="Martes")
+    for doc in rnd.sample(docentes, 3):
+        NoDisponibilidad.objects.create(
+            institucion=inst, docente=doc, dia=martes, jornada="Mañana",
+            hora_inicio=time(9, 10), hora_fin=time(10, 5),
+        )
+    for dia in dias[:3]:
+        Descanso.objects.create(
+            institucion=inst, usuario=user, dia=dia, nombre="Pausa",
+            hora_inicio=time(10, 0), hora_fin=time(10, 20),
+        )
+    # Horarios de otro usuario (incluye uno de duración cero, como los del relleno)
+    asig0 = Asignatura.objects.filter(institucion=inst).first()
+    for ini, fin in [(time(8, 0), time(9, 0)), (time(14, 0), time(14, 0)), (time(11, 7), time(11, 52))]:
+        Horario.objects.create(
+            institucion=inst, usuario=otro, asignatura=asig0, docente=docentes[0],
+            aula=aulas[0], dia=dias[0], jornada="Mañana" if ini < time(13) else "Tarde",
+            hora_inicio=ini, hora_fin=fin,
+        )
+    return inst, user
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class MotorBitmaskTests(TestCase):
+    def _generar(self, inst, user, motor):
+        Horario.objects.filter(institucion=inst, usuario=user).delete()
+        errores = generar_horarios_local(user, inst, motor=motor)
+        filas = list(
+            Horario.objects.filter(institucion=inst, usuario=user)
+            .order_by("id")
+            .values_list("asignatura_id", "docente_id", "aula_id", "dia_id",
+                         "jornada", "hora_inicio", "hora_fin")
+        )
+        return errores, filas
+
+    def test_mismas_asignaciones_que_motor_clasico(self):
+        for seed, n in [(1, 30), (2, 60), (3, 90)]:
+            inst, user = crear_institucion_densa(seed=seed, n_asignaturas=n)
+            clasico = self._generar(inst, user, "clasico")
+            bitmask = self._generar(inst, user, "bitmask")
+            self.assertTrue(clasico[1])
+            self.assertEqual(clasico, bitmask)
+
+
+    def test_no_disponibilidad_solo_bloquea_su_dia(self):
+        inst, user = crear_institucion_densa(seed=4, n_asignaturas=20)
+        martes = DiaSemana.objects.get(institucion=inst, nombre="Martes")
+        docente = Docente.objects.filter(institucion=inst, asignaturas_asignadas__jornada="Mañana").first()
+        NoDisponibilidad.objects.create(
+            institucion=inst, docente=docente, dia=martes, jornada="Mañana",
+            hora_inicio=time(7, 30), hora_fin=time(12, 50),
+        )
+        for motor in ("clasico", "bitmask", "exacto"):
+            with self.subTest(motor):
+                _errores, filas = self._generar(inst, user, motor)
+                del_docente = [f for f in filas if f[1] == docente.id and f[4] == "Mañana" and f[5] != f[6]]
+                self.assertTrue(del_docente)
+                self.assertNotIn(martes.id, {f[3] for f in del_docente})
+
+    def test_choque_al_guardar_usa_el_indice(self):
+        inst, user = crear_institucion_densa(seed=5, n_asignaturas=5)
+        nd = NoDisponibilidad.objects.filter(institucion=inst).select_related("dia").first()
+        h = Horario(
+            institucion=inst, usuario=user, docente=nd.docente, dia=nd.dia,
+            asignatura=Asignatura.objects.filter(institucion=inst).first(),
+            aula=Aula.objects.filter(institucion=inst).first(),
+            jornada="Mañana", hora_inicio=time(9, 30), hora_fin=time(10, 0),
+        )
+        with self.assertRaises(ValidationError):
+            h.save()
+        h.dia = DiaSemana.objects.get(institucion=inst, orden=nd.dia.orden + 1)
+        h.save()
+
+        plan = NoDisponibilidad.objects.filter(
+            institucion_id=inst.id, docente_id=nd.docente_id, dia_id=nd.dia_id,
+            hora_inicio__lt=time(10), hora_fin__gt=time(9, 30),
+        ).explain()
+        if connection.vendor == "sqlite":
+            self.assertIn("mi_app_nodi_institu_8e5cb6_idx", plan)
+
+
+class SchedulingContextTests(TestCase):
+    def _lecturas_generacion(self, seed, n):
+        inst, user = crear_institucion_densa(seed=seed, n_asignaturas=n)
+        with CaptureQueriesContext(connection) as ctx:
+            generar_horarios_local(user, inst, motor="bitmask")
+        # Los INSERT se parten en lotes según el motor de BD; las lecturas no deben crecer
+        return sum(1 for q in ctx.captured_queries if q["sql"].startswith("SELECT"))
+
+    def test_consultas_no_dependen_del_numero_de_asignaturas(self):
+        self.assertEqual(self._lecturas_generacion(1, 10), self._lecturas_generacion(2, 80))
+
+    def test_motor_no_toca_el_orm(self):
+        inst, user = crear_institucion_densa(seed=3, n_asignaturas=30)
+        with self.assertNumQueries(7):
+            contexto = SchedulingContext.cargar(user, inst)
+        ocupacion = MapaOcupacion.desde_contexto(contexto)
+        with self.assertNumQueries(0):
+            for asignatura in contexto.asignaturas:
+                asignar_horario_bitmask(asignatura, contexto, ocupacion)
+
+
+class MotorExactoTests(TestCase):
+    def _minutos(self, inst, user):
+        return sum(
+            a_minutos(fin) - a_minutos(ini)
+            for ini, fin in Horario.objects.filter(institucion=inst, usuario=user)
+            .values_list("hora_inicio", "hora_fin")
+        )
+
+    def test_sin_cruces_por_dia(self):
+        inst, user = crear_institucion_densa(seed=4, n_asignaturas=40)
+        generar_horarios_local(user, inst, motor="exacto", presupuesto=5)
+        filas = list(
+            Horario.objects.filter(institucion=inst)
+            .values_list("dia_id", "aula_id", "docente_id", "asignatura__semestre_id",
+                         "hora_inicio", "hora_fin", "usuario_id")
+        )
+        nuevas = [f for f in filas if f[6] == user.id]
+        self.assertTrue(nuevas)
+        for i, a in enumerate(nuevas):
+            self.assertLess(a[4], a[5])
+            for b in filas:
+                if b is a or b[0] != a[0] or not (a[4] < b[5] and a[5] > b[4]):
+                    continue
+                self.assertNotEqual(a[1], b[1], (a, b))
+                if b[6] == user.id:
+                    self.assertNotEqual(a[2], b[2], (a, b))
+                    self.assertNotEqual(a[3], b[3], (a, b))
+
+    def test_ubica_al_menos_lo_mismo_que_el_voraz(self):
+        inst, user = crear_institucion_densa(seed=5, n_asignaturas=30)
+        generar_horarios_local(user, inst, motor="bitmask")
+        voraz = self._minutos(inst, user)
+        Horario.objects.filter(institucion=inst, usuario=user).delete()
+        generar_horarios_local(user, inst, motor="exacto", presupuesto=5)
+        self.assertGreaterEqual(self._minutos(inst, user), voraz)
+
+    def test_respeta_presupuesto(self):
+        inst, user = crear_institucion_densa(seed=6, n_asignaturas=90)
+        contexto = SchedulingContext.cargar(user, inst)
+        t0 = time_mod.monotonic()
+        resultados, segmentos, _completo = resolver_exacto(contexto, 0.2)
+        self.assertLess(time_mod.monotonic() - t0, 2)
+        self.assertEqual(len(resultados), len(contexto.asignaturas))
+
+
+def crear_institucion_por_carreras(n_carreras=3, n_asignaturas=12, dias_compartidos=False):
+    """
+    Carreras sin docentes ni semestres en común; con `dias_compartidos`
+    todas van los mismos dos días, si no cada una los suyos.
+    """
+    inst = Institucion.objects.create(nombre="Inst islas", slug="inst-islas")
+    user = User.objects.create_user("coord-islas", password="x", is_staff=True)
+    PerfilUsuario.objects.create(user=user, institucion=inst)
+    dias = list(DiaSemana.objects.filter(institucion=inst).order_by("orden"))
+    aulas = [Aula.objects.create(institucion=inst, nombre=f"A{i}") for i in range(2)]
+    for c in range(n_carreras):
+        car = CarreraUniversitaria.objects.create(institucion=inst, nombre=f"Carrera {c}")
+        car.dias_clase.set(dias[:2] if dias_compartidos else dias[2 * c:2 * c + 2])
+        sem = Semestre.objects.create(institucion=inst, carrera=car, numero=1)
+        docentes = [
+            Docente.objects.create(institucion=inst, nombre=f"D{c}-{i}", correo=f"d{c}{i}@x.co")
+            for i in range(2)
+        ]
+        for i in range(n_asignaturas):
+            asig = Asignatura.objects.create(
+                institucion=inst, nombre=f"Asig {c}-{i:02d}", semestre=sem,
+                jornada="Mañana", aula=aulas[i % 2] if i % 3 == 0 else None,
+                horas_totales=64, semanas=16,
+            )
+            asig.docentes.set([docentes[i % 2]])
+    return inst, user
+
+
+class ParticionTests(TestCase):
+    def test_componentes_independientes(self):
+        inst, user = crear_institucion_por_carreras()
+        contexto = SchedulingContext.cargar(user, inst)
+        grupos = componentes(contexto)
+        self.assertEqual(len(grupos), 3)
+        self.assertEqual(sorted(a.id for g in grupos for a in g), sorted(a.id for a in contexto.asignaturas))
+
+        # Recursos compartidos unen componentes
+        denso, usuario_denso = crear_institucion_densa(seed=8, n_asignaturas=20)
+        self.assertEqual(len(componentes(SchedulingContext.cargar(usuario_denso, denso))), 1)
+
+    def test_paralelo_igual_a_serial(self):
+        inst, user = crear_institucion_por_carreras()
+        contexto = SchedulingContext.cargar(user, inst)
+        self.assertEqual(pickle.loads(pickle.dumps(contexto)), contexto)
+
+        serial = resolver_por_componentes(contexto, "bitmask", procesos=1)
+        paralelo = resolver_por_componentes(contexto, "bitmask", procesos=3)
+        self.assertTrue(serial[1])
+        self.assertEqual(serial, paralelo)
+
+    def test_dias_compartidos_van_juntos(self):
+        # El reparto de carga por día acopla a las carreras que comparten días
+        inst, user = crear_institucion_por_carreras(dias_compartidos=True)
+        contexto = SchedulingContext.cargar(user, inst)
+        self.assertEqual(len(componentes(contexto)), 1)
+        serial = resolver_por_componentes(contexto, "bitmask", procesos=1)
+        self.assertEqual(resolver_por_componentes(contexto, "bitmask", procesos=3), serial)
+
+    @override_settings(HORARIOS_PROCESOS=None)
+    def test_tarea_celery_no_abre_procesos(self):
+        inst, user = crear_institucion_por_carreras()
+        job = GeneracionJob.objects.create(usuario=user, institucion=inst, motor="bitmask")
+        daemon = mock.Mock(daemon=True)
+        with mock.patch("mi_app.procesos.multiprocessing.current_process", return_value=daemon), \
+                mock.patch("mi_app.particion.ProcessPoolExecutor", side_effect=AssertionError("pool en daemon")):
+            r = generar_horarios_task(user.id, inst.id, "bitmask", job.id)
+        self.assertEqual(r["estado"], GeneracionJob.COMPLETADO)
+        self.assertTrue(Horario.objects.filter(usuario=user).exists())
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class ReprogramacionIncrementalTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=9, n_asignaturas=40)
+        generar_horarios_local(self.user, self.inst, motor="bitmask")
+
+    def _filas(self, **filtro):
+        return set(
+            Horario.objects.filter(institucion=self.inst, usuario=self.user, **filtro)
+            .values_list("id", "asignatura_id", "dia_id", "hora_inicio", "hora_fin")
+        )
+
+    def test_sin_horario_generado_no_hace_nada(self):
+        Horario.objects.filter(usuario=self.user).delete()
+        self.assertIsNone(reprogramar_incremental(self.user, self.inst, asignatura_ids=[1]))
+        self.assertFalse(Horario.objects.filter(usuario=self.user).exists())
+
+    def test_solo_se_reubica_la_asignatura_editada(self):
+        asig = Asignatura.objects.filter(institucion=self.inst, jornada="Mañana").first()
+        otras = self._filas(asignatura__institucion=self.inst) - self._filas(asignatura=asig)
+        nuevo = Docente.objects.create(institucion=self.inst, nombre="Nuevo", correo="nuevo@x.co")
+        asig.docentes.set([nuevo])
+
+        self.assertEqual(reprogramar_incremental(self.user, self.inst, asignatura_ids=[asig.id]), [])
+
+        self.assertEqual(self._filas() - self._filas(asignatura=asig), otras)
+        nuevas = Horario.objects.filter(usuario=self.user, asignatura=asig)
+        self.assertTrue(nuevas.exists())
+        self.assertEqual(set(nuevas.values_list("docente_id", flat=True)), {nuevo.id})
+
+    def test_no_disponibilidad_nueva_desplaza_al_docente(self):
+        h = Horario.objects.filter(
+            usuario=self.user, hora_inicio__lt=time(12), jornada="Mañana"
+        ).exclude(asignatura__nombre="DESCANSO").exclude(hora_inicio=F("hora_fin")).first()
+        NoDisponibilidad.objects.create(
+            institucion=self.inst, docente=h.docente, dia=h.dia, jornada="Mañana",
+            hora_inicio=time(7, 30), hora_fin=time(12, 50),
+        )
+        ajenas = self._filas() - self._filas(asignatura__docentes=h.docente)
+
+        reprogramar_incremental(self.user, self.inst, docente_ids=[h.docente_id])
+
+        self.assertTrue(ajenas <= self._filas())
+        self.assertFalse(
+            Horario.objects.filter(usuario=self.user, docente=h.docente, dia=h.dia, jornada="Mañana")
+            .exclude(hora_inicio=F("hora_fin")).exists()
+        )
+
+    def test_una_sola_version_por_reprogramacion(self):
+        def version():
+            return PerfilUsuario.objects.values_list("version_horario", flat=True).get(user=self.user)
+
+        asig = Asignatura.objects.filter(institucion=self.inst).exclude(nombre="DESCANSO").first()
+        antes = version()
+        with mock.patch("mi_app.incremental.sincronizar") as sincronizar_temprano:
+            reprogramar_incremental(self.user, self.inst, asignatura_ids=[asig.id], descansos=True)
+        self.assertEqual(version(), antes + 1)
+        sincronizar_temprano.assert_not_called()  # la sincroniza guardar_segmentos
+
+    def test_docente_secundario_no_reubica_la_asignatura(self):
+        asig = Asignatura.objects.filter(institucion=self.inst).exclude(nombre="DESCANSO").first()
+        suplente = Docente.objects.create(institucion=self.inst, nombre="Suplente", correo="suplente@x.co")
+        asig.docentes.add(suplente)  # id mayor: el asignado sigue siendo el primero
+        antes = self._filas()
+
+        reprogramar_incremental(self.user, self.inst, docente_ids=[suplente.id])
+
+        self.assertEqual(self._filas(), antes)
+
+    def test_borrar_descansos_desde_el_listado_reprograma(self):
+        dia = DiaSemana.objects.get(institucion=self.inst, orden=4)
+        descanso = Descanso.objects.create(
+            institucion=self.inst, usuario=self.user, dia=dia, nombre="Almuerzo",
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        reprogramar_incremental(self.user, self.inst, descansos=True)
+        filas = Horario.objects.filter(usuario=self.user, asignatura__nombre="DESCANSO", dia=dia, hora_inicio=time(8, 0))
+        self.assertTrue(filas.exists())
+
+        self.client.force_login(self.user)
+        self.client.post(reverse("admin:mi_app_descanso_changelist"), {
+            "action": "delete_selected", "_selected_action": [descanso.pk], "post": "yes",
+        })
+        self.assertFalse(Descanso.objects.filter(pk=descanso.pk).exists())
+        self.assertFalse(filas.exists())
+
+    def test_descanso_nuevo_reubica_clases_que_chocan(self):
+        dia = DiaSemana.objects.get(institucion=self.inst, orden=4)
+        Descanso.objects.create(
+            institucion=self.inst, usuario=self.user, dia=dia, nombre="Almuerzo",
+            hora_inicio=time(8, 0), hora_fin=time(9, 0),
+        )
+        reprogramar_incremental(self.user, self.inst, descansos=True)
+
+        self.assertTrue(Horario.objects.filter(
+            usuario=self.user, asignatura__nombre="DESCANSO", dia=dia, hora_inicio=time(8, 0)
+        ).exists())
+        self.assertFalse(
+            Horario.objects.filter(usuario=self.user, dia=dia, hora_inicio__lt=time(9), hora_fin__gt=time(8))
+            .exclude(asignatura__nombre="DESCANSO").exists()
+        )
+
+
+class PersistenciaTests(TestCase):
+    def _segmentos(self, n):
+        inst, user = crear_institucion_densa(seed=10, n_asignaturas=2)
+        asig = Asignatura.objects.filter(institucion=inst).first()
+        doc = Docente.objects.filter(institucion=inst).first()
+        aula = Aula.objects.filter(institucion=inst).first()
+        dia = DiaSemana.objects.filter(institucion=inst).first()
+        segs = [
+            Segmento(asig.id, doc.id, aula.id, dia.id, "Mañana", time(7, 30), time(8, i % 60))
+            for i in range(n)
+        ]
+        return inst, user, segs
+
+    @override_settings(HORARIOS_BATCH_SIZE=1000)
+    def test_una_transaccion_y_pocos_insert(self):
+        inst, user, segs = self._segmentos(250)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(guardar_segmentos(user, inst, segs), 250)
+        sqls = [q["sql"] for q in ctx.captured_queries]
+        # Sin SELECT de claves foráneas: solo INSERT (partidos por el límite de parámetros de SQLite)
+        # y los UPDATE de la versión del horario (institución y usuario);
+        # aparte, la sincronización de la copia plana
+        version = [q for q in sqls if q.startswith(('UPDATE "mi_app_institucion"', 'UPDATE "mi_app_perfilusuario"'))]
+        self.assertEqual(len(version), 2)
+        planos = [q for q in sqls if '"mi_app_horarioplano"' in q]
+        # DELETE, SELECT y los INSERT en lote (también partidos por el límite de parámetros)
+        self.assertLessEqual(len(planos), 2 + 250 * len(HorarioPlano._meta.concrete_fields) // 999 + 1)
+        sqls = [q for q in sqls if q not in planos]
+        resto = [q for q in sqls if q not in version]
+        self.assertTrue(all(q.startswith(("INSERT", "SAVEPOINT", "RELEASE")) for q in resto), resto[:3])
+        self.assertLessEqual(sum(q.startswith("INSERT") for q in sqls), 250 * 9 // 999 + 1)
+        self.assertEqual(Horario.objects.filter(usuario=user, institucion=inst).count(), 250)
+        self.assertEqual(HorarioPlano.objects.filter(usuario=user, institucion=inst).count(), 250)
+
+    def test_csv_para_copy(self):
+        _inst, _user, segs = self._segmentos(2)
+        lineas = _csv_segmentos(5, 3, segs).read().splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertEqual(lineas[0].split(",")[:2], ["3", "5"])
+        self.assertTrue(lineas[1].endswith("Mañana,07:30:00,08:01:00"))
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class ValidacionHorariosTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=19, n_asignaturas=4)
+        self.asigs = list(Asignatura.objects.filter(institucion=self.inst).order_by("id"))
+        self.docentes = list(Docente.objects.filter(institucion=self.inst).order_by("id"))
+        self.aulas = list(Aula.objects.filter(institucion=self.inst).order_by("id"))
+        self.dias = list(DiaSemana.objects.filter(institucion=self.inst).order_by("orden"))
+
+    def _fila(self, i=0, ini=time(8, 0), fin=time(9, 0), jornada="Mañana", **campos):
+        datos = dict(
+            institucion=self.inst, usuario=self.user, asignatura=self.asigs[i % len(self.asigs)],
+            docente=self.docentes[i % len(self.docentes)], aula=self.aulas[i % len(self.aulas)],
+            dia=self.dias[i % 5], jornada=jornada, hora_inicio=ini, hora_fin=fin,
+        )
+        datos.update(campos)
+        return Horario(**datos)
+
+    def test_consultas_constantes(self):
+        for n in (3, 60):
+            filas = [self._fila(i, ini=time(7, 30 + i % 4 * 5), fin=time(7, 50 + i % 4 * 2)) for i in range(n)]
+            with self.assertNumQueries(6):
+                errores = validar_horarios(filas)
+            self.assertEqual(len(errores), n)
+
+    def test_errores_por_fila(self):
+        existente = self._fila(0, ini=time(8, 0), fin=time(9, 0))
+        existente.save()
+        martes = self.dias[1]
+        NoDisponibilidad.objects.create(
+            institucion=self.inst, docente=self.docentes[3], dia=martes, jornada="Mañana",
+            hora_inicio=time(10, 0), hora_fin=time(11, 0),
+        )
+        otra = Institucion.objects.create(nombre="Otra", slug="otra")
+        filas = [
+            self._fila(1, aula=existente.aula, dia=existente.dia, ini=time(8, 30), fin=time(9, 30)),
+            self._fila(2, ini=time(14, 0), fin=time(15, 0)),
+            self._fila(3, docente=self.docentes[3], dia=martes, ini=time(10, 30), fin=time(11, 30)),
+            self._fila(4, dia=DiaSemana.objects.filter(institucion=otra).first()),
+            self._fila(5, dia=self.dias[4], ini=time(11, 0), fin=time(12, 0)),
+            self._fila(6, docente=self.docentes[5], dia=self.dias[4], ini=time(11, 30), fin=time(12, 0)),
+            self._fila(7, dia=self.dias[3], ini=time(9, 0), fin=time(10, 0)),
+        ]
+        errores = validar_horarios(filas)
+        self.assertIn("El aula ya está ocupada ese día de 08:00 a 09:00.", errores[0])
+        self.assertTrue(any("jornada" in e for e in errores[1]))
+        self.assertIn("El docente no está disponible en ese horario.", errores[2])
+        self.assertIn("El campo 'dia' no pertenece a la institución.", errores[3])
+        self.assertEqual(errores[4], [])
+        self.assertTrue(any(e.startswith("El docente ya tiene clase") for e in errores[5]), errores[5])
+        self.assertEqual(errores[6], [])
+
+    def test_lo_generado_pasa_la_validacion(self):
+        for motor in ("bitmask", "exacto"):
+            with self.subTest(motor), override_settings(HORARIOS_VALIDAR_GENERADOS=True):
+                Horario.objects.filter(usuario=self.user).delete()
+                generar_horarios_local(self.user, self.inst, motor=motor)
+                self.assertTrue(Horario.objects.filter(usuario=self.user).exists())
+
+    def test_persistencia_valida_y_no_escribe(self):
+        seg = Segmento(self.asigs[0].id, self.docentes[0].id, self.aulas[0].id, self.dias[0].id,
+                       "Mañana", time(8, 0), time(9, 0))
+        with self.assertRaises(ValidationError) as cm:
+            guardar_segmentos(self.user, self.inst, [seg, seg], validar=True)
+        self.assertTrue(any(m.startswith("Fila 2:") for m in cm.exception.messages))
+        self.assertFalse(Horario.objects.filter(usuario=self.user).exists())
+
+    def test_admin_rechaza_choques(self):
+        existente = self._fila(0)
+        existente.save()
+        self.client.force_login(self.user)
+        datos = {
+            "usuario": self.user.id, "asignatura": self.asigs[1].id, "docente": self.docentes[1].id,
+            "aula": existente.aula_id, "dia": existente.dia_id, "jornada": "Mañana",
+            "hora_inicio": "08:15", "hora_fin": "08:45",
+        }
+        r = self.client.post(reverse("admin:mi_app_horario_add"), datos)
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "El aula ya está ocupada")
+        self.assertEqual(Horario.objects.filter(usuario=self.user).count(), 1)
+
+        datos["aula"] = self.aulas[1].id
+        r = self.client.post(reverse("admin:mi_app_horario_add"), datos)
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(Horario.objects.filter(usuario=self.user).count(), 2)
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class AuditoriaTests(TestCase):
+    def _fila(self, id, ini, fin, docente=1, aula=1, semestre=1, dia=1, jornada="Mañana"):
+        return FilaAuditoria(id, "u", dia, "Lunes", jornada, ini, fin,
+                             docente, f"D{docente}", aula, f"A{aula}", semestre, 1, "C", f"Asig {id}")
+
+    def test_barrer(self):
+        tramos = [(1, 3, "a"), (2, 4, "b"), (4, 5, "c"), (0, 10, "d"), (6, 6, "e")]
+        pares = {frozenset(p) for p in barrer(tramos)}
+        self.assertEqual(pares, {
+            frozenset("ab"), frozenset("ad"), frozenset("bd"), frozenset("cd"), frozenset("de"),
+        })
+        self.assertEqual(barrer([(1, 2, "a"), (2, 3, "b")]), [])
+
+    def test_detecta_choques_jornada_y_no_disponibilidad(self):
+        filas = [
+            self._fila(1, time(8, 0), time(9, 0)),
+            self._fila(2, time(8, 30), time(9, 30), aula=2, semestre=2),
+            self._fila(3, time(8, 30), time(9, 30), docente=3, semestre=3, dia=2),
+            self._fila(4, time(14, 0), time(15, 0), docente=4, aula=4, semestre=4),
+            self._fila(5, time(10, 0), time(11, 0), docente=5, aula=5, semestre=5),
+        ]
+        no_disp = [(5, 1, "Mañana", time(10, 30), time(11, 30)), (5, 1, "Tarde", time(10, 0), time(11, 0))]
+        tipos = sorted((c.tipo, c.horario.id, c.otro.id if c.tipo == "docente" else None)
+                       for c in auditar_filas(filas, no_disp))
+        self.assertEqual(tipos, [("docente", 1, 2), ("jornada", 4, None), ("no_disponibilidad", 5, None)])
+
+    def test_misma_regla_de_jornada_que_la_validacion(self):
+        # Empieza dentro de la mañana y termina después del cierre (12:50): válida en los tres lugares
+        fila = self._fila(1, time(12, 30), time(13, 15))
+        self.assertEqual(auditar_filas([fila]), [])
+        self.assertIsNone(error_jornada("Mañana", fila.hora_inicio))
+        Horario(jornada="Mañana", hora_inicio=fila.hora_inicio, hora_fin=fila.hora_fin).clean()
+        self.assertEqual([c.tipo for c in auditar_filas([self._fila(2, time(13, 0), time(13, 45))])], ["jornada"])
+
+    def test_horario_generado_sin_conflictos(self):
+        # Sin saturar: el relleno por fragmentos (que sí puede duplicar tramos) no entra
+        inst, user = crear_institucion_densa(seed=19, n_asignaturas=4)
+        generar_horarios_local(user, inst)
+        with self.assertNumQueries(2):
+            self.assertEqual(auditar_institucion(inst), [])
+
+        h = Horario.objects.filter(institucion=inst).exclude(asignatura__nombre="DESCANSO").first()
+        # bulk_create no pasa por Horario.save(): así entra un duplicado
+        Horario.objects.bulk_create([Horario(
+            institucion=inst, usuario=user, asignatura=h.asignatura, docente=h.docente,
+            aula=h.aula, dia=h.dia, jornada=h.jornada, hora_inicio=h.hora_inicio, hora_fin=h.hora_fin,
+        )])
+        tipos = {c.tipo for c in auditar_institucion(inst)}
+        self.assertEqual(tipos, {"docente", "aula", "semestre"})
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, True)
+        ruta = os.path.join(directorio, "auditoria.csv")
+        with self.assertRaises(CommandError):
+            call_command("auditar_horarios", "--institucion", inst.slug, "--salida", ruta, "--fallar",
+                         stdout=StringIO())
+        with open(ruta, encoding="utf-8") as f:
+            lineas = f.read().splitlines()
+        self.assertEqual(lineas[0], "tipo,dia,recurso,horario_id,otro_id,detalle")
+        self.assertEqual(len(lineas), 4)
+
+        self.client.force_login(user)
+        r = self.client.post(reverse("admin:mi_app_horario_changelist"), {
+            "action": "auditar_conflictos", "_selected_action": [h.pk],
+        })
+        self.assertEqual(r["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("Choque de aula", r.content.decode())
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class ExportacionPdfTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=29, n_asignaturas=4)
+        generar_horarios_local(self.user, self.inst)
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, True)
+        ajustes = override_settings(HORARIOS_EXPORT_DIR=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.renders = []
+
+        def escribir(html, destino):
+            self.renders.append(html)
+            with open(destino, "wb") as f:
+                f.write(b"%PDF-" + str(len(self.renders)).encode())
+
+        for objetivo, valor in (("mi_app.exportacion._escribir_pdf", escribir),
+                                ("mi_app.views.hay_workers", lambda: False)):
+            p = mock.patch(objetivo, valor)
+            p.start()
+            self.addCleanup(p.stop)
+        self.client.force_login(self.user)
+
+    def _descargar(self, **params):
+        r = self.client.get(reverse("exportar_horarios_pdf"), params)
+        return r.status_code, b"".join(r.streaming_content) if r.status_code == 200 else b""
+
+    def test_reutiliza_hasta_que_cambia_el_horario(self):
+        self.assertEqual(self._descargar(), (200, b"%PDF-1"))
+        self.assertEqual(self._descargar(), (200, b"%PDF-1"))
+        self.assertEqual(len(self.renders), 1)
+
+        h = Horario.objects.filter(usuario=self.user).exclude(asignatura__nombre="DESCANSO").first()
+        docente = h.docente
+        docente.nombre = "Renombrado"
+        docente.save()
+        self.assertEqual(self._descargar(), (200, b"%PDF-2"))
+        self.assertIn("Renombrado", self.renders[-1])
+        # El PDF anterior de los mismos filtros se borra
+        self.assertEqual(len(list(exportacion._directorio(self.user.id).glob("todo_*.pdf"))), 1)
+
+        carrera = CarreraUniversitaria.objects.filter(institucion=self.inst).first()
+        self.assertEqual(self._descargar(carrera=carrera.id), (200, b"%PDF-3"))
+        self.assertEqual(self._descargar(), (200, b"%PDF-2"))
+
+    def test_con_workers_se_encola_una_vez(self):
+        with mock.patch("mi_app.views.hay_workers", return_value=True), \
+                mock.patch("mi_app.views.exportar_pdf_task.delay") as delay:
+            self.assertEqual(self._descargar()[0], 202)
+            self.assertEqual(self._descargar()[0], 202)
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(self.renders, [])
+
+        # Lo que haría el worker; luego la misma URL sirve el archivo
+        exportacion.renderizar_pdf(*delay.call_args.args)
+        self.assertEqual(self._descargar(), (200, b"%PDF-1"))
+
+    def test_marca_vieja_no_bloquea_y_pdf_borrado_no_falla(self):
+        ruta = exportacion.ruta_pdf(self.user.id, {}, exportacion.clave_pdf(self.user.id, {}))
+        marca = exportacion.marcar_pendiente(ruta)
+        self.assertEqual(self._descargar()[0], 202)
+        # Marca de un worker que se cayó: se vuelve a renderizar
+        viejo = time_mod.time() - 600
+        os.utime(marca, (viejo, viejo))
+        self.assertEqual(self._descargar(), (200, b"%PDF-1"))
+
+        # El PDF desaparece entre el render y la apertura (lo reemplazó otro)
+        ruta.unlink()
+        with mock.patch("mi_app.views.renderizar_pdf", return_value=ruta.with_name("borrado.pdf")):
+            self.assertEqual(self._descargar()[0], 202)
+
+
+def _pdf_falso(html):
+    return b"%PDF-" + str(len(html)).encode()
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+@mock.patch("mi_app.paquete_pdf._pdf_de_html", _pdf_falso)
+class PaquetePdfTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=31, n_asignaturas=8)
+        generar_horarios_local(self.user, self.inst)
+        clases = Horario.objects.filter(institucion=self.inst).exclude(asignatura__nombre="DESCANSO")
+        self.docentes = set(clases.values_list("docente_id", flat=True))
+        self.semestres = set(clases.values_list("asignatura__semestre_id", flat=True))
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_un_documento_por_docente_y_semestre(self):
+        with self.assertNumQueries(1):
+            documentos = documentos_paquete(self.inst)
+        nombres = [n for n, _ in documentos]
+        self.assertEqual(len([n for n in nombres if n.startswith("docentes/")]), len(self.docentes))
+        self.assertEqual(len([n for n in nombres if n.startswith("semestres/")]), len(self.semestres))
+        self.assertEqual(len(set(nombres)), len(nombres))
+        self.assertNotIn("DESCANSO", "".join(html for _, html in documentos))
+
+    @skipUnless(multiprocessing.get_start_method() == "fork", "el pool hereda el mock solo con fork")
+    def test_pool_igual_que_serial(self):
+        documentos = documentos_paquete(self.inst)
+        zips = []
+        for procesos in (1, 3):
+            ruta = os.path.join(self.dir, f"p{procesos}.zip")
+            self.assertEqual(escribir_paquete(documentos, ruta, procesos), len(documentos))
+            with zipfile.ZipFile(ruta) as zf:
+                zips.append([(i.filename, zf.read(i)) for i in zf.infolist()])
+        self.assertEqual(zips[0], zips[1])
+        self.assertEqual([n for n, _ in zips[0]], [n for n, _ in documentos])
+
+    def test_admin_y_comando(self):
+        self.client.force_login(self.user)
+        r = self.client.get(reverse("admin:paquete_pdf"), {"tipo": "docentes"})
+        self.assertEqual(r["Content-Type"], "application/zip")
+        with zipfile.ZipFile(BytesIO(b"".join(r.streaming_content))) as zf:
+            self.assertEqual(len(zf.namelist()), len(self.docentes))
+
+        admin_general = User.objects.create_superuser("raiz", password="x")
+        self.client.force_login(admin_general)
+        for valor in ("abc", "999999"):
+            r = self.client.get(reverse("admin:paquete_pdf"), {"institucion": valor})
+            self.assertEqual(r.status_code, 302)
+
+        ruta = os.path.join(self.dir, "paquete.zip")
+        call_command("exportar_paquete_pdf", "--institucion", self.inst.slug, "--salida", ruta, stdout=StringIO())
+        with zipfile.ZipFile(ruta) as zf:
+            self.assertEqual(len(zf.namelist()), len(self.docentes) + len(self.semestres))
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class PlanillasTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=37, n_asignaturas=6)
+        generar_horarios_local(self.user, self.inst)
+        self.client.force_login(self.user)
+
+    def test_csv_con_filtros(self):
+        r = self.client.get(reverse("exportar_horarios_planilla", args=["csv"]))
+        self.assertTrue(r.streaming)
+        lineas = b"".join(r.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lineas[0], "Día,Jornada,Hora inicio,Hora fin,Carrera,Semestre,Asignatura,Docente,Aula")
+        self.assertEqual(len(lineas) - 1, Horario.objects.filter(usuario=self.user).count())
+
+        r = self.client.get(reverse("exportar_horarios_planilla", args=["csv"]), {"jornada": "Tarde"})
+        filas = list(csv.reader(b"".join(r.streaming_content).decode("utf-8-sig").splitlines()))[1:]
+        self.assertEqual(len(filas), Horario.objects.filter(usuario=self.user, jornada="Tarde").count())
+        self.assertTrue(all(f[1] == "Tarde" for f in filas))
+
+        self.assertEqual(self.client.get(reverse("exportar_horarios_planilla", args=["ods"])).status_code, 404)
+
+    def test_ids_no_numericos_se_ignoran(self):
+        total = Horario.objects.filter(usuario=self.user).count()
+        for params in ({"carrera": "abc"}, {"dia": "x"}):
+            r = self.client.get(reverse("exportar_horarios_planilla", args=["csv"]), params)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(len(b"".join(r.streaming_content).decode("utf-8-sig").splitlines()) - 1, total)
+        r = self.client.get(reverse("admin:exportar_horarios_admin", args=["csv"]), {"dia__id__exact": "x"})
+        self.assertEqual(r.status_code, 200)
+
+    def test_xlsx_del_admin(self):
+        dia = Horario.objects.filter(usuario=self.user).values_list("dia_id", flat=True).first()
+        r = self.client.get(reverse("admin:exportar_horarios_admin", args=["xlsx"]), {"dia__id__exact": dia})
+        with zipfile.ZipFile(BytesIO(b"".join(r.streaming_content))) as zf:
+            self.assertIsNone(zf.testzip())
+            hoja = zf.read("xl/worksheets/sheet1.xml").decode()
+        esperadas = Horario.objects.filter(institucion=self.inst, dia_id=dia).count()
+        self.assertEqual(hoja.count("<row>"), esperadas + 1)
+        self.assertIn('<c t="n"><v>', hoja)  # número de semestre como número
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class CalendarioTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=41, n_asignaturas=6)
+        Institucion.objects.filter(pk=self.inst.pk).update(inicio_clases=date(2026, 3, 4))  # miércoles
+        generar_horarios_local(self.user, self.inst)
+        clases = Horario.objects.filter(institucion=self.inst).exclude(asignatura__nombre="DESCANSO")
+        self.docente = Docente.objects.get(pk=clases.values_list("docente_id", flat=True).first())
+
+    def _version(self):
+        return Institucion.objects.values_list("version_horario", flat=True).get(pk=self.inst.pk)
+
+    def test_version_sube_con_cada_cambio(self):
+        v = self._version()
+        self.assertGreater(v, 0)
+        generar_horarios_local(self.user, self.inst)
+        self.assertGreater(self._version(), v)
+
+        v = self._version()
+        self.docente.nombre = "Otro nombre"
+        self.docente.save()
+        self.assertEqual(self._version(), v + 1)
+
+        h = Horario.objects.filter(institucion=self.inst).first()
+        self.client.force_login(self.user)
+        self.client.post(reverse("admin:mi_app_horario_delete", args=[h.pk]), {"post": "yes"})
+        self.assertFalse(Horario.objects.filter(pk=h.pk).exists())
+        self.assertEqual(self._version(), v + 2)
+
+    def test_feed_y_get_condicional(self):
+        url = url_calendario("docente", self.docente)
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "text/calendar; charset=utf-8")
+        ics = r.content.decode()
+        esperados = Horario.objects.filter(
+            institucion=self.inst, docente=self.docente, hora_fin__gt=F("hora_inicio"),
+        ).exclude(asignatura__nombre="DESCANSO").count()
+        self.assertEqual(ics.count("BEGIN:VEVENT"), esperados)
+        self.assertIn("RRULE:FREQ=WEEKLY;COUNT=", ics)
+        self.assertTrue(all(len(l.encode()) <= 75 for l in ics.split("\r\n")))
+
+        # Sin cambios: 304 con una sola consulta (la versión), sin leer Horario
+        with self.assertNumQueries(1):
+            r2 = self.client.get(url, HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r2.status_code, 304)
+        r3 = self.client.get(url, HTTP_IF_MODIFIED_SINCE=r["Last-Modified"])
+        self.assertEqual(r3.status_code, 304)
+
+        Aula.objects.filter(institucion=self.inst).first().save()
+        r4 = self.client.get(url, HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r4.status_code, 200)
+        self.assertNotEqual(r4["ETag"], r["ETag"])
+
+    def test_fechas_fijas_desde_el_inicio_de_clases(self):
+        url = url_calendario("docente", self.docente)
+
+        def inicios():
+            return sorted(re.findall(r"DTSTART:(\d{8})", self.client.get(url).content.decode()))
+
+        primeros = inicios()
+        self.assertTrue(primeros)
+        self.assertGreaterEqual(primeros[0], "20260304")
+        self.assertLess(primeros[-1], "20260311")  # la primera semana desde el inicio
+        # Un cambio del horario (aquí, un nombre) no corre las fechas
+        self.docente.nombre = "Renombrado"
+        self.docente.save()
+        self.assertEqual(inicios(), primeros)
+
+        Institucion.objects.filter(pk=self.inst.pk).update(inicio_clases=None)
+        tocar_version(self.inst.id)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with override_settings(HORARIOS_INICIO_CLASES="2026-08-03"):
+            self.assertGreaterEqual(inicios()[0], "20260803")
+
+    def test_token_invalido(self):
+        token = token_calendario("docente", self.docente)
+        otro = Docente.objects.exclude(pk=self.docente.pk).filter(institucion=self.inst).first()
+        falso = token.replace(f".{self.docente.pk}:", f".{otro.pk}:")
+        self.assertEqual(self.client.get(reverse("calendario_ics", args=[falso])).status_code, 404)
+        # Token válido pero de otra institución
+        ajeno = Institucion.objects.create(nombre="Ajena", slug="ajena")
+        self.docente.institucion_id = ajeno.pk
+        url = url_calendario("docente", self.docente)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class VistasCondicionalesTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=41, n_asignaturas=6)
+        generar_horarios_local(self.user, self.inst)
+        self.docente = Docente.objects.get(
+            pk=Horario.objects.filter(usuario=self.user).exclude(asignatura__nombre="DESCANSO")
+            .values_list("docente_id", flat=True).first()
+        )
+
+    def _get(self, vista, *args, **headers):
+        request = RequestFactory().get("/", **headers)
+        request.user = self.user
+        # Solo interesa el GET condicional, no las plantillas
+        with mock.patch("mi_app.views.render", return_value=HttpResponse("ok")):
+            return vista(request, *args)
+
+    def _version(self, usuario):
+        return PerfilUsuario.objects.values_list("version_horario", flat=True).get(user=usuario)
+
+    def test_304_sin_leer_horario(self):
+        r = self._get(views.horario_docente, self.docente.id)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("private", r["Cache-Control"])
+        for vista, args in [(views.horario_docente, [self.docente.id]), (views.inicio, []),
+                            (views.ver_horarios, []), (views.horarios_admin, [])]:
+            with self.assertNumQueries(1):
+                self.assertEqual(self._get(vista, *args, HTTP_IF_NONE_MATCH=r["ETag"]).status_code, 304)
+
+        # Un descanso nuevo cambia la página: se vuelve a renderizar
+        Descanso.objects.create(institucion=self.inst, usuario=self.user, dia=DiaSemana.objects.filter(
+            institucion=self.inst).first(), hora_inicio=time(12, 0), hora_fin=time(12, 30))
+        r2 = self._get(views.horario_docente, self.docente.id, HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(r2.status_code, 200)
+        self.assertNotEqual(r2["ETag"], r["ETag"])
+
+        # Otro usuario nunca recibe el 304 de una copia ajena
+        otro = User.objects.create_user("otro_vistas", password="x")
+        PerfilUsuario.objects.create(user=otro, institucion=self.inst)
+        request = RequestFactory().get("/")
+        request.user = otro
+        self.assertNotEqual(f'"{views._etag_vista(request)}"', r2["ETag"])
+
+    def test_version_por_usuario(self):
+        otro = User.objects.create_user("otro_version", password="x")
+        PerfilUsuario.objects.create(user=otro, institucion=self.inst)
+        propia, ajena = self._version(self.user), self._version(otro)
+
+        # Generar el horario propio no invalida las páginas de otros usuarios
+        generar_horarios_local(self.user, self.inst)
+        self.assertGreater(self._version(self.user), propia)
+        self.assertEqual(self._version(otro), ajena)
+
+        # Un nombre compartido (docente) sí cambia las de todos
+        self.docente.save()
+        self.assertEqual(self._version(otro), ajena + 1)
+
+
+class CacheHorariosTests(TestCase):
+    def setUp(self):
+        caches[cache_horarios.ALIAS].clear()
+        self.inst, self.user = crear_institucion_densa(seed=41, n_asignaturas=6)
+        generar_horarios_local(self.user, self.inst)
+
+    def _ids(self, por_dia):
+        return [(dia, [h.horario_id for h in filas]) for dia, filas in por_dia.items()]
+
+    def test_acierta_hasta_que_cambia_el_horario(self):
+        esperado = self._ids(plano.agrupar_por_dia(plano.ordenados(usuario=self.user)))
+        primero = cache_horarios.horarios_por_dia(self.user.id, "ver_horarios")
+        with self.assertNumQueries(1):  # solo la versión
+            segundo = cache_horarios.horarios_por_dia(self.user.id, "ver_horarios")
+        self.assertEqual(self._ids(primero), esperado)
+        self.assertEqual(self._ids(segundo), esperado)
+        # Las filas planas traen los nombres: la plantilla no consulta nada
+        with self.assertNumQueries(0):
+            [(h.asignatura_nombre, h.semestre_numero, h.carrera_nombre, h.docente_nombre, h.aula_nombre)
+             for filas in segundo.values() for h in filas]
+
+        # Otros filtros son otra entrada
+        docente_id = Horario.objects.filter(usuario=self.user).values_list("docente_id", flat=True).first()
+        filtrado = cache_horarios.horarios_por_dia(self.user.id, "ver_horarios", {"docente_id": docente_id})
+        self.assertTrue(all(h.docente_id == docente_id for filas in filtrado.values() for h in filas))
+
+        # Un cambio del horario cambia la versión y con ella la clave
+        h_id = Horario.objects.filter(usuario=self.user).exclude(asignatura__nombre="DESCANSO").first().pk
+        Horario.objects.filter(pk=h_id).delete()
+        plano.sincronizar(self.inst.id, self.user.id)
+        tocar_version(self.inst.id, self.user.id)
+        tercero = cache_horarios.horarios_por_dia(self.user.id, "ver_horarios")
+        self.assertIn(h_id, [x for _, ids in self._ids(segundo) for x in ids])
+        self.assertNotIn(h_id, [x for _, ids in self._ids(tercero) for x in ids])
+
+        self.assertEqual(cache_horarios.estadisticas(), {"aciertos": 1, "fallos": 3, "tasa": 0.25})
+        out = StringIO()
+        call_command("estadisticas_cache", "--json", "--reiniciar", stdout=out)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[0])["aciertos"], 1)
+        self.assertEqual(cache_horarios.estadisticas()["fallos"], 0)
+
+    def test_vista_lee_de_la_cache(self):
+        request = RequestFactory().get("/", {"carrera": ""})
+        request.user = self.user
+        with mock.patch("mi_app.views.render", return_value=HttpResponse("ok")) as render:
+            views.ver_horarios(request)
+            request = RequestFactory().get("/")
+            request.user = self.user
+            with self.assertNumQueries(1):  # la versión; carreras es perezosa
+                views.ver_horarios(request)
+        primero, segundo = (c.args[2]["horarios_por_dia"] for c in render.call_args_list)
+        self.assertEqual(self._ids(primero), self._ids(segundo))
+        self.assertTrue(primero)
+
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class HorarioPlanoTests(TestCase):
+    CAMPOS = tuple(plano.ORIGEN) + ("inicio_min", "fin_min", "es_descanso")
+
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=43, n_asignaturas=6)
+        generar_horarios_local(self.user, self.inst)
+
+    def assertCopiaAlDia(self):
+        esperado = sorted(
+            tuple(getattr(f, c) for c in self.CAMPOS)
+            for f in plano.filas_planas(Horario.objects.filter(institucion=self.inst))
+        )
+        copia = sorted(HorarioPlano.objects.filter(institucion=self.inst).values_list(*self.CAMPOS))
+        self.assertTrue(copia)
+        self.assertEqual(copia, esperado)
+
+    def test_se_mantiene_con_las_ediciones(self):
+        self.assertCopiaAlDia()
+
+        h = Horario.objects.filter(usuario=self.user).exclude(asignatura__nombre="DESCANSO").first()
+        h.docente.nombre = "Renombrado"
+        h.docente.save()
+        h.hora_inicio = time(h.hora_inicio.hour, (h.hora_inicio.minute + 5) % 60)
+        h.save()
+        h.asignatura.semestre.numero += 10
+        h.asignatura.semestre.save()
+        self.assertCopiaAlDia()
+
+        self.client.force_login(self.user)
+        self.client.post(reverse("admin:mi_app_horario_delete", args=[h.pk]), {"post": "yes"})
+        self.assertFalse(HorarioPlano.objects.filter(horario_id=h.pk).exists())
+        Asignatura.objects.filter(institucion=self.inst).first().delete()
+        self.assertCopiaAlDia()
+
+        # Lo que quede desfasado (p. ej. un update() masivo) lo arregla el comando
+        Horario.objects.filter(institucion=self.inst).update(jornada="NOCTURNA")
+        out = StringIO()
+        call_command("reconstruir_plano", "--institucion", self.inst.slug, stdout=out)
+        self.assertIn(f"{Horario.objects.filter(institucion=self.inst).count()} filas", out.getvalue())
+        self.assertCopiaAlDia()
+
+    def test_lista_del_admin_filtra_por_la_copia(self):
+        fila = HorarioPlano.objects.filter(usuario=self.user, es_descanso=False).first()
+        self.client.force_login(self.user)
+        url = reverse("admin:mi_app_horario_changelist")
+        r = self.client.get(url, {"plano__semestre__id__exact": fila.semestre_id, "q": fila.docente_nombre})
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, fila.asignatura_nombre)
+        self.assertEqual(
+            {h.plano.semestre_id for h in r.context["cl"].result_list}, {fila.semestre_id}
+        )
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class InstantaneasTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=44, n_asignaturas=12)
+        generar_horarios_local(self.user, self.inst)
+
+    def _segmentos(self):
+        return sorted(
+            Segmento(*f) for f in Horario.objects.filter(usuario=self.user).values_list(*Segmento._fields)
+        )
+
+    def test_ida_y_vuelta(self):
+        antes = self._segmentos()
+        for codec in ("brotli", "zlib"):
+            self.assertEqual(sorted(instantaneas.decodificar(instantaneas.codificar(antes, codec))), antes)
+        with self.assertRaises(ValueError):
+            instantaneas.decodificar(b"no es una instantanea")
+
+        guardado = instantaneas.guardar_instantanea(self.user, self.inst, nombre="Antes")
+        self.assertEqual(guardado.filas, len(antes))
+        # Columnas de ids y minutos comprimidas: una fracción de las mismas filas en JSON
+        self.assertLess(guardado.tamano * 4, len(json.dumps(antes, default=str)))
+
+        quitar = Horario.objects.filter(usuario=self.user).exclude(asignatura__nombre="DESCANSO")
+        Horario.objects.filter(pk__in=list(quitar.values_list("pk", flat=True)[:5])).delete()
+        Horario.objects.filter(usuario=self.user).update(jornada="Noche")
+        v = PerfilUsuario.objects.get(user=self.user).version_horario
+        self.assertEqual(instantaneas.restaurar_instantanea(guardado), (len(antes), 0))
+        self.assertEqual(self._segmentos(), antes)
+        self.assertEqual(HorarioPlano.objects.filter(usuario=self.user).count(), len(antes))
+        self.assertGreater(PerfilUsuario.objects.get(user=self.user).version_horario, v)
+
+        # Lo que ya no existe se omite
+        asignatura = Asignatura.objects.filter(institucion=self.inst, horario__usuario=self.user).first()
+        de_asignatura = sum(1 for s in antes if s.asignatura_id == asignatura.id)
+        asignatura.delete()
+        self.assertEqual(
+            instantaneas.restaurar_instantanea(guardado), (len(antes) - de_asignatura, de_asignatura)
+        )
+
+    @override_settings(HORARIOS_INSTANTANEAS_RECIENTES=2, HORARIOS_INSTANTANEAS_DIAS=10)
+    def test_retencion(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        ahora = timezone.now()
+        hace = {}
+        for dias in (0, 0, 1, 3, 3, 3, 20, 30):
+            g = HorarioGuardado.objects.create(institucion=self.inst, usuario=self.user, datos={})
+            HorarioGuardado.objects.filter(pk=g.pk).update(fecha_creacion=ahora - timedelta(days=dias, minutes=len(hace)))
+            hace[g.pk] = dias
+        conservada = max(hace)
+        HorarioGuardado.objects.filter(pk=conservada).update(conservar=True)
+
+        borradas = instantaneas.aplicar_retencion(self.inst.id, self.user.id, ahora=ahora)
+        quedan = sorted(hace[pk] for pk in HorarioGuardado.objects.values_list("pk", flat=True))
+        # Las 2 más nuevas, una del día 1 y una del día 3 (dentro de 10 días) y la marcada
+        self.assertEqual(quedan, [0, 0, 1, 3, 30])
+        self.assertEqual(borradas, 3)
+
+    def test_admin_guarda_y_restaura(self):
+        antes = self._segmentos()
+        self.client.force_login(self.user)
+        self.client.post(reverse("admin:guardar_instantanea"), {"nombre": "Primera versión"})
+        guardado = HorarioGuardado.objects.get(usuario=self.user)
+        self.assertEqual(guardado.nombre, "Primera versión")
+
+        Horario.objects.filter(usuario=self.user).delete()
+        accion = {"action": "restaurar", "_selected_action": [guardado.pk]}
+        url = reverse("admin:mi_app_horarioguardado_changelist")
+        # Con una generación en curso no se restaura: la pisaría al escribir
+        job = GeneracionJob.objects.create(usuario=self.user, institucion=self.inst, estado=GeneracionJob.EN_CURSO)
+        self.assertContains(self.client.post(url, accion, follow=True), "generación en curso")
+        self.assertEqual(self._segmentos(), [])
+
+        GeneracionJob.objects.filter(pk=job.pk).update(estado=GeneracionJob.COMPLETADO)
+        r = self.client.post(url, accion, follow=True)
+        self.assertContains(r, f"{len(antes)} filas")
+        self.assertEqual(self._segmentos(), antes)
+
+
+class DiferenciasTests(TestCase):
+    def _seg(self, asignatura, docente, dia, inicio, aula=1, fin=None):
+        return Segmento(asignatura, docente, aula, dia, "Mañana", time(inicio, 0), time(fin or inicio + 1, 0))
+
+    def test_clasifica_en_tiempo_lineal(self):
+        antes = [self._seg(a, a % 50, 1 + a % 5, 8 + a % 4) for a in range(10000)]
+        despues = list(antes)
+        despues[0] = despues[0]._replace(dia_id=9)                # movida
+        despues[1] = despues[1]._replace(aula_id=2)               # modificada
+        despues[2] = self._seg(20000, 3, 1, 9)                    # quitada + agregada
+        del despues[3]                                            # quitada
+        despues.append(self._seg(4, 4, 1, 8))                     # repetida: agregada
+
+        t0 = time_mod.perf_counter()
+        cambios = diferencias.comparar(antes, despues)
+        self.assertLess(time_mod.perf_counter() - t0, 1.0)
+        tipos = sorted(c.tipo for c in cambios)
+        self.assertEqual(tipos, ["agregada", "agregada", "modificada", "movida", "quitada", "quitada"])
+        movida = next(c for c in cambios if c.tipo == "movida")
+        self.assertEqual((movida.antes.dia_id, movida.despues.dia_id), (antes[0].dia_id, 9))
+        self.assertEqual(diferencias.comparar(antes, list(reversed(antes))), [])
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class DiferenciasAdminTests(TestCase):
+    def test_instantanea_contra_el_horario_actual(self):
+        inst, user = crear_institucion_densa(seed=45, n_asignaturas=8)
+        generar_horarios_local(user, inst)
+        guardado = instantaneas.guardar_instantanea(user, inst)
+        url = reverse("admin:horarioguardado_diferencias", args=[guardado.pk])
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url, {"formato": "json"}).json()["totales"]["movida"], 0)
+
+        h = Horario.objects.filter(usuario=user).exclude(asignatura__nombre="DESCANSO").select_related("docente").first()
+        otro_dia = DiaSemana.objects.filter(institucion=inst).exclude(pk=h.dia_id).first()
+        Horario.objects.filter(pk=h.pk).update(dia=otro_dia)
+        datos = self.client.get(url, {"formato": "json"}).json()
+        self.assertEqual(datos["totales"], {"movida": 1, "modificada": 0, "agregada": 0, "quitada": 0})
+        self.assertEqual(datos["docentes"][0]["nombre"], h.docente.nombre)
+        self.assertEqual(datos["docentes"][0]["cambios"][0]["despues"]["dia"], otro_dia.nombre)
+
+        segundo = instantaneas.guardar_instantanea(user, inst)
+        r = self.client.post(reverse("admin:mi_app_horarioguardado_changelist"), {
+            "action": "comparar", "_selected_action": [guardado.pk, segundo.pk],
+        })
+        self.assertRedirects(r, f"{url}?contra={segundo.pk}", fetch_redirect_response=False)
+        r = self.client.get(r["Location"])
+        self.assertContains(r, h.docente.nombre)
+        self.assertEqual(self.client.get(url, {"contra": "abc"}).status_code, 404)
+
+class ControladorLotesTests(TestCase):
+    def _tamanos(self, controlador, n=200):
+        return [len(lote) for lote in controlador.lotes(range(n))]
+
+    def test_crece_sin_presion_de_memoria(self):
+        c = ControladorLotes(presupuesto_mb=100, inicial=8, maximo=64, medir=lambda: 10 * 1024 * 1024)
+        self.assertEqual(self._tamanos(c)[:5], [8, 16, 32, 64, 64])
+        self.assertEqual(c.pausas, 0)
+
+    @mock.patch("mi_app.lotes.time.sleep")
+    def test_se_achica_y_pausa_solo_sobre_el_presupuesto(self, sleep):
+        usos = iter([90, 90, 85, 85, 150, 150] + [10] * 100)  # en alerta se mide de nuevo tras gc
+        c = ControladorLotes(presupuesto_mb=100, inicial=8, medir=lambda: next(usos) * 1024 * 1024)
+        with self.assertLogs("mi_app.lotes", "INFO"):
+            tamanos = self._tamanos(c, 40)
+        # 90 → mitad; 85 → mitad; 150 tras gc → pausa y mínimo; luego vuelve a crecer
+        self.assertEqual(tamanos[:5], [8, 4, 2, 1, 2])
+        self.assertEqual(c.pausas, 1)
+        sleep.assert_called_once()
+
+
+class InstitucionSinteticaTests(TestCase):
+    def _firma(self, inst):
+        return (
+            list(Asignatura.objects.filter(institucion=inst).order_by("nombre").values_list(
+                "nombre", "jornada", "horas_totales", "semestre__numero", "semestre__carrera__nombre",
+                "aula__nombre")),
+            list(NoDisponibilidad.objects.filter(institucion=inst).order_by("id").values_list(
+                "docente__nombre", "dia__nombre", "hora_inicio")),
+        )
+
+    def test_misma_semilla_mismos_datos(self):
+        inst, _user = crear_institucion_sintetica(seed=3, n_asignaturas=30)
+        firma = self._firma(inst)
+        inst.delete()
+        User.objects.filter(username="bench-3-30").delete()
+        inst, _user = crear_institucion_sintetica(seed=3, n_asignaturas=30)
+        self.assertEqual(self._firma(inst), firma)
+        self.assertEqual(len(firma[0]), 30)
+
+    @override_settings(HORARIOS_PROCESOS=1)
+    def test_medicion(self):
+        inst, user = crear_institucion_sintetica(seed=4, n_asignaturas=20)
+        m = medir_generacion(user, inst, motor="bitmask")
+        self.assertEqual(m.asignaturas, 20)
+        self.assertGreater(m.minutos_ubicados, 0)
+        self.assertLessEqual(m.minutos_ubicados, m.minutos_pedidos)
+        self.assertGreater(m.consultas, 0)
+        self.assertGreater(m.memoria_pico_mb, 0)
+
+        # El tiempo se mide sin tracemalloc; sin `memoria` no hay segunda pasada
+        with mock.patch("mi_app.sintetico.generar_horarios_local", wraps=generar_horarios_local) as generar, \
+                mock.patch("mi_app.sintetico.tracemalloc.start") as trazar:
+            sin = medir_generacion(user, inst, motor="bitmask", memoria=False)
+        self.assertEqual(generar.call_count, 1)
+        trazar.assert_not_called()
+        self.assertIsNone(sin.memoria_pico_mb)
+        self.assertEqual(sin.minutos_ubicados, m.minutos_ubicados)
+
+    @override_settings(HORARIOS_PROCESOS=1)
+    def test_comando_revierte_los_datos(self):
+        salida = StringIO()
+        call_command("benchmark_horarios", tamanos="10", motores="bitmask,clasico", json=True, stdout=salida)
+        filas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual([f["motor"] for f in filas], ["bitmask", "clasico"])
+        self.assertFalse(Institucion.objects.filter(slug__startswith="sintetica-").exists())
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class GeneracionJobTests(TestCase):
+    def setUp(self):
+        self.inst, self.user = crear_institucion_densa(seed=11, n_asignaturas=60)
+
+    def test_job_completo_guarda_resultados(self):
+        job = GeneracionJob.objects.create(usuario=self.user, institucion=self.inst)
+        ejecutar_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.estado, GeneracionJob.COMPLETADO)
+        self.assertEqual((job.progreso, job.total), (100, 60))
+        self.assertEqual(len(job.resultados), 60)
+        self.assertTrue(job.fallidas)  # institución densa: siempre sobra algo
+        self.assertIsNotNone(job.duracion)
+
+    def test_cancelacion_antes_de_escribir(self):
+        job = GeneracionJob.objects.create(
+            usuario=self.user, institucion=self.inst, cancelacion_solicitada=True
+        )
+        ejecutar_job(job)
+        self.assertEqual(job.estado, GeneracionJob.CANCELADO)
+        self.assertFalse(Horario.objects.filter(usuario=self.user).exists())
+
+    def test_cancelar_o_fallar_conserva_el_horario_anterior(self):
+        generar_horarios_local(self.user, self.inst, motor="bitmask")
+        antes = set(Horario.objects.filter(usuario=self.user).values_list("id", flat=True))
+        self.assertTrue(antes)
+
+        for motor in ("bitmask", "clasico"):
+            job = GeneracionJob.objects.create(
+                usuario=self.user, institucion=self.inst, motor=motor, cancelacion_solicitada=True
+            )
+            ejecutar_job(job)
+            self.assertEqual(job.estado, GeneracionJob.CANCELADO)
+            self.assertEqual(
+                Horario.objects.filter(usuario=self.user).count(), len(antes), motor
+            )
+
+        job = GeneracionJob.objects.create(usuario=self.user, institucion=self.inst, motor="bitmask")
+        filas = set(Horario.objects.filter(usuario=self.user).values_list("asignatura_id", "dia_id", "hora_inicio"))
+        with mock.patch("mi_app.generar_horarios.resolver_por_componentes", side_effect=RuntimeError("sin memoria")):
+            ejecutar_job(job)
+        self.assertEqual(job.estado, GeneracionJob.FALLIDO)
+        self.assertEqual(
+            set(Horario.objects.filter(usuario=self.user).values_list("asignatura_id", "dia_id", "hora_inicio")), filas
+        )
+
+    def test_regenerar_reemplaza_el_horario(self):
+        generar_horarios_local(self.user, self.inst, motor="bitmask")
+        primero = Horario.objects.filter(usuario=self.user).count()
+        ejecutar_job(GeneracionJob.objects.create(usuario=self.user, institucion=self.inst, motor="bitmask"))
+        # El horario anterior no ocupa lugar: el nuevo es igual de completo
+        self.assertEqual(Horario.objects.filter(usuario=self.user).count(), primero)
+        self.assertEqual(HorarioPlano.objects.filter(usuario=self.user).count(), primero)
+
+    def test_tarea_celery_usa_el_job(self):
+        job = GeneracionJob.objects.create(usuario=self.user, institucion=self.inst, motor="bitmask")
+        r = generar_horarios_task(self.user.id, self.inst.id, "bitmask", job.id)
+        self.assertEqual(r["estado"], GeneracionJob.COMPLETADO)
+        self.assertEqual(r["fallidas"], len(GeneracionJob.objects.get(pk=job.pk).fallidas))
+
+    def test_polling_y_cancelacion_desde_el_admin(self):
+        job = GeneracionJob.objects.create(
+            usuario=self.user, institucion=self.inst, estado=GeneracionJob.EN_CURSO, progreso=40,
+        )
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("admin:mi_app_horario_changelist")), 'id="gen-panel"')
+        r = self.client.get(reverse("admin:estado_generacion", args=[job.id]))
+        self.assertEqual(r.json()["progreso"], 40)
+        self.assertTrue(r.json()["activo"])
+
+        self.assertEqual(self.client.get(reverse("admin:cancelar_generacion", args=[job.id])).status_code, 405)
+        r = self.client.post(reverse("admin:cancelar_generacion", args=[job.id]))
+        self.assertTrue(r.json()["cancelacion_solicitada"])
+        self.assertTrue(GeneracionJob.objects.get(pk=job.pk).cancelacion_solicitada)
+
+        otro = User.objects.create_user("intruso", password="x", is_staff=True)
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(reverse("admin:estado_generacion", args=[job.id])).status_code, 404)
+
+
+class RedisFalso:
+    def __init__(self):
+        self.datos = {}
+
+    def exists(self, clave):
+        return clave in self.datos
+
+    def set(self, clave, valor, ex=None):
+        self.datos[clave] = valor
+
+    def delete(self, clave):
+        self.datos.pop(clave, None)
+
+    def scan_iter(self, match, count=None):
+        return (c for c in list(self.datos) if c.startswith(match.rstrip("*")))
+
+
+class DeteccionWorkersTests(TestCase):
+    def setUp(self):
+        workers.olvidar_workers()
+        self.redis = RedisFalso()
+        parche = mock.patch.object(workers, "_cliente", return_value=self.redis)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.addCleanup(workers.olvidar_workers)
+
+    def test_latido_responde_sin_ping(self):
+        workers._al_iniciar_worker(sender=mock.Mock(hostname="celery@a", timer=None))
+        with mock.patch("mi_proyecto.celery.current_app.control.ping") as ping:
+            self.assertTrue(workers.hay_workers())
+        ping.assert_not_called()
+
+    def test_sin_latido_un_solo_ping_y_se_recuerda(self):
+        with mock.patch("mi_proyecto.celery.current_app.control.ping", return_value=[]) as ping:
+            self.assertFalse(workers.hay_workers())
+            self.assertFalse(workers.hay_workers())
+        self.assertEqual(ping.call_count, 1)
+
+    def test_apagado_solo_borra_su_latido(self):
+        workers.registrar_latido("celery@a")
+        workers.registrar_latido("celery@b")
+        workers._al_detener_worker(sender=mock.Mock(hostname="celery@a"))
+        self.assertFalse(self.redis.exists(workers.clave_latido("celery@a")))
+        # El latido de otro worker sigue: todavía hay workers
+        self.assertTrue(workers.hay_workers())
+
+    @override_settings(HORARIOS_PROCESOS=1)
+    def test_vista_sin_workers_genera_en_local(self):
+        inst, user = crear_institucion_densa(seed=12, n_asignaturas=10)
+        self.client.force_login(user)
+        with mock.patch("mi_proyecto.celery.current_app.control.ping", return_value=[]):
+            r = self.client.get(reverse("admin:generar_horarios"))
+        self.assertEqual(r.status_code, 302)
+        job = GeneracionJob.objects.get(usuario=user)
+        self.assertEqual(job.estado, GeneracionJob.COMPLETADO)
+        self.assertTrue(Horario.objects.filter(usuario=user).exists())
+
+
+@override_settings(HORARIOS_PROCESOS=1)
+class HorarioChangeListTests(TestCase):
+    def _consultas_lista(self, seed, n_asignaturas, n_dias_descanso):
+        inst, user = crear_institucion_densa(seed=seed, n_asignaturas=n_asignaturas)
+        for dia in DiaSemana.objects.filter(institucion=inst, orden__gt=3, orden__lte=3 + n_dias_descanso):
+            Descanso.objects.create(institucion=inst, usuario=user, dia=dia, nombre=f"Pausa {dia.orden}",
+                                    hora_inicio=time(10, 0), hora_fin=time(10, 20))
+        generar_horarios_local(user, inst)
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse("admin:mi_app_horario_changelist"))
+        self.assertEqual(r.status_code, 200)
+        return r, len(ctx.captured_queries)
+
+    def test_consultas_fijas(self):
+        r1, pocas = self._consultas_lista(seed=13, n_asignaturas=5, n_dias_descanso=0)
+        r2, muchas = self._consultas_lista(seed=14, n_asignaturas=40, n_dias_descanso=3)
+        self.assertEqual(pocas, muchas)
+        self.assertContains(r2, "Pausa 5")
+
+    def test_orden_por_dia_sql_constante(self):
+        from django.contrib import admin as django_admin
+        from django.test import RequestFactory
+
+        sqls = []
+        for seed in (15, 16):
+            inst, user = crear_institucion_densa(seed=seed, n_asignaturas=3)
+            if seed == 16:
+                DiaSemana.objects.create(institucion=inst, codigo="XX", nombre="Extra", orden=8)
+            request = RequestFactory().get("/")
+            request.user = user
+            qs = django_admin.site._registry[Horario].get_queryset(request)
+            sql, _ = qs.query.sql_with_params()
+            sqls.append(sql)
+        self.assertEqual(sqls[0], sqls[1])
+        self.assertNotIn("CASE", sqls[0])
+
+        generar_horarios_local(user, inst)
+        ordenes = [h.dia.orden for h in qs.select_related("dia")]
+        self.assertTrue(ordenes)
+        self.assertEqual(ordenes, sorted(ordenes))
+
+    def test_llenar_orden_dias_masivo(self):
+        for seed in (17, 18):
+            Institucion.objects.create(nombre=f"Inst {seed}", slug=f"inst-{seed}")
+        inst, user = crear_institucion_densa(seed=19, n_asignaturas=4)
+        generar_horarios_local(user, inst)
+        DiaSemana.objects.update(orden=0)
+        HorarioPlano.objects.update(dia_orden=0)
+        version = version_horario(inst.id)[0]
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("llenar_orden_dias", stdout=StringIO())
+        # Días, copia plana, versiones (2) y el aviso de códigos desconocidos, más SAVEPOINT y RELEASE
+        self.assertLessEqual(len(ctx.captured_queries), 7)
+        self.assertFalse(DiaSemana.objects.filter(orden=0).exists())
+        self.assertEqual(
+            set(DiaSemana.objects.filter(codigo="MI").values_list("orden", flat=True)), {3}
+        )
+        # La copia plana (por la que ordenan vistas y exportaciones) sigue al día
+        self.assertTrue(HorarioPlano.objects.filter(institucion=inst).exists())
+        self.assertFalse(HorarioPlano.objects.exclude(dia_orden=F("dia__orden")).exists())
+        self.assertGreater(version_horario(inst.id)[0], version)
+
+
+class PlanesConsultaTests(TestCase):
+    """
+    EXPLAIN de las consultas de lectura sobre un conjunto grande: ninguna debe
+    recorrer mi_app_horario entero ni ordenar en la base (filesort).
+    En PostgreSQL se ejecuta ANALYZE antes, como haría autovacuum.
+    """
+
+    MALOS = {
+        "sqlite": (r"\bSCAN mi_app_horario\b", r"USE TEMP B-TREE FOR ORDER BY"),
+        "postgresql": (r"Seq Scan on mi_app_horario\b", r"Sort Key:"),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(HORARIOS_PROCESOS=1):
+            for seed in (31, 32, 33):
+                cls.inst, cls.user = crear_institucion_sintetica(seed=seed, n_asignaturas=120)
+                generar_horarios_local(cls.user, cls.inst)
+        cls.horario = Horario.objects.filter(usuario=cls.user).exclude(asignatura__nombre="DESCANSO").first()
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def assertPlanSinRecorridos(self, qs):
+        malos = self.MALOS.get(connection.vendor)
+        if malos is None:
+            self.skipTest(f"Sin patrones de EXPLAIN para {connection.vendor}")
+        plan = qs.explain()
+        for patron in malos:
+            self.assertIsNone(re.search(patron, plan), f"{patron!r} en el plan:\n{plan}")
+
+    def test_vistas_de_usuario(self):
+        h = self.horario
+        consultas = {
+            "inicio / PDF": horarios_ordenados(usuario=self.user),
+            "por carrera": horarios_ordenados(usuario=self.user).filter(
+                asignatura__semestre__carrera__id=h.asignatura.semestre.carrera_id),
+            "docente": horarios_ordenados(usuario=self.user, docente=h.docente),
+        }
+        for nombre, qs in consultas.items():
+            with self.subTest(nombre):
+                self.assertGreater(len(qs), 0)
+                self.assertPlanSinRecorridos(qs)
+
+    def test_choques_de_docente(self):
+        h = self.horario
+        qs = Horario.objects.filter(
+            institucion=h.institucion, docente=h.docente, dia=h.dia,
+            hora_inicio__lt=h.hora_fin, hora_fin__gt=h.hora_inicio,
+        )
+        self.assertPlanSinRecorridos(qs)
+
+    def test_admin_usa_indice_de_institucion(self):
+        from django.contrib import admin as django_admin
+        from django.test import RequestFactory
+
+        request = RequestFactory().get("/")
+        request.user = self.user
+        qs = django_admin.site._registry[Horario].get_queryset(request)
+        plan = qs.explain()
+        # El admin ordena además por carrera y semestre (otras tablas), así que
+        # ese sort es inevitable; lo que no puede haber es un recorrido completo.
+        self.assertIsNone(re.search(self.MALOS.get(connection.vendor, ("$^",))[0], plan), plan)
+
+    def test_ordenar_por_dia(self):
+        ordenados = ordenar_por_dia(horarios_ordenados(usuario=self.user))
+        claves = [(h.dia.orden, h.hora_inicio) for h in ordenados]
+        self.assertEqual(claves, sorted(claves))
+        esperado = list(Horario.objects.filter(usuario=self.user).order_by("dia__orden", "hora_inicio", "dia_id"))
+        self.assertEqual(
+            [(h.dia_id, h.hora_inicio) for h in ordenados],
+            [(h.dia_id, h.hora_inicio) for h in esperado],
+        )
@@ -9,5 +9,7 @@ urlpatterns = [
     path('accounts/logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('accounts/register/', views.register, name='register'),
     path('exportar-horarios/', views.exportar_horarios_pdf, name='exportar_horarios_pdf'),
+    path('calendario/<str:token>.ics', views.calendario_ics, name='calendario_ics'),
+    path('exportar-horarios.<str:formato>', views.exportar_horarios_planilla, name='exportar_horarios_planilla'),
 ]
 
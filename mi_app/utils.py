@@ -1,16 +1,12 @@
 # utils.py
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from django.core.exceptions import ObjectDoesNotExist
-from .models import NoDisponibilidad, Horario, Aula, Descanso, Institucion
+from .models import VENTANAS_JORNADA, NoDisponibilidad, Horario, Aula, Descanso, Institucion
 from django.core.exceptions import ObjectDoesNotExist
 
 # BLOQUES DE JORNADA (sin cambios)
 def obtener_bloques_por_jornada(jornada):
-    return {
-        'Mañana': (time(7, 30), time(12, 50)),
-        'Tarde': (time(13, 30), time(18, 15)),
-        'Noche': (time(18, 15), time(21, 45)),
-    }.get(jornada, (None, None))
+    return VENTANAS_JORNADA.get(jornada, (None, None))
 
 # calcular_mps (sin cambios funcionales)
 def calcular_mps(asignatura):
@@ -101,7 +97,7 @@ def puede_asignar_horario_mem(docente_id, aula, asignatura, dia, jornada,
     - horarios_por_dia: lista de dicts con keys 'aula_id','hora_inicio','hora_fin',...
     - horarios_docente: lista de dicts
     - horarios_semestre: lista de dicts que contienen 'semestre_id'
-    - no_disp_docente: lista de NoDisponibilidad (objetos)
+    - no_disp_docente: NoDisponibilidad del docente en ese día
     - descansos_por_dia: lista de Descanso (objetos)
     """
     if not docente_esta_disponible_mem(docente_id, hora_inicio, hora_fin, horarios_docente, no_disp_docente):
@@ -129,6 +125,8 @@ def asignar_horario_automatico(
     Versión que distribuye la carga en varios días y evita solapes de estudiantes por SEMESTRE.
     Requiere que los `horarios` ligeros incluyan 'semestre_id' en sus dicts (generar_horarios_view
     ya lo debe proveer cuando crea la lista).
+    `no_disponibilidades`: dict (docente_id, dia_id) -> no disponibilidades, como
+    SchedulingContext.no_disp_por_docente_dia (también acepta una lista plana).
     """
     def _ret(ok, motivo=""):
         return (ok, motivo) if con_motivo else ok
@@ -168,16 +166,11 @@ def asignar_horario_automatico(
 
     minutos_semana = max(60, int(round((horas_totales * dur_hora / semanas) / 15.0 + 0.5) * 15))
 
-    rangos_jornada = {
-        'Mañana': (time(7, 30), time(12, 50)),
-        'Tarde': (time(13, 30), time(18, 15)),
-        'Noche': (time(18, 15), time(21, 45)),
-    }
-    if jornada not in rangos_jornada:
+    if jornada not in VENTANAS_JORNADA:
         return _ret(False, f"Jornada inválida: {jornada}")
-    inicio_jornada, fin_jornada = rangos_jornada[jornada]
+    inicio_jornada, fin_jornada = VENTANAS_JORNADA[jornada]
 
-    aulas_qs = Aula.objects.all()
+    aulas_qs = Aula.objects.order_by("id")
     if institucion:
         aulas_qs = aulas_qs.filter(institucion=institucion)
     elif usuario and hasattr(Aula, "usuario_id"):
@@ -222,7 +215,11 @@ def asignar_horario_automatico(
     semestre_id = getattr(semestre, 'id', None)
     horarios_semestre = [h for h in horarios_ligeros if h.get('semestre_id') == semestre_id]
 
-    no_disp_docente = [nd for nd in no_disponibilidades if nd.docente_id == docente_id]
+    if not hasattr(no_disponibilidades, 'get'):
+        agrupadas = {}
+        for nd in no_disponibilidades or ():
+            agrupadas.setdefault((nd.docente_id, nd.dia_id), []).append(nd)
+        no_disponibilidades = agrupadas
     descansos_por_dia = {}
     for d in descansos:
         descansos_por_dia.setdefault(getattr(d, 'dia_id', None), []).append(d)
@@ -242,6 +239,7 @@ def asignar_horario_automatico(
         dia_id = dia.id
         ds_dia = descansos_por_dia.get(dia_id, [])
         horarios_dia = horarios_por_dia.get(dia_id, [])
+        no_disp_docente = no_disponibilidades.get((docente_id, dia_id), ())
 
         current = datetime.combine(datetime.today(), inicio_jornada)
         fin_dt = datetime.combine(datetime.today(), fin_jornada)
@@ -347,6 +345,7 @@ def asignar_horario_automatico(
             dia_id = dia.id
             horarios_dia = horarios_por_dia.get(dia_id, [])
             ds_dia = descansos_por_dia.get(dia_id, [])
+            no_disp_docente = no_disponibilidades.get((docente_id, dia_id), ())
             current = datetime.combine(datetime.today(), inicio_jornada)
             fin_dt = datetime.combine(datetime.today(), fin_jornada)
             while current < fin_dt and restante > 0:
@@ -467,3 +466,25 @@ def obtener_orden_dias():
     """Devuelve los días ordenados por su campo 'orden'."""
     from .models import DiaSemana
     return list(DiaSemana.objects.order_by("orden"))
+
+
+def horarios_ordenados(**filtros):
+    """
+    Horarios que cumplen `filtros`, con sus relaciones, ordenados por
+    (dia, hora_inicio): ese orden lo da directamente el índice compuesto
+    (usuario|institucion|docente, dia, hora_inicio), sin ordenar en la base.
+    Para el orden de la semana, pasar el resultado por ordenar_por_dia().
+    """
+    return (Horario.objects
+            .filter(**filtros)
+            .select_related('asignatura__semestre__carrera', 'docente', 'aula', 'dia')
+            .order_by('dia_id', 'hora_inicio'))
+
+
+def ordenar_por_dia(horarios):
+    """
+    Lista de `horarios` (ya ordenados por dia, hora_inicio) en el orden de la
+    semana (DiaSemana.orden). Son a lo sumo 7 tramos ya ordenados, así que el
+    sort estable es lineal y conserva el orden por hora dentro de cada día.
+    """
+    return sorted(horarios, key=lambda h: h.dia.orden)
@@ -0,0 +1,167 @@
+# validacion.py
+"""
+Validación por lotes de filas Horario.
+
+`Horario.save()` valida fila por fila (una consulta de no disponibilidad más
+`full_clean()` con sus chequeos de FK), y lo generado entra por bulk_create
+sin validar. `validar_horarios` revisa N filas candidatas con un número fijo
+de consultas (6, sin importar N):
+
+- ventana de la jornada (models.error_jornada, la regla de Horario.clean),
+- que asignatura, docente, aula y día existan y sean de la institución,
+- no disponibilidad del docente ese día,
+- choques de aula, docente y semestre el mismo día, contra lo ya guardado en
+  la institución y contra las demás filas del lote.
+
+Los horarios de DESCANSO (docente y aula marcadores) no ocupan recursos.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import Asignatura, Aula, DiaSemana, Docente, Horario, NoDisponibilidad, error_jornada
+
+RECURSOS = (
+    ("aula", "El aula ya está ocupada"),
+    ("docente", "El docente ya tiene clase"),
+    ("semestre", "El semestre ya tiene clase"),
+)
+
+
+def _solapan(a_ini, a_fin, b_ini, b_fin):
+    return a_ini < b_fin and b_ini < a_fin
+
+
+def _existentes(modelo, ids, *campos):
+    """{id: (institucion_id, *campos)} de los `ids` que existen (una consulta)."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    return {
+        fila[0]: fila[1:]
+        for fila in modelo.objects.filter(id__in=ids).values_list("id", "institucion_id", *campos)
+    }
+
+
+def validar_horarios(horarios):
+    """
+    Valida `horarios` (instancias de Horario, guardadas o no) como un lote.
+    Devuelve una lista alineada con la entrada: para cada fila, la lista de
+    mensajes de error ([] si es válida).
+    """
+    filas = list(horarios)
+    errores = [[] for _ in filas]
+    if not filas:
+        return errores
+
+    # ---------- chequeos sin consultas ----------
+    for i, h in enumerate(filas):
+        if not h.dia_id or not h.hora_inicio or not h.hora_fin:
+            errores[i].append("Debes especificar el día, hora de inicio y fin.")
+            continue
+        if h.hora_fin < h.hora_inicio:
+            errores[i].append("La hora de fin es anterior a la de inicio.")
+        mensaje = error_jornada(h.jornada, h.hora_inicio)
+        if mensaje:
+            errores[i].append(mensaje)
+
+    # ---------- relaciones (4 consultas) ----------
+    asignaturas = _existentes(Asignatura, (h.asignatura_id for h in filas), "semestre_id", "nombre")
+    relaciones = (
+        ("asignatura", asignaturas),
+        ("docente", _existentes(Docente, (h.docente_id for h in filas))),
+        ("aula", _existentes(Aula, (h.aula_id for h in filas))),
+        ("dia", _existentes(DiaSemana, (h.dia_id for h in filas))),
+    )
+    for i, h in enumerate(filas):
+        for campo, existentes in relaciones:
+            dato = existentes.get(getattr(h, f"{campo}_id"))
+            if dato is None:
+                errores[i].append(f"El campo '{campo}' no existe.")
+            elif dato[0] != h.institucion_id:
+                errores[i].append(f"El campo '{campo}' no pertenece a la institución.")
+
+    def semestre(h):
+        return asignaturas.get(h.asignatura_id, (None, None))[1]
+
+    def es_descanso(h):
+        return asignaturas.get(h.asignatura_id, (None, None, ""))[2] == "DESCANSO"
+
+    candidatas = [
+        (i, h) for i, h in enumerate(filas)
+        if not errores[i] and not es_descanso(h)
+    ]
+    if not candidatas:
+        return errores
+
+    instituciones = {h.institucion_id for _, h in candidatas}
+    dias = {h.dia_id for _, h in candidatas}
+    docentes = {h.docente_id for _, h in candidatas}
+
+    # ---------- no disponibilidad (1 consulta) ----------
+    no_disp = {}
+    for docente_id, dia_id, jornada, ini, fin in NoDisponibilidad.objects.filter(
+        institucion_id__in=instituciones, docente_id__in=docentes, dia_id__in=dias,
+    ).values_list("docente_id", "dia_id", "jornada", "hora_inicio", "hora_fin"):
+        no_disp.setdefault((docente_id, dia_id), []).append((jornada, ini, fin))
+
+    for i, h in candidatas:
+        if any(
+            jornada == h.jornada and _solapan(ini, fin, h.hora_inicio, h.hora_fin)
+            for jornada, ini, fin in no_disp.get((h.docente_id, h.dia_id), ())
+        ):
+            errores[i].append("El docente no está disponible en ese horario.")
+
+    # ---------- choques con lo guardado y dentro del lote (1 consulta) ----------
+    ocupado = {}  # (recurso, institucion_id, dia_id, id) -> [(ini, fin)]
+
+    def claves(institucion_id, dia_id, aula_id, docente_id, semestre_id):
+        return [
+            (recurso, institucion_id, dia_id, valor)
+            for (recurso, _), valor in zip(RECURSOS, (aula_id, docente_id, semestre_id))
+            if valor is not None
+        ]
+
+    propios = {h.pk for _, h in candidatas if h.pk}
+    guardados = (
+        Horario.objects
+        .filter(institucion_id__in=instituciones, dia_id__in=dias)
+        .filter(
+            Q(aula_id__in={h.aula_id for _, h in candidatas})
+            | Q(docente_id__in=docentes)
+            | Q(asignatura__semestre_id__in={semestre(h) for _, h in candidatas} - {None})
+        )
+        .exclude(asignatura__nombre="DESCANSO")
+        .exclude(pk__in=propios)
+        .values_list("institucion_id", "dia_id", "aula_id", "docente_id",
+                     "asignatura__semestre_id", "hora_inicio", "hora_fin")
+    )
+    for institucion_id, dia_id, aula_id, docente_id, semestre_id, ini, fin in guardados:
+        if ini is None or fin is None:
+            continue
+        for clave in claves(institucion_id, dia_id, aula_id, docente_id, semestre_id):
+            ocupado.setdefault(clave, []).append((ini, fin))
+
+    mensajes = dict(RECURSOS)
+    for i, h in candidatas:
+        for clave in claves(h.institucion_id, h.dia_id, h.aula_id, h.docente_id, semestre(h)):
+            tramos = ocupado.setdefault(clave, [])
+            choque = next((t for t in tramos if _solapan(t[0], t[1], h.hora_inicio, h.hora_fin)), None)
+            if choque:
+                errores[i].append(
+                    f"{mensajes[clave[0]]} ese día de {choque[0]:%H:%M} a {choque[1]:%H:%M}."
+                )
+            tramos.append((h.hora_inicio, h.hora_fin))
+    return errores
+
+
+def validar_o_fallar(horarios, max_errores=20):
+    """Como validar_horarios, pero lanza ValidationError si alguna fila falla."""
+    filas = list(horarios)
+    mensajes = [
+        f"Fila {i + 1}: {msg}"
+        for i, errs in enumerate(validar_horarios(filas))
+        for msg in errs
+    ]
+    if mensajes:
+        resto = len(mensajes) - max_errores
+        raise ValidationError(mensajes[:max_errores] + ([f"... y {resto} error(es) más."] if resto > 0 else []))
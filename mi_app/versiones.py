@@ -0,0 +1,66 @@
+# versiones.py
+"""
+Versión del horario de cada institución y de cada usuario.
+
+`Institucion.version_horario` sube en cada escritura que cambia lo que se
+muestra de un horario (generación, reprogramación, ediciones en el admin,
+descansos y cambios de nombres de asignaturas, docentes y aulas), y
+`horario_modificado` guarda cuándo. `PerfilUsuario` lleva el mismo par para
+las vistas de un usuario: sube con sus propios horarios y descansos y con
+los cambios compartidos de su institución, no con los horarios de otros
+usuarios. Con eso las lecturas arman ETag y Last-Modified sin tocar la tabla
+Horario.
+
+El UPDATE corre dentro de la transacción de quien escribe: quien lee la
+versión antes que los datos nunca ve una versión nueva con datos viejos.
+
+Los borrados masivos de Horario (queryset.delete()) no disparan señales
+—registrar un post_delete en Horario le quitaría a Django el borrado
+rápido—; quien los hace llama a `tocar_version`.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Institucion, PerfilUsuario
+
+
+def tocar_version(institucion_id, usuario_id=None):
+    """
+    Sube la versión del horario de la institución y la de `usuario_id`; sin
+    usuario (cambios compartidos, p. ej. el nombre de un docente) sube la de
+    todos los usuarios de la institución. Dos UPDATE.
+    """
+    if institucion_id is None:
+        return
+    cambios = {"version_horario": F("version_horario") + 1, "horario_modificado": timezone.now()}
+    Institucion.objects.filter(pk=institucion_id).update(**cambios)
+    if usuario_id is None:
+        PerfilUsuario.objects.filter(institucion_id=institucion_id).update(**cambios)
+    else:
+        PerfilUsuario.objects.filter(user_id=usuario_id).update(**cambios)
+
+
+def tocar_todas():
+    """Sube la versión de todas las instituciones y usuarios (cambios globales, p. ej. el orden de los días). Dos UPDATE."""
+    cambios = {"version_horario": F("version_horario") + 1, "horario_modificado": timezone.now()}
+    Institucion.objects.update(**cambios)
+    PerfilUsuario.objects.update(**cambios)
+
+
+def version_horario(institucion_id):
+    """(version, modificado) de la institución; (0, None) si no existe."""
+    fila = (
+        Institucion.objects.filter(pk=institucion_id)
+        .values_list("version_horario", "horario_modificado")
+        .first()
+    )
+    return fila or (0, None)
+
+
+def version_usuario(usuario_id):
+    """(version, modificado, institucion_id) de las vistas de `usuario_id`; None si no tiene perfil."""
+    return (
+        PerfilUsuario.objects.filter(user_id=usuario_id)
+        .values_list("version_horario", "horario_modificado", "institucion_id")
+        .first()
+    )
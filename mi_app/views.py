@@ -1,18 +1,30 @@
+import logging
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login as auth_login
 from .forms import RegistrationForm
-from django.http import HttpResponse
-from weasyprint import HTML
-from django.template.loader import get_template
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
 
 from django.db import transaction
 
 from .models import (
-    Horario, CarreraUniversitaria, Docente, Asignatura, Institucion,PerfilUsuario,Aula, DiaSemana, HorarioGuardado, NoDisponibilidad
+    HorarioPlano, CarreraUniversitaria, Docente, Asignatura, Institucion,PerfilUsuario,Aula, DiaSemana, HorarioGuardado, NoDisponibilidad
 )
 from .utils import asignar_horario_automatico
+from . import cache_horarios, plano
+from .calendario import TIPOS as TIPOS_CALENDARIO, SinInicioClases, generar_ics, leer_token
+from .exportacion import clave_pdf, filtros_pdf, marcar_pendiente, pdf_en_curso, renderizar_pdf, ruta_pdf
+from .planillas import filtrar_horarios, respuesta_planilla
+from .tasks import exportar_pdf_task
+from .versiones import version_horario, version_usuario
+from .workers import hay_workers, olvidar_workers
+
+logger = logging.getLogger(__name__)
 
 
 # ============ AUTENTICACIÓN (REGISTRO SIMPLE) ============
@@ -56,6 +68,52 @@ def register(request):
     return render(request, 'register.html', {'form': form})
 
 
+# ============ GET condicional de las vistas de horarios ============
+# Subir al cambiar las plantillas de estas vistas: invalida las copias de los navegadores
+VERSION_VISTAS = 1
+
+
+def _version_vista(request):
+    """(version, modificado, institucion_id) del usuario o None; una consulta por petición."""
+    if not hasattr(request, "_version_horario"):
+        request._version_horario = version_usuario(request.user.id)
+    return request._version_horario
+
+
+def _version_condicional(request):
+    # Con mensajes pendientes la página cambia aunque el horario no: sin 304
+    if len(messages.get_messages(request)):
+        return None
+    return _version_vista(request)
+
+
+def _etag_vista(request, *args, **kwargs):
+    version = _version_condicional(request)
+    return version and f"u{request.user.id}-v{version[0]}-p{VERSION_VISTAS}"
+
+
+def _modificado_vista(request, *args, **kwargs):
+    version = _version_condicional(request)
+    return version and version[1]
+
+
+def horario_condicional(vista):
+    """
+    ETag y Last-Modified desde la versión del horario del usuario
+    (versiones.py): si no cambió desde la copia del navegador, 304 sin
+    consultar Horario ni renderizar.
+    """
+    vista = condition(etag_func=_etag_vista, last_modified_func=_modificado_vista)(vista)
+    return cache_control(private=True, no_cache=True)(vista)
+
+
+def _horarios_por_dia(request, vista, carrera_id=None, **filtros):
+    """Horarios del usuario agrupados por día, desde la caché (cache_horarios.py)."""
+    if carrera_id:
+        filtros['carrera_id'] = carrera_id
+    return cache_horarios.horarios_por_dia(request.user.id, vista, filtros, _version_vista(request))
+
+
 # ============ Vistas “públicas” per-user ============
 @login_required
 def panel_inicio(request):
@@ -63,37 +121,24 @@ def panel_inicio(request):
 
 
 @login_required
+@horario_condicional
 def inicio(request):
     """
     Muestra SOLO mis horarios
     """
-    horarios = (Horario.objects
-                .filter(usuario=request.user)
-                .select_related('asignatura__semestre__carrera', 'docente', 'aula', 'dia')
-                .order_by('dia__orden', 'hora_inicio'))
+    horarios = plano.ordenados(usuario=request.user)
     return render(request, 'inicio.html', {'horarios': horarios})
 
 
 @login_required
+@horario_condicional
 def horarios_admin(request):
     """
     Vista de “listado por día” pero SIEMPRE dentro de mis datos.
     """
     carrera_id = request.GET.get('carrera')
-    carreras = CarreraUniversitaria.objects.filter(usuario=request.user)
-
-    qs = (Horario.objects
-          .filter(usuario=request.user)
-          .select_related('asignatura__semestre__carrera', 'docente', 'aula', 'dia'))
-
-    if carrera_id:
-        qs = qs.filter(asignatura__semestre__carrera__id=carrera_id)
-
-    qs = qs.order_by("dia__orden", "hora_inicio")
-
-    horarios_por_dia = {}
-    for h in qs:
-        horarios_por_dia.setdefault(h.dia, []).append(h)
+    carreras = CarreraUniversitaria.objects.filter(institucion__usuarios__user=request.user)
+    horarios_por_dia = _horarios_por_dia(request, 'horarios_admin', carrera_id)
 
     context = {
         'horarios_por_dia': horarios_por_dia,
@@ -104,25 +149,14 @@ def horarios_admin(request):
 
 
 @login_required
+@horario_condicional
 def ver_horarios(request):
     """
     Igual que arriba: vista “pública” pero solo mis horarios.
     """
     carrera_id = request.GET.get("carrera")
-    carreras_disponibles = CarreraUniversitaria.objects.filter(usuario=request.user)
-
-    qs = (Horario.objects
-          .filter(usuario=request.user)
-          .select_related('asignatura__semestre__carrera', 'docente', 'aula', 'dia'))
-
-    if carrera_id:
-        qs = qs.filter(asignatura__semestre__carrera__id=carrera_id)
-
-    qs = qs.order_by("dia__orden", "hora_inicio")
-
-    horarios_por_dia = {}
-    for h in qs:
-        horarios_por_dia.setdefault(h.dia, []).append(h)
+    carreras_disponibles = CarreraUniversitaria.objects.filter(institucion__usuarios__user=request.user)
+    horarios_por_dia = _horarios_por_dia(request, "ver_horarios", carrera_id)
 
     return render(request, "horarios.html", {
         "horarios_por_dia": horarios_por_dia,
@@ -132,23 +166,16 @@ def ver_horarios(request):
 
 
 @login_required
+@horario_condicional
 def horario_docente(request, docente_id):
     """
     Horarios de un docente, pero SOLO dentro de mis datos.
     """
-    docente = get_object_or_404(Docente, id=docente_id, usuario=request.user)
-    horarios = (Horario.objects
-                .filter(usuario=request.user, docente=docente)
-                .select_related('asignatura__semestre__carrera', 'aula', 'dia')
-                .order_by('dia__orden', 'hora_inicio'))
-
-    horarios_por_dia = {}
-    for h in horarios:
-        horarios_por_dia.setdefault(h.dia, []).append(h)
+    docente = get_object_or_404(Docente, id=docente_id, institucion__usuarios__user=request.user)
 
     context = {
         'docente': docente,
-        'horarios_por_dia': horarios_por_dia,
+        'horarios_por_dia': _horarios_por_dia(request, 'horario_docente', docente_id=docente.id),
     }
     return render(request, 'admin/mi_app/horario_docente.html', context)
 
@@ -156,18 +183,94 @@ def horario_docente(request, docente_id):
 @login_required
 def exportar_horarios_pdf(request):
     """
-    Exporta SOLO el horario del usuario autenticado.
+    Exporta SOLO el horario del usuario autenticado (filtros opcionales
+    ?carrera= y ?docente=). Si el horario no cambió desde la última descarga
+    se sirve el PDF guardado; si no, se renderiza en Celery (la página se
+    recarga sola hasta que esté listo) o, sin workers, en la petición.
     """
-    queryset = (Horario.objects
-                .filter(usuario=request.user)
-                .select_related('asignatura__semestre__carrera', 'docente', 'aula', 'dia')
-                .order_by('dia__orden', 'hora_inicio'))
+    filtros = filtros_pdf(request.GET)
+    clave = clave_pdf(request.user.id, filtros)
+    ruta = ruta_pdf(request.user.id, filtros, clave)
+
+    archivo = _abrir_pdf(ruta)
+    if archivo is None:
+        if pdf_en_curso(ruta):
+            return render(request, "pdf_pendiente.html", status=202)
+        if hay_workers():
+            marca = marcar_pendiente(ruta)
+            try:
+                exportar_pdf_task.delay(request.user.id, filtros, clave)
+                return render(request, "pdf_pendiente.html", status=202)
+            except Exception as e:
+                marca.unlink(missing_ok=True)
+                olvidar_workers()
+                logger.warning(f"Celery no disponible: {e}")
+        archivo = _abrir_pdf(renderizar_pdf(request.user.id, filtros, clave))
+        if archivo is None:
+            # Otro render lo reemplazó entretanto: la página pendiente reintenta
+            return render(request, "pdf_pendiente.html", status=202)
+
+    return FileResponse(
+        archivo, as_attachment=True, filename="mi_horario.pdf", content_type="application/pdf",
+    )
+
+
+def _abrir_pdf(ruta):
+    """El PDF abierto, o None si no existe (o se borró: lo reemplazó un horario más nuevo)."""
+    try:
+        return open(ruta, "rb")
+    except FileNotFoundError:
+        return None
 
-    template = get_template("pdf_horarios.html")
-    html_string = template.render({"horarios": queryset, "usuario": request.user})
 
-    pdf_file = HTML(string=html_string).write_pdf()
+@login_required
+def exportar_horarios_planilla(request, formato):
+    """
+    Mis horarios en CSV o XLSX, con los mismos filtros que ver_horarios
+    (?carrera=, ?jornada=, ?dia=). Se envía en streaming.
+    """
+    qs = filtrar_horarios(HorarioPlano.objects.filter(usuario=request.user), request.GET)
+    return respuesta_planilla(qs, formato, "mi_horario")
+
+
+# ============ CALENDARIO (.ics) ============
+def _calendario(request, token):
+    """(institucion_id, tipo, id, version, modificado) del feed; una consulta por petición."""
+    if not hasattr(request, "_calendario"):
+        try:
+            institucion_id, tipo, obj_id = leer_token(token)
+        except signing.BadSignature:
+            raise Http404("Calendario no encontrado")
+        request._calendario = (institucion_id, tipo, obj_id, *version_horario(institucion_id))
+    return request._calendario
+
+
+def _etag_calendario(request, token):
+    _, tipo, obj_id, version, _ = _calendario(request, token)
+    return f"{tipo}-{obj_id}-v{version}"
 
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="mi_horario.pdf"'
+
+def _modificado_calendario(request, token):
+    return _calendario(request, token)[4]
+
+
+@require_safe
+@condition(etag_func=_etag_calendario, last_modified_func=_modificado_calendario)
+def calendario_ics(request, token):
+    """
+    Feed iCalendar de un docente, aula o semestre (token firmado, sin
+    sesión). Si el horario no cambió desde la última consulta del cliente,
+    `condition` responde 304 sin llegar aquí.
+    """
+    institucion_id, tipo, obj_id, _, modificado = _calendario(request, token)
+    modelo, _ = TIPOS_CALENDARIO[tipo]
+    try:
+        contenido = generar_ics(institucion_id, tipo, obj_id, modificado)
+    except modelo.DoesNotExist:
+        raise Http404("Calendario no encontrado")
+    except SinInicioClases:
+        raise Http404("La institución no tiene fecha de inicio de clases")
+    response = HttpResponse(contenido, content_type="text/calendar; charset=utf-8")
+    response["Content-Disposition"] = f'inline; filename="horario-{tipo}-{obj_id}.ics"'
+    response["Cache-Control"] = "private, no-cache"
     return response
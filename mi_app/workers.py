@@ -0,0 +1,119 @@
+# workers.py
+"""
+¿Hay workers de Celery vivos? — respuesta en tiempo constante.
+
+Cada worker escribe su "latido" en Redis al arrancar y luego cada
+HORARIOS_LATIDO_SEGUNDOS, en una clave propia (prefijo + nombre del worker)
+con vencimiento: la de un worker que se apaga o se cae deja de contar sola,
+sin tocar las de los demás. La vista solo busca una clave con ese prefijo
+(un SCAN acotado), y además recuerda la respuesta unos segundos en el
+proceso, en lugar de hacer
+un `inspect().active()` (broadcast a todos los workers, que con Redis arriba
+y sin workers espera el timeout completo) en cada clic.
+
+Si no hay latido (p. ej. workers con código anterior), se hace un único
+`ping` corto y el resultado negativo también se recuerda.
+"""
+import logging
+import socket
+import time
+
+from celery.signals import worker_ready, worker_shutdown
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_LATIDO = "hache:celery:latido:"
+
+_memo = {"hasta": 0.0, "valor": False}
+_redis = None
+_nombre = {"worker": None}  # hostname del worker de Celery de este proceso
+
+
+def _intervalo():
+    return getattr(settings, "HORARIOS_LATIDO_SEGUNDOS", 10)
+
+
+def _cliente():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(
+            settings.CELERY_BROKER_URL, socket_connect_timeout=0.3, socket_timeout=0.3,
+        )
+    return _redis
+
+
+def clave_latido(nombre=None):
+    """Clave del latido del worker `nombre` (por defecto, el de este proceso)."""
+    return PREFIJO_LATIDO + (nombre or _nombre["worker"] or socket.gethostname())
+
+
+def registrar_latido(nombre=None):
+    """Marca que el worker `nombre` está vivo (vence en 3 intervalos sin renovar)."""
+    try:
+        _cliente().set(clave_latido(nombre), int(time.time()), ex=3 * _intervalo())
+    except Exception as e:
+        logger.warning("No se pudo registrar el latido del worker: %s", e)
+
+
+def _hay_latido():
+    return next(iter(_cliente().scan_iter(match=PREFIJO_LATIDO + "*", count=1000)), None) is not None
+
+
+def _sondear():
+    try:
+        if _hay_latido():
+            return True
+    except Exception as e:
+        logger.warning("Redis no disponible, se ejecuta en local: %s", e)
+        return False
+
+    try:
+        from mi_proyecto.celery import current_app
+        respuestas = current_app.control.ping(timeout=getattr(settings, "HORARIOS_PING_TIMEOUT", 0.5))
+    except Exception as e:
+        logger.warning("Celery no disponible: %s", e)
+        return False
+    for respuesta in respuestas or ():
+        for nombre in respuesta:
+            registrar_latido(nombre)
+    return bool(respuestas)
+
+
+def hay_workers():
+    """True si hay al menos un worker vivo. Cacheado unos segundos en el proceso."""
+    ahora = time.monotonic()
+    if ahora < _memo["hasta"]:
+        return _memo["valor"]
+    valor = _sondear()
+    # Un "no" se recuerda más tiempo: evita repetir el ping en cada clic
+    ttl = getattr(settings, "HORARIOS_WORKERS_TTL", 5) * (1 if valor else 3)
+    _memo.update(hasta=ahora + ttl, valor=valor)
+    return valor
+
+
+def olvidar_workers():
+    """Descarta la respuesta cacheada (p. ej. si un envío a Celery falló)."""
+    _memo.update(hasta=0.0, valor=False)
+
+
+# ==========================
+# Señales del worker
+# ==========================
+@worker_ready.connect
+def _al_iniciar_worker(sender=None, **kwargs):
+    _nombre["worker"] = getattr(sender, "hostname", None)
+    registrar_latido()
+    timer = getattr(sender, "timer", None)
+    if timer is not None:
+        timer.call_repeatedly(_intervalo(), registrar_latido)
+
+
+@worker_shutdown.connect
+def _al_detener_worker(sender=None, **kwargs):
+    # Solo la clave de este worker; la de uno caído vence por su cuenta
+    try:
+        _cliente().delete(clave_latido(getattr(sender, "hostname", None)))
+    except Exception:
+        pass
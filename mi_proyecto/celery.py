@@ -1,5 +1,5 @@
 import os
-from celery import Celery
+from celery import Celery, shared_task, current_app
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_proyecto.settings')
 
@@ -145,4 +145,75 @@ CSRF_COOKIE_SECURE = False
 CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_TASK_TIME_LIMIT = 1800  # 30 minutos máximo
-CELERY_TASK_SOFT_TIME_LIMIT = 1500
\ No newline at end of file
+CELERY_TASK_SOFT_TIME_LIMIT = 1500
+
+# ==============================
+# Caché
+# ==============================
+# Alias "horarios": horarios agrupados por día de las vistas (cache_horarios.py).
+# Redis si hay REDIS_URL (compartida entre procesos); si no, memoria de cada proceso.
+_CACHE_LOCAL = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+CACHES = {
+    "default": _CACHE_LOCAL,
+    "horarios": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+        "KEY_PREFIX": "hache",
+        "OPTIONS": {"socket_connect_timeout": 0.3, "socket_timeout": 0.3},
+    } if os.getenv("REDIS_URL") else {**_CACHE_LOCAL, "LOCATION": "horarios", "OPTIONS": {"MAX_ENTRIES": 2000}},
+}
+# Segundos que vive cada entrada (las de versiones viejas del horario vencen solas)
+HORARIOS_CACHE_TIMEOUT = int(os.getenv("HORARIOS_CACHE_TIMEOUT", "3600"))
+
+# ==============================
+# Generación de horarios
+# ==============================
+# "bitmask": ocupación por máscaras de bits (mismas decisiones, más rápido)
+# "clasico": chequeos sobre listas en memoria (utils.asignar_horario_automatico)
+HORARIOS_MOTOR = os.getenv("HORARIOS_MOTOR", "bitmask")
+
+# Motor "exacto": segundos máximos de búsqueda (en la petición y en Celery).
+# El de Celery debe quedar por debajo de CELERY_TASK_SOFT_TIME_LIMIT.
+HORARIOS_EXACTO_PRESUPUESTO = float(os.getenv("HORARIOS_EXACTO_PRESUPUESTO", "20"))
+HORARIOS_EXACTO_PRESUPUESTO_CELERY = float(os.getenv("HORARIOS_EXACTO_PRESUPUESTO_CELERY", "1200"))
+
+# Procesos para generar componentes independientes en paralelo (vacío = núcleos disponibles)
+HORARIOS_PROCESOS = int(os.getenv("HORARIOS_PROCESOS", "0")) or None
+
+# Al guardar asignaturas, docentes (no disponibilidad) o descansos en el admin,
+# reubicar solo lo afectado en el horario ya generado
+HORARIOS_INCREMENTAL = os.getenv("HORARIOS_INCREMENTAL", "1") == "1"
+
+# Escritura de horarios generados: COPY en PostgreSQL; bulk_create en el resto
+HORARIOS_USAR_COPY = os.getenv("HORARIOS_USAR_COPY", "1") == "1"
+HORARIOS_BATCH_SIZE = int(os.getenv("HORARIOS_BATCH_SIZE", "1000"))
+# Validar en lote (choques, no disponibilidad, jornada) lo generado antes de escribirlo
+HORARIOS_VALIDAR_GENERADOS = os.getenv("HORARIOS_VALIDAR_GENERADOS", "0") == "1"
+
+# Auditoría de conflictos (línea de barrido) al terminar cada generación; el resultado va al log
+HORARIOS_AUDITAR_TRAS_GENERAR = os.getenv("HORARIOS_AUDITAR_TRAS_GENERAR", "1") == "1"
+
+# Presupuesto de memoria (MB) para el control de lotes; 0 = sin límite (no pausa)
+HORARIOS_MEMORIA_MB = int(os.getenv("HORARIOS_MEMORIA_MB", "0"))
+
+# PDF exportados: se guardan aquí con una huella del horario y se reutilizan mientras no cambie
+HORARIOS_EXPORT_DIR = Path(os.getenv("HORARIOS_EXPORT_DIR", BASE_DIR / "exports"))
+# Un PDF "en curso" hace más de N segundos se da por perdido (worker caído) y se vuelve a pedir
+HORARIOS_PDF_PENDIENTE_SEGUNDOS = int(os.getenv("HORARIOS_PDF_PENDIENTE_SEGUNDOS", "120"))
+
+# Instantáneas del horario (HorarioGuardado): una antes de cada generación;
+# se conservan las N más nuevas y, de las demás, una por día durante N días
+HORARIOS_INSTANTANEA_AL_GENERAR = os.getenv("HORARIOS_INSTANTANEA_AL_GENERAR", "1") == "1"
+HORARIOS_INSTANTANEAS_CODEC = os.getenv("HORARIOS_INSTANTANEAS_CODEC", "brotli")
+HORARIOS_INSTANTANEAS_RECIENTES = int(os.getenv("HORARIOS_INSTANTANEAS_RECIENTES", "10"))
+HORARIOS_INSTANTANEAS_DIAS = int(os.getenv("HORARIOS_INSTANTANEAS_DIAS", "90"))
+
+# Calendarios .ics: primer día de clases (AAAA-MM-DD) de las instituciones sin
+# Institucion.inicio_clases; sin ninguna de las dos fechas no se publican feeds
+HORARIOS_INICIO_CLASES = os.getenv("HORARIOS_INICIO_CLASES") or None
+
+# Detección de workers: latido en Redis cada N segundos; la vista cachea la
+# respuesta HORARIOS_WORKERS_TTL segundos (el "no hay workers", el triple)
+HORARIOS_LATIDO_SEGUNDOS = 10
+HORARIOS_WORKERS_TTL = 5
+HORARIOS_PING_TIMEOUT = 0.5